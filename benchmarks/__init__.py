@@ -0,0 +1,6 @@
+# benchmarks/
+# Medidas de rendimiento de VoceTasks; se ejecutan como módulos desde la raíz del proyecto:
+#   python -m benchmarks.bench_pipeline       latencias de todo el camino de un comando (JSON con --salida)
+#   python -m benchmarks.bench_serializacion  formatos de archivo de tareas
+#   python -m benchmarks.bench_calendario     Calendar de parsedatetime compartido frente a uno por comando
+#   python -m benchmarks.datos_sinteticos     genera usuarios y tareas de prueba en un directorio
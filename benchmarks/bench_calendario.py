@@ -0,0 +1,80 @@
+# benchmarks/bench_calendario.py
+# Latencia de main.interpretar_comando con un Calendar de parsedatetime nuevo en cada comando
+# (lo que se hacía antes) frente al Calendar compartido de main.calendario_pdt().
+#
+# Uso (desde la raíz del proyecto, con las dependencias de main.py instaladas):
+#   python -m benchmarks.bench_calendario [--repeticiones 5] [--vueltas 20]
+
+import argparse
+import contextlib
+import io
+import time
+
+from parsedatetime import Calendar, Constants
+
+import main
+
+# Comandos que pasan por el análisis de fechas (agregar, modificar, recordatorios)
+COMANDOS = [
+    "agrega tarea comprar pan",
+    "agrega comprar leche mañana",
+    "añade llamar al medico para el viernes",
+    "anota pagar factura en categoria casa",
+    "agregar tarea estudiar categoria estudios para mañana",
+    "crear tarea revisar informe tomorrow at 5pm",
+    "cambiar fecha de reunion a mañana",
+    "modificar descripcion de comprar pan a comprar leche",
+    "recordar llamar a juan para mañana",
+    "recordatorio comprar regalo",
+]
+
+
+def _calendario_por_comando():
+    return Calendar(Constants("en_US", usePyICU=False))
+
+
+def _cronometrar(funcion, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def medir(repeticiones, vueltas):
+    def lote():
+        for _ in range(vueltas):
+            for comando in COMANDOS:
+                main.interpretar_comando(comando)
+
+    resultados = []
+    compartido = main.calendario_pdt
+    # interpretar_comando imprime trazas de depuración; no se cuentan en la medida
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            main.calendario_pdt = _calendario_por_comando
+            resultados.append(("Calendar por comando (anterior)", _cronometrar(lote, repeticiones)))
+        finally:
+            main.calendario_pdt = compartido
+        compartido() # Crear el del hilo fuera de la medida, como tras el primer comando
+        resultados.append(("Calendar compartido", _cronometrar(lote, repeticiones)))
+    return [(nombre, tiempo / (vueltas * len(COMANDOS))) for nombre, tiempo in resultados]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark del Calendar de parsedatetime en interpretar_comando")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Se toma el mejor tiempo de N repeticiones")
+    parser.add_argument("--vueltas", type=int, default=20, help="Veces que se interpreta la lista de comandos por repetición")
+    args = parser.parse_args()
+
+    resultados = medir(args.repeticiones, args.vueltas)
+    referencia = resultados[0][1]
+    print(f"\n{len(COMANDOS)} comandos con fechas, {args.vueltas} vueltas")
+    print(f"  {'variante':<34}{'ms/comando':>12}{'mejora':>10}")
+    for nombre, por_comando in resultados:
+        print(f"  {nombre:<34}{por_comando * 1000:>12.3f}{referencia / por_comando:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,225 @@
+# benchmarks/bench_pipeline.py
+# Latencias (p50/p95/p99) y memoria de pico de todo el camino de un comando, sobre datos sintéticos:
+#   interpretar  main.interpretar_comando sobre un corpus de comandos (sin caché y con caché)
+#   commands     cada operación de commands.py sobre usuarios con N tareas
+#   reportes     commands.generar_reporte diario, semanal y mensual
+#   usuarios     carga de usuarios.json (o usuarios.db) y login
+#   gui          TasksViewWidget y CalendarViewWidget con Qt en modo offscreen (se omite sin PyQt5)
+#
+# Todo se ejecuta en un directorio temporal (commands.py usa rutas relativas a usuarios/). Los
+# backends se eligen con las mismas variables de entorno que la aplicación (VOCETASKS_BACKEND_*).
+#
+# Uso (desde la raíz del proyecto, con las dependencias de main.py instaladas):
+#   python -m benchmarks.bench_pipeline [--tamanos 1000,10000,100000] [--suites interpretar,commands]
+#                                       [--salida resultados.json] [--comparar anteriores.json]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import types
+from datetime import date, datetime, timedelta
+
+from benchmarks import datos_sinteticos, medicion
+
+SUITES = ["interpretar", "commands", "reportes", "usuarios", "gui"]
+
+
+def _preparar_usuario(email, n, semilla=1):
+    """Escribe usuarios/<email>/tareas.json (relativo al directorio actual) con n tareas sintéticas."""
+    from serializacion import guardar_archivo
+    data = datos_sinteticos.generar_tareas(n, semilla)
+    ruta = os.path.join("usuarios", email, "tareas.json")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    guardar_archivo(ruta, data)
+    return data["tareas"]
+
+
+def suite_interpretar(args, _n):
+    import main
+    comandos = datos_sinteticos.generar_comandos(args.comandos)
+    def sin_cache(i):
+        main.cache_comandos.vaciar()
+        main.interpretar_comando(comandos[i % len(comandos)])
+    def con_cache(i):
+        main.interpretar_comando(comandos[i % len(comandos)])
+    main.cache_comandos.vaciar()
+    for comando in comandos: # Calentar el Calendar de parsedatetime y llenar la caché
+        main.interpretar_comando(comando)
+    yield "sin_cache", medicion.medir(sin_cache, args.repeticiones * 5, args.tiempo_max)
+    yield "con_cache", medicion.medir(con_cache, args.repeticiones * 5, args.tiempo_max)
+
+
+def suite_commands(args, n):
+    import commands
+    from task_store import get_task_store
+    email = f"bench{n}@ejemplo.com"
+    tareas = _preparar_usuario(email, n)
+    descripciones = [t["descripcion"] for t in tareas]
+    pendientes = [t["descripcion"] for t in tareas if not t["completada"]] or descripciones
+    categorias = list(datos_sinteticos.CATEGORIAS)
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    store = get_task_store(email)
+    rep, tmax = args.repeticiones, args.tiempo_max
+
+    def cargar_en_frio(_i):
+        store.invalidate()
+        commands.mostrar_tareas(email)
+    yield "cargar_en_frio", medicion.medir(cargar_en_frio, rep, tmax)
+    yield "mostrar_tareas", medicion.medir(lambda i: commands.mostrar_tareas(email), rep, tmax)
+    yield "obtener_tarea", medicion.medir(lambda i: commands.obtener_tarea(descripciones[i * 7919 % n], email), rep, tmax)
+    yield "mostrar_tareas_categoria", medicion.medir(lambda i: commands.mostrar_tareas_categoria(categorias[i % len(categorias)], email), rep, tmax)
+    yield "tareas_con_fecha_limite", medicion.medir(
+        lambda i: commands.tareas_con_fecha_limite(email, hoy + timedelta(days=i % 60 - 30), hoy + timedelta(days=i % 60)), rep, tmax)
+    yield "primeras_tareas_con_fecha", medicion.medir(lambda i: commands.primeras_tareas_con_fecha(email, 5), rep, tmax)
+    # Descripciones como las transcribe mal el reconocimiento ("compra" por "comprar"). El índice de
+    # trigramas se construye en la primera búsqueda tras cargar, que se mide aparte (con la carga)
+    inexactas = [d.replace("ar ", "a ", 1) for d in descripciones[:1000]]
+    yield "cargar_y_primera_aproximada", medicion.medir(lambda i: (store.invalidate(), store.buscar_aproximada(inexactas[0])), 3, tmax)
+    yield "buscar_aproximada", medicion.medir(lambda i: store.buscar_aproximada(inexactas[i * 7919 % len(inexactas)]), rep, tmax)
+
+    agregadas = []
+    def agregar(i):
+        agregadas.append(f"tarea de benchmark {i}")
+        commands.agregar_tarea(agregadas[-1], categorias[i % len(categorias)], None, email)
+    yield "agregar_tarea", medicion.medir(agregar, rep, tmax)
+    yield "modificar_tarea", medicion.medir(
+        lambda i: commands.modificar_tarea(descripciones[i * 7919 % n], {"categoria": categorias[i % len(categorias)]}, email), rep, tmax)
+    yield "marcar_como_completada", medicion.medir(
+        lambda i: commands.marcar_como_completada(pendientes[i % len(pendientes)], email), rep, tmax)
+    # Una eliminación por tarea agregada (la medida de memoria usa la siguiente)
+    yield "eliminar_tarea", medicion.medir(lambda i: commands.eliminar_tarea(agregadas[i], email), len(agregadas) - 1, tmax)
+
+
+def suite_reportes(args, n):
+    import commands
+    email = f"reportes{n}@ejemplo.com"
+    _preparar_usuario(email, n)
+    hoy = date.today()
+    lunes = hoy - timedelta(days=hoy.weekday())
+    inicio_mes = hoy.replace(day=1)
+    fin_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    commands.mostrar_tareas(email) # La carga inicial se mide en commands/cargar_en_frio
+    for tipo, inicio, fin in [("diario", hoy, hoy), ("semanal", lunes, lunes + timedelta(days=6)), ("mensual", inicio_mes, fin_mes)]:
+        yield tipo, medicion.medir(lambda i: commands.generar_reporte(tipo, inicio, fin, email), args.repeticiones, args.tiempo_max)
+
+
+def _clase_gestor_usuarios():
+    import user_management
+    if user_management.BACKEND_USUARIOS == "sqlite":
+        from sqlite_user_store import SqliteUserManager
+        return SqliteUserManager
+    return user_management.UserManager
+
+
+def suite_usuarios(args, _n):
+    clase = _clase_gestor_usuarios()
+    ruta = os.path.join("bench_usuarios", "usuarios.json")
+    os.makedirs("bench_usuarios", exist_ok=True)
+    from serializacion import guardar_archivo
+    guardar_archivo(ruta, {"usuarios": datos_sinteticos.generar_usuarios(args.usuarios)})
+    yield "cargar", medicion.medir(lambda i: clase(ruta), args.repeticiones, args.tiempo_max)
+    gestor = clase(ruta)
+    yield "login", medicion.medir(
+        lambda i: gestor.login(datos_sinteticos.email_usuario(i * 7919 % args.usuarios), datos_sinteticos.CLAVE_USUARIOS),
+        args.repeticiones * 5, args.tiempo_max)
+
+
+def suite_gui(args, n):
+    n = min(n, args.max_tareas_gui)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication.instance() or QApplication([])
+        import gui
+    except ImportError as e:
+        raise _Omitida(f"PyQt5 o una dependencia de gui.py no está instalada ({e})")
+    email = f"gui{n}@ejemplo.com"
+    _preparar_usuario(email, n)
+    gestor = types.SimpleNamespace(current_user=email) # Las vistas solo leen current_user
+    tabla = gui.TasksViewWidget(gestor)
+    calendario = gui.CalendarViewWidget(gestor)
+    yield "tabla_tareas", medicion.medir(lambda i: tabla.load_and_display_tasks(), args.repeticiones, args.tiempo_max)
+    yield "calendario", medicion.medir(lambda i: calendario.load_and_display_tasks(), args.repeticiones, args.tiempo_max)
+    app.processEvents()
+
+
+class _Omitida(Exception):
+    """La suite no puede ejecutarse en este entorno (falta una dependencia opcional)."""
+
+
+# Suites que dependen del número de tareas (las demás se ejecutan una sola vez)
+_POR_TAMANO = {"commands", "reportes", "gui"}
+
+
+def ejecutar(args):
+    resultados = []
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    tamanos = [int(x) for x in args.tamanos.split(",")]
+    for suite in suites:
+        funcion = globals()[f"suite_{suite}"]
+        for n in (tamanos if suite in _POR_TAMANO else [None]):
+            try:
+                for caso, medida in funcion(args, n):
+                    fila = dict(suite=suite, caso=caso, tareas=min(n, args.max_tareas_gui) if suite == "gui" else n, **medida)
+                    resultados.append(fila)
+                    _imprimir_fila(fila)
+            except _Omitida as e:
+                resultados.append({"suite": suite, "caso": None, "tareas": n, "omitida": str(e)})
+                print(f"  {suite:<12} omitida: {e}")
+                break
+    return resultados
+
+
+def _imprimir_fila(fila):
+    tareas = "" if fila["tareas"] is None else fila["tareas"]
+    memoria = fila.get("memoria_pico_kib")
+    print(f"  {fila['suite']:<12}{fila['caso']:<28}{tareas:>9}{fila['n']:>6}{fila['p50_ms']:>11.3f}{fila['p95_ms']:>11.3f}"
+          f"{fila['p99_ms']:>11.3f}{'' if memoria is None else memoria:>13}", flush=True)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark de todo el camino de un comando sobre datos sintéticos")
+    parser.add_argument("--tamanos", default="1000,10000,100000", help="Números de tareas por usuario, separados por comas (hasta 1000000)")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Suites a ejecutar, separadas por comas ({', '.join(SUITES)})")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Llamadas medidas por caso (como máximo)")
+    parser.add_argument("--tiempo-max", type=float, default=2.0, help="Segundos por caso a partir de los cuales se deja de repetir")
+    parser.add_argument("--comandos", type=int, default=500, help="Tamaño del corpus de comandos sintéticos")
+    parser.add_argument("--usuarios", type=int, default=10000, help="Usuarios en usuarios.json para la suite usuarios")
+    parser.add_argument("--max-tareas-gui", type=int, default=10000, help="Tope de tareas en la suite gui (una fila de tabla por tarea)")
+    parser.add_argument("--salida", help="Guarda los resultados en este archivo JSON")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior: muestra la variación de p50 y p95")
+    args = parser.parse_args()
+    desconocidas = set(args.suites.split(",")) - set(SUITES)
+    if desconocidas:
+        parser.error(f"suites desconocidas: {', '.join(sorted(desconocidas))}")
+
+    raiz = os.getcwd()
+    sys.path.insert(0, raiz) # Los módulos de la aplicación, aunque se cambie de directorio
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        try:
+            print(f"  {'suite':<12}{'caso':<28}{'tareas':>9}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'memoria KiB':>13}")
+            resultados = ejecutar(args)
+        finally:
+            os.chdir(raiz)
+
+    parametros = {clave: valor for clave, valor in vars(args).items() if clave not in ("salida", "comparar")}
+    parametros["backend_tareas"] = os.environ.get("VOCETASKS_BACKEND_TAREAS", "json")
+    parametros["backend_usuarios"] = os.environ.get("VOCETASKS_BACKEND_USUARIOS", "json")
+    doc = medicion.documento(resultados, parametros)
+    if args.salida:
+        medicion.guardar(args.salida, doc)
+        print(f"\nResultados guardados en {args.salida}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        print(f"\nVariación respecto a {args.comparar} (>1 es más lento)")
+        for campo in ("p50_ms", "p95_ms"):
+            for (suite, caso, tareas), antes, ahora, ratio in medicion.comparar(anterior, doc, campo):
+                print(f"  {campo:<7}{suite:<12}{caso:<28}{'' if tareas is None else tareas:>9}{antes:>11.3f}{ahora:>11.3f}{ratio:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,73 @@
+# benchmarks/bench_serializacion.py
+# Compara tiempo de escritura/lectura y tamaño en disco de los formatos de serializacion.py.
+#
+# Uso (desde la raíz del proyecto):
+#   python -m benchmarks.bench_serializacion [--tamanos 1000,10000,100000] [--repeticiones 3]
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import serializacion
+from benchmarks.datos_sinteticos import generar_tareas
+
+
+def _cronometrar(funcion, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def formatos_disponibles():
+    formatos = [("json-legible (anterior)", "json-legible"), ("json compacto" + (" + orjson" if serializacion.orjson else ""), "json")]
+    if serializacion.msgpack is not None:
+        formatos.append(("msgpack", "msgpack"))
+    return formatos
+
+
+def medir(n, repeticiones):
+    data = generar_tareas(n)
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "tareas.json")
+        # Referencia: lo que hacía commands.py antes (json.dump con indent=4 y json.load)
+        def dump_anterior():
+            with open(ruta, "w", encoding='utf-8') as file:
+                json.dump(data, file, indent=4, ensure_ascii=False)
+        def load_anterior():
+            with open(ruta, "r", encoding='utf-8') as file:
+                json.load(file)
+        t_dump = _cronometrar(dump_anterior, repeticiones)
+        t_load = _cronometrar(load_anterior, repeticiones)
+        resultados.append(("stdlib json indent=4", t_dump, t_load, os.path.getsize(ruta)))
+
+        for nombre, formato in formatos_disponibles():
+            def dump():
+                with open(ruta, "wb") as file:
+                    file.write(serializacion.serializar(data, formato))
+            t_dump = _cronometrar(dump, repeticiones)
+            t_load = _cronometrar(lambda: serializacion.cargar_archivo(ruta), repeticiones)
+            resultados.append((nombre, t_dump, t_load, os.path.getsize(ruta)))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de serialización de tareas")
+    parser.add_argument("--tamanos", default="1000,10000,100000", help="Números de tareas separados por comas")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Se toma el mejor tiempo de N repeticiones")
+    args = parser.parse_args()
+
+    for n in (int(x) for x in args.tamanos.split(",")):
+        print(f"\n{n} tareas")
+        print(f"  {'formato':<28}{'escritura ms':>14}{'lectura ms':>12}{'tamaño KiB':>12}")
+        for nombre, t_dump, t_load, tamano in medir(n, args.repeticiones):
+            print(f"  {nombre:<28}{t_dump * 1000:>14.1f}{t_load * 1000:>12.1f}{tamano / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/datos_sinteticos.py
+# Datos sintéticos reproducibles para los benchmarks: tareas con el esquema de commands.agregar_tarea,
+# usuarios con el de UserManager.register_user y comandos de voz como los que llegan a interpretar_comando.
+#
+# Uso (crea usuarios.json y usuarios/<email>/tareas.json dentro del directorio destino):
+#   python -m benchmarks.datos_sinteticos destino [--usuarios 10] [--tareas 100000] [--semilla 1]
+
+import argparse
+import hashlib
+import os
+import random
+from datetime import datetime, timedelta
+
+from serializacion import guardar_archivo
+
+# Categoría -> cosas sobre las que se hacen tareas; las categorías con más peso aparecen más
+CATEGORIAS = {
+    "General": ["las llaves", "el paquete", "la contraseña del wifi", "las fotos del viaje", "el recibo"],
+    "Trabajo": ["el informe trimestral", "la presentación", "el presupuesto", "la reunión con el cliente",
+                "el correo a recursos humanos", "la propuesta", "las facturas pendientes"],
+    "Casa": ["la factura de la luz", "el alquiler", "la lavadora", "las plantas", "la nevera", "el fontanero"],
+    "Compras": ["pan", "leche", "el regalo de cumpleaños", "zapatos para los niños", "café", "fruta"],
+    "Estudios": ["el tema 4", "los apuntes de historia", "el trabajo de matemáticas", "el examen de inglés"],
+    "Salud": ["la cita con el médico", "las pastillas", "la analítica", "el dentista", "el gimnasio"],
+}
+PESOS_CATEGORIAS = [3, 5, 3, 3, 2, 2]
+VERBOS = ["revisar", "enviar", "pagar", "preparar", "comprar", "llamar por", "terminar", "organizar",
+          "reservar", "recoger", "estudiar", "actualizar"]
+COMPLEMENTOS = ["", "", "", "antes de comer", "con calma", "otra vez", "sin falta", "para el equipo"]
+
+NOMBRES = ["ana", "luis", "maria", "jose", "carmen", "javier", "lucia", "pedro", "sofia", "diego"]
+APELLIDOS = ["garcia", "martinez", "lopez", "sanchez", "perez", "gomez", "ruiz", "diaz", "moreno", "munoz"]
+CLAVE_USUARIOS = "clave-benchmark"
+
+
+def _hoy():
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def generar_tareas(n, semilla=1, referencia=None):
+    """{"tareas": [...]} con n tareas repartidas alrededor de referencia (por defecto, hoy).
+
+    Un 70% tiene fecha límite, entre tres meses antes y tres meses después; las vencidas están
+    completadas con más probabilidad. Las descripciones acaban en el número de tarea, así que
+    son únicas (las búsquedas por descripción encuentran siempre una sola).
+    """
+    rnd = random.Random(semilla)
+    referencia = referencia or _hoy()
+    categorias = list(CATEGORIAS)
+    tareas = []
+    for i in range(n):
+        categoria = rnd.choices(categorias, PESOS_CATEGORIAS)[0]
+        descripcion = f"{rnd.choice(VERBOS)} {rnd.choice(CATEGORIAS[categoria])} {rnd.choice(COMPLEMENTOS)}".strip()
+        creacion = referencia - timedelta(minutes=rnd.randint(0, 180 * 24 * 60))
+        limite = None
+        if rnd.random() < 0.7:
+            limite = (referencia + timedelta(days=rnd.randint(-90, 90))).replace(hour=rnd.choice([9, 12, 17, 20]))
+            limite = max(limite, creacion + timedelta(hours=1))
+        vencida = limite is not None and limite < referencia
+        tareas.append({
+            "id": f"{rnd.getrandbits(128):032x}",
+            "descripcion": f"{descripcion} {i}",
+            "categoria": categoria,
+            "fecha_creacion": creacion.strftime('%Y-%m-%d %H:%M:%S'),
+            "fecha_limite": limite.strftime('%Y-%m-%d %H:%M:%S') if limite else None,
+            "completada": rnd.random() < (0.6 if vencida else 0.15),
+        })
+    return {"tareas": tareas}
+
+
+def email_usuario(i):
+    return f"{NOMBRES[i % len(NOMBRES)]}.{APELLIDOS[(i // len(NOMBRES)) % len(APELLIDOS)]}{i}@ejemplo.com"
+
+
+def generar_usuarios(n, semilla=1):
+    """Lista de n usuarios como los guarda UserManager; todos con la contraseña CLAVE_USUARIOS."""
+    rnd = random.Random(semilla)
+    hash_clave = hashlib.sha256(CLAVE_USUARIOS.encode()).hexdigest()
+    alta = _hoy() - timedelta(days=365)
+    return [{
+        "email": email_usuario(i),
+        "name": f"{NOMBRES[i % len(NOMBRES)].capitalize()} {APELLIDOS[(i // len(NOMBRES)) % len(APELLIDOS)].capitalize()}",
+        "password": hash_clave,
+        "created_at": (alta + timedelta(minutes=rnd.randint(0, 365 * 24 * 60))).strftime('%Y-%m-%d %H:%M:%S'),
+        "config": {"recordatorios_activos": True, "modo_silencioso": rnd.random() < 0.2},
+    } for i in range(n)]
+
+
+def crear_entorno(directorio, usuarios=1, tareas_por_usuario=1000, semilla=1):
+    """Escribe usuarios.json y usuarios/<email>/tareas.json en directorio; devuelve los emails.
+
+    La estructura es la que esperan commands.py y UserManager con rutas relativas, así que basta
+    con hacer os.chdir(directorio) antes de usarlos.
+    """
+    lista = generar_usuarios(usuarios, semilla)
+    guardar_archivo(os.path.join(directorio, "usuarios.json"), {"usuarios": lista})
+    for i, usuario in enumerate(lista):
+        ruta = os.path.join(directorio, "usuarios", usuario["email"], "tareas.json")
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        guardar_archivo(ruta, generar_tareas(tareas_por_usuario, semilla + i))
+    return [usuario["email"] for usuario in lista]
+
+
+# Plantillas de comandos de voz, en la proporción aproximada en que se usan
+_PLANTILLAS_COMANDOS = [
+    ("muestra mis tareas", 4), ("mostrar tareas", 2), ("ayuda", 1), ("modo silencioso", 1),
+    ("ver calendario", 1), ("ver reportes", 1),
+    ("agrega {tarea}", 3), ("agrega {tarea} mañana", 3), ("añade {tarea} para el viernes", 2),
+    ("anota {tarea} en categoria {categoria}", 2), ("crear tarea {tarea} el lunes a las 10", 2),
+    ("agregar tarea {tarea} categoria {categoria} para pasado mañana", 1),
+    ("completar {tarea}", 2), ("marca como hecha {tarea}", 1), ("eliminar {tarea}", 2),
+    ("cambiar fecha de {tarea} a mañana a las 5", 2), ("modificar descripcion de {tarea} a {tarea2}", 1),
+    ("recordar {tarea} para el 15 de {mes}", 1), ("recordatorio {tarea}", 1),
+    ("asignar categoria {categoria} a tarea {tarea}", 1), ("tareas de {categoria}", 1),
+    ("reporte de {mes} de 2025", 1), ("blablabla sin sentido", 1),
+]
+_MESES = ["enero", "marzo", "mayo", "julio", "septiembre", "noviembre"]
+
+
+def generar_comandos(n, semilla=1):
+    """n comandos de voz sintéticos (con repeticiones, como los de un usuario real)."""
+    rnd = random.Random(semilla)
+    plantillas = [plantilla for plantilla, _ in _PLANTILLAS_COMANDOS]
+    pesos = [peso for _, peso in _PLANTILLAS_COMANDOS]
+    categorias = list(CATEGORIAS)
+
+    def tarea():
+        categoria = rnd.choice(categorias)
+        return f"{rnd.choice(VERBOS)} {rnd.choice(CATEGORIAS[categoria])}"
+
+    return [rnd.choices(plantillas, pesos)[0].format(tarea=tarea(), tarea2=tarea(), categoria=rnd.choice(categorias).lower(),
+                                                    mes=rnd.choice(_MESES))
+            for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera usuarios y tareas sintéticos para los benchmarks")
+    parser.add_argument("destino", help="Directorio donde crear usuarios.json y usuarios/")
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--tareas", type=int, default=1000, help="Tareas por usuario")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    os.makedirs(args.destino, exist_ok=True)
+    emails = crear_entorno(args.destino, args.usuarios, args.tareas, args.semilla)
+    print(f"{len(emails)} usuarios con {args.tareas} tareas cada uno en {args.destino} (contraseña: {CLAVE_USUARIOS})")
+
+
+if __name__ == "__main__":
+    main()
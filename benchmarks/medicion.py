@@ -0,0 +1,112 @@
+# benchmarks/medicion.py
+# Latencia por llamada (percentiles) y memoria de pico, con resultados en JSON para comparar ejecuciones.
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource # Solo en Unix: memoria residente máxima del proceso
+except ImportError:
+    resource = None
+
+
+def percentil(ordenadas, p):
+    """Percentil p (0-100) de una lista ya ordenada, por el método del rango más cercano."""
+    if not ordenadas:
+        return None
+    indice = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas) + 0.5) - 1))
+    return ordenadas[indice]
+
+
+def cronometrar(funcion, repeticiones=200, tiempo_max=2.0, minimo=5):
+    """Llama funcion(i) para i = 0, 1, ... y devuelve las duraciones en segundos.
+
+    Se para al llegar a repeticiones o, tras al menos minimo llamadas, al pasar tiempo_max segundos
+    (las operaciones sobre un millón de tareas no pueden repetirse 200 veces).
+    """
+    muestras = []
+    limite = time.perf_counter() + tiempo_max
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        fin = time.perf_counter()
+        muestras.append(fin - inicio)
+        if len(muestras) >= minimo and fin > limite:
+            break
+    return muestras
+
+
+def memoria_pico(funcion, i=0):
+    """Bytes de pico asignados por Python durante una llamada funcion(i) (tracemalloc)."""
+    tracemalloc.start()
+    try:
+        funcion(i)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def resumen(muestras):
+    ordenadas = sorted(muestras)
+    ms = lambda segundos: round(segundos * 1000, 4)
+    return {
+        "n": len(ordenadas),
+        "p50_ms": ms(percentil(ordenadas, 50)),
+        "p95_ms": ms(percentil(ordenadas, 95)),
+        "p99_ms": ms(percentil(ordenadas, 99)),
+        "media_ms": ms(sum(ordenadas) / len(ordenadas)),
+        "min_ms": ms(ordenadas[0]),
+        "max_ms": ms(ordenadas[-1]),
+    }
+
+
+def medir(funcion, repeticiones=200, tiempo_max=2.0, con_memoria=True):
+    """Resumen de latencias de funcion(i) más, si con_memoria, su pico de memoria en KiB."""
+    muestras = cronometrar(funcion, repeticiones, tiempo_max)
+    resultado = resumen(muestras)
+    if con_memoria:
+        # Después de cronometrar (tracemalloc ralentiza mucho las asignaciones) y con el siguiente i,
+        # para que las operaciones que consumen datos (eliminar la tarea i) no repitan uno ya usado
+        resultado["memoria_pico_kib"] = round(memoria_pico(funcion, len(muestras)) / 1024, 1)
+    return resultado
+
+
+def rss_maximo_kib():
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo // 1024 if sys.platform == "darwin" else maximo # macOS lo da en bytes, Linux en KiB
+
+
+def documento(resultados, parametros):
+    """Documento JSON de una ejecución: entorno, parámetros y una entrada por caso medido."""
+    return {
+        "fecha": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": parametros,
+        "rss_maximo_kib": rss_maximo_kib(),
+        "resultados": resultados,
+    }
+
+
+def guardar(ruta, doc):
+    with open(ruta, "w", encoding='utf-8') as archivo:
+        json.dump(doc, archivo, ensure_ascii=False, indent=2)
+
+
+def comparar(anterior, actual, campo="p50_ms"):
+    """Pares (clave del caso, valor anterior, valor actual, actual/anterior) de los casos presentes en ambos."""
+    clave = lambda r: (r["suite"], r["caso"], r.get("tareas"))
+    previos = {clave(r): r for r in anterior["resultados"]}
+    filas = []
+    for r in actual["resultados"]:
+        previo = previos.get(clave(r))
+        if previo is None or not previo.get(campo) or r.get(campo) is None:
+            continue
+        filas.append((clave(r), previo[campo], r[campo], r[campo] / previo[campo]))
+    return filas
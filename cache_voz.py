@@ -0,0 +1,191 @@
+# cache_voz.py
+# Caché en disco del audio sintetizado para las respuestas que se repiten ("Tarea agregada correctamente",
+# "No entendí", ...). utils.ServicioVoz reproduce el clip guardado en lugar de volver a sintetizar, y
+# renderiza (pyttsx3 save_to_file) los textos que ya se han dicho VOCETASKS_CACHE_VOZ_MIN_USOS veces
+# cuando no tiene nada que decir. Configuración:
+#   VOCETASKS_CACHE_VOZ          directorio de los clips (por defecto "cache_voz"; "" la desactiva)
+#   VOCETASKS_CACHE_VOZ_MB       tamaño máximo; al pasarlo se borran los menos usados recientemente (50)
+#   VOCETASKS_CACHE_VOZ_MIN_USOS veces que se dice un texto antes de guardarlo (2)
+#
+# Los clips se reproducen con simpleaudio si está instalado, si no con winsound (Windows), afplay (macOS)
+# o aplay (Linux). Sin ninguno de ellos la caché no se usa.
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+try:
+    import winsound
+except ImportError: # Solo en Windows
+    winsound = None
+
+import trazas
+
+log = trazas.obtener("cache_voz")
+
+DIRECTORIO = os.environ.get("VOCETASKS_CACHE_VOZ", "cache_voz")
+TAMANO_MAX = int(float(os.environ.get("VOCETASKS_CACHE_VOZ_MB", "50")) * 1024 * 1024)
+MIN_USOS = int(os.environ.get("VOCETASKS_CACHE_VOZ_MIN_USOS", "2"))
+LONGITUD_MAX = 200 # Los textos largos (listados de tareas) casi nunca se repiten igual
+EXTENSION = ".wav"
+
+
+class Reproductor:
+    """Reproduce un archivo de audio bloqueando hasta que acaba; detener() lo corta desde otro hilo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_curso = None # simpleaudio.PlayObject o subprocess.Popen
+        self._comando = None
+        if simpleaudio is None and winsound is None:
+            for programa in ("afplay", "aplay") if sys.platform == "darwin" else ("aplay",):
+                ruta = shutil.which(programa)
+                if ruta:
+                    self._comando = [ruta] if programa == "afplay" else [ruta, "-q"]
+                    break
+
+    @property
+    def disponible(self):
+        return simpleaudio is not None or winsound is not None or self._comando is not None
+
+    def reproducir(self, ruta):
+        if winsound is not None and simpleaudio is None:
+            winsound.PlaySound(ruta, winsound.SND_FILENAME | winsound.SND_NODEFAULT)
+            return
+        try:
+            if simpleaudio is not None:
+                with self._lock:
+                    en_curso = self._en_curso = simpleaudio.WaveObject.from_wave_file(ruta).play()
+                en_curso.wait_done()
+            else:
+                with self._lock:
+                    en_curso = self._en_curso = subprocess.Popen(self._comando + [ruta], stdout=subprocess.DEVNULL,
+                                                                 stderr=subprocess.DEVNULL)
+                if en_curso.wait() > 0: # Negativo si lo cortó detener()
+                    raise OSError(f"{self._comando[0]} terminó con código {en_curso.returncode}")
+        finally:
+            with self._lock:
+                self._en_curso = None
+
+    def detener(self):
+        if winsound is not None and simpleaudio is None:
+            winsound.PlaySound(None, 0) # Corta el sonido en curso
+            return
+        with self._lock:
+            en_curso = self._en_curso
+        if en_curso is None:
+            return
+        if simpleaudio is not None:
+            en_curso.stop()
+        else:
+            en_curso.terminate()
+
+
+class CacheAudio:
+    """Clips <sha1(voz, velocidad, texto)>.wav en un directorio, con expulsión LRU por tamaño total.
+
+    El orden de uso se guarda en la fecha de modificación de cada archivo (se actualiza en cada
+    acierto), así que sobrevive entre ejecuciones. La usa solo el hilo de ServicioVoz.
+    """
+
+    def __init__(self, directorio=DIRECTORIO, tamano_max=TAMANO_MAX, min_usos=MIN_USOS):
+        self.directorio = directorio
+        self.tamano_max = tamano_max
+        self.min_usos = min_usos
+        self._clips = OrderedDict() # clave -> tamaño, del menos al más reciente
+        self._total = 0
+        self._usos = Counter()
+        self._cargado = False
+
+    def _cargar(self):
+        self._cargado = True
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            entradas = [e for e in os.scandir(self.directorio) if e.name.endswith(EXTENSION) and e.is_file()]
+        except OSError as e:
+            log.warning("Caché de voz no disponible en '%s': %s", self.directorio, e)
+            self.directorio = ""
+            return
+        for entrada in sorted(entradas, key=lambda e: e.stat().st_mtime):
+            tamano = entrada.stat().st_size
+            self._clips[entrada.name[:-len(EXTENSION)]] = tamano
+            self._total += tamano
+        self._expulsar()
+
+    @staticmethod
+    def clave(texto, voz, velocidad):
+        return hashlib.sha1(f"{voz}\0{velocidad}\0{texto}".encode("utf-8")).hexdigest()
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, clave + EXTENSION)
+
+    def ruta_temporal(self, clave):
+        """Donde se escribe el clip antes de agregar(): uno a medio escribir nunca parece válido."""
+        return self.ruta(clave) + ".parcial"
+
+    def buscar(self, clave):
+        """Ruta del clip si está en caché (y lo marca como usado); None si no."""
+        if not self._cargado:
+            self._cargar()
+        if clave not in self._clips:
+            return None
+        ruta = self.ruta(clave)
+        try:
+            os.utime(ruta)
+        except OSError: # Borrado por fuera
+            self._total -= self._clips.pop(clave)
+            return None
+        self._clips.move_to_end(clave)
+        return ruta
+
+    def anotar_uso(self, clave, texto):
+        """Cuenta que se ha dicho texto sin caché; True cuando merece guardarse."""
+        if not self.directorio or len(texto) > LONGITUD_MAX:
+            return False
+        self._usos[clave] += 1
+        return self._usos[clave] >= self.min_usos
+
+    def agregar(self, clave):
+        """Incorpora el clip recién escrito en ruta_temporal(clave); lo descarta si salió vacío."""
+        temporal = self.ruta_temporal(clave)
+        try:
+            tamano = os.path.getsize(temporal)
+            if tamano <= 44: # Solo la cabecera WAV: el controlador no escribió audio
+                os.remove(temporal)
+                return False
+            os.replace(temporal, self.ruta(clave))
+        except OSError:
+            return False
+        self._total += tamano - self._clips.pop(clave, 0)
+        self._clips[clave] = tamano
+        self._usos.pop(clave, None)
+        self._expulsar()
+        return True
+
+    def descartar(self, clave):
+        """Quita un clip que no se pudo reproducir (o uno a medio escribir)."""
+        self._total -= self._clips.pop(clave, 0)
+        for ruta in (self.ruta(clave), self.ruta_temporal(clave)):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+    def _expulsar(self):
+        while self._total > self.tamano_max and self._clips:
+            clave, tamano = self._clips.popitem(last=False)
+            self._total -= tamano
+            try:
+                os.remove(self.ruta(clave))
+            except OSError:
+                pass
+            log.debug("Clip expulsado de la caché de voz: %s", clave)
@@ -5,6 +5,18 @@ import os
 from datetime import datetime, timedelta # Asegurarse de que timedelta esté importado
 import html
 
+from serializacion import guardar_archivo
+from task_store import copia_tarea, get_task_store, limite_dt, normalizar_descripcion, nuevo_id_tarea
+import trazas
+
+log = trazas.obtener("commands")
+
+# Tareas nombradas por voz: si la descripción no coincide exactamente, se acepta la más parecida con al
+# menos esta puntuación (0-1, ver task_store.IndiceTrigramas)...
+UMBRAL_COINCIDENCIA = float(os.environ.get("VOCETASKS_UMBRAL_COINCIDENCIA", "0.6"))
+# ...salvo que otra quede a menos de este margen: entonces se pregunta a cuál se refiere
+MARGEN_AMBIGUEDAD = 0.05
+
 # --- Funciones de Manejo de Archivos y Tareas (sin cambios) ---
 # ... (mantener las funciones existentes: crear_archivo_tareas_si_no_existe, agregar_tarea, etc.)
 
@@ -14,62 +26,68 @@ def crear_archivo_tareas_si_no_existe(ruta_archivo):
     os.makedirs(user_dir, exist_ok=True) # Crea el directorio si no existe
     if not os.path.exists(ruta_archivo):
         try:
-            with open(ruta_archivo, "w", encoding='utf-8') as file:
-                json.dump({"tareas": []}, file, indent=4, ensure_ascii=False)
+            guardar_archivo(ruta_archivo, {"tareas": []})
             print(f"Archivo de tareas creado en: {ruta_archivo}")
         except IOError as e:
             print(f"Error al crear el archivo de tareas {ruta_archivo}: {e}")
 
+def _crear_tarea(tarea, categoria, fecha_limite, completada):
+    """Construye el diccionario de una tarea nueva validando la fecha límite."""
+    # Validar y formatear fecha límite si existe
+    fecha_limite_str = None
+    if fecha_limite:
+         try:
+             # Intentar parsear la fecha y hora
+             dt_obj = datetime.strptime(fecha_limite, '%Y-%m-%d %H:%M:%S')
+             fecha_limite_str = dt_obj.strftime('%Y-%m-%d %H:%M:%S') # Reformatear por si acaso
+         except ValueError:
+             print(f"Advertencia: Formato de fecha límite inválido: {fecha_limite}. No se guardará la fecha.")
+             fecha_limite_str = None # Ignorar fecha inválida
+
+    return {
+        "id": nuevo_id_tarea(), # Identificador estable (la descripción puede cambiar)
+        "descripcion": tarea.strip(),
+        "categoria": categoria.strip() if categoria else "General", # Categoría por defecto
+        "fecha_creacion": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "fecha_limite": fecha_limite_str,
+        "completada": completada # Estado inicial
+    }
+
+def _preparar_foto(store, ruta_archivo):
+    """Lee las tareas (desde la caché si el archivo no cambió) y, si el archivo falta o está corrupto, lo reinicia vacío."""
+    foto_valida = True
+    try:
+        data = store.load()
+        # Asegurar que 'tareas' exista y sea una lista
+        if "tareas" not in data or not isinstance(data["tareas"], list):
+            data["tareas"] = []
+            foto_valida = False
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Error al leer {ruta_archivo} o archivo corrupto ({e}). Reiniciando.")
+        data = {"tareas": []} # Reiniciar si hay error
+        foto_valida = False
+    if not foto_valida:
+        # Archivo inexistente o corrupto: escribir una foto nueva antes de anotar operaciones
+        store.save(data)
+
 def agregar_tarea(tarea, categoria, fecha_limite, email, completada=False):
     """Agrega una nueva tarea a la lista del usuario."""
     ruta_archivo = f"usuarios/{email}/tareas.json"
     crear_archivo_tareas_si_no_existe(ruta_archivo) # Asegura que el archivo y directorio existan
+    store = get_task_store(email)
 
-    try:
-        # Leer el archivo actual
-        try:
-            with open(ruta_archivo, "r", encoding='utf-8') as file:
-                data = json.load(file)
-                # Asegurar que 'tareas' exista y sea una lista
-                if "tareas" not in data or not isinstance(data["tareas"], list):
-                    data["tareas"] = []
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Error al leer {ruta_archivo} o archivo corrupto ({e}). Reiniciando.")
-            data = {"tareas": []} # Reiniciar si hay error
-
+    def calcular(store):
         # Verificar si la tarea ya existe (insensible a mayúsculas/minúsculas y espacios)
-        tareas_desc = [t["descripcion"].strip().lower() for t in data.get("tareas", []) if "descripcion" in t]
-        if tarea.strip().lower() in tareas_desc:
-            return False, f"La tarea '{tarea}' ya existe en tu lista."
-
-        # Validar y formatear fecha límite si existe
-        fecha_limite_str = None
-        if fecha_limite:
-             try:
-                 # Intentar parsear la fecha y hora
-                 dt_obj = datetime.strptime(fecha_limite, '%Y-%m-%d %H:%M:%S')
-                 fecha_limite_str = dt_obj.strftime('%Y-%m-%d %H:%M:%S') # Reformatear por si acaso
-             except ValueError:
-                 print(f"Advertencia: Formato de fecha límite inválido: {fecha_limite}. No se guardará la fecha.")
-                 fecha_limite_str = None # Ignorar fecha inválida
-
-        # Crear la nueva tarea
-        nueva_tarea = {
-            "descripcion": tarea.strip(),
-            "categoria": categoria.strip() if categoria else "General", # Categoría por defecto
-            "fecha_creacion": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "fecha_limite": fecha_limite_str,
-            "completada": completada # Estado inicial
-        }
-
-        # Añadir la nueva tarea a la lista
-        data["tareas"].append(nueva_tarea)
+        if store.buscar_por_descripcion(tarea) is not None:
+            return None, (False, f"La tarea '{tarea}' ya existe en tu lista.")
+        # Añadir la nueva tarea (se anota en el journal, sin reescribir el archivo completo)
+        return {"op": "add", "tarea": _crear_tarea(tarea, categoria, fecha_limite, completada)}, (True, f"Tarea '{tarea}' agregada correctamente.")
 
-        # Guardar los datos actualizados en el archivo
-        with open(ruta_archivo, "w", encoding='utf-8') as file:
-            json.dump(data, file, indent=4, ensure_ascii=False)
-
-        return True, f"Tarea '{tarea}' agregada correctamente."
+    try:
+        with store.lock:
+            _preparar_foto(store, ruta_archivo)
+            # Si otro proceso (consola/GUI) escribe entretanto, la comprobación se repite sobre sus datos
+            return store.mutar(calcular)
 
     except IOError as e:
         print(f"Error de E/S al agregar tarea en {ruta_archivo}: {e}")
@@ -79,39 +97,53 @@ def agregar_tarea(tarea, categoria, fecha_limite, email, completada=False):
         return False, "Error interno inesperado al agregar la tarea."
 
 
+def _resolver_tarea(store, clave):
+    """(tarea, None) con la tarea nombrada por clave (id, descripción exacta o parecida) o (None, motivo).
+
+    motivo es el mensaje para el usuario cuando varias tareas encajan casi igual de bien, o None si
+    ninguna se parece lo suficiente.
+    """
+    tarea = store.buscar(clave)
+    if tarea is not None:
+        return tarea, None
+    candidatos = store.buscar_aproximada(clave)
+    if not candidatos or candidatos[0][0] < UMBRAL_COINCIDENCIA:
+        return None, None
+    mejor = candidatos[0][0]
+    parecidas = [t.get("descripcion", "") for puntuacion, t in candidatos if puntuacion >= mejor - MARGEN_AMBIGUEDAD]
+    if len(parecidas) > 1:
+        opciones = ", ".join(f"'{d}'" for d in parecidas[:-1]) + f" o '{parecidas[-1]}'"
+        return None, f"No sé a qué tarea te refieres con '{clave}': ¿{opciones}? Repite el comando con la descripción completa."
+    log.debug("'%s' resuelta como '%s' (puntuación %.2f)", clave, candidatos[0][1].get("descripcion"), mejor)
+    return candidatos[0][1], None
+
+
 def eliminar_tarea(tarea_a_eliminar, email):
-    """Elimina una tarea de la lista del usuario."""
+    """Elimina una tarea de la lista del usuario (identificada por id o por descripción)."""
     ruta_archivo = f"usuarios/{email}/tareas.json"
     if not os.path.exists(ruta_archivo):
         return False, "No se encontraron tareas para este usuario."
+    store = get_task_store(email)
 
     try:
-        # Leer el archivo
-        with open(ruta_archivo, "r", encoding='utf-8') as file:
-            data = json.load(file)
+        with store.lock:
+            # Leer las tareas
+            data = store.load()
             if "tareas" not in data or not isinstance(data["tareas"], list):
                 print(f"Advertencia: Formato inválido en {ruta_archivo}. Reiniciando.")
                 data = {"tareas": []}
 
-        tareas_originales = data.get("tareas", [])
-        tarea_encontrada = False
-        # Crear nueva lista sin la tarea a eliminar (insensible a mayúsculas/minúsculas)
-        nuevas_tareas = []
-        for t in tareas_originales:
-            if "descripcion" in t and t["descripcion"].strip().lower() == tarea_a_eliminar.strip().lower():
-                tarea_encontrada = True
-                print(f"Tarea '{tarea_a_eliminar}' encontrada para eliminar.")
-            else:
-                nuevas_tareas.append(t)
-
-        if tarea_encontrada:
-            data["tareas"] = nuevas_tareas
-            # Guardar la lista actualizada
-            with open(ruta_archivo, "w", encoding='utf-8') as file:
-                json.dump(data, file, indent=4, ensure_ascii=False)
-            return True, f"Tarea '{tarea_a_eliminar}' eliminada correctamente."
-        else:
-            return False, f"La tarea '{tarea_a_eliminar}' no se encontró en tu lista."
+            def calcular(store):
+                # Buscar la tarea a eliminar por id o descripción (exacta o, si no, la más parecida)
+                tarea_encontrada, motivo = _resolver_tarea(store, tarea_a_eliminar)
+                if tarea_encontrada is None:
+                    return None, (False, motivo or f"La tarea '{tarea_a_eliminar}' no se encontró en tu lista.")
+                descripcion = tarea_encontrada.get("descripcion", tarea_a_eliminar)
+                log.debug("Tarea %r encontrada para eliminar.", descripcion)
+                # Anotar la eliminación en el journal
+                return {"op": "delete", "id": tarea_encontrada["id"]}, (True, f"Tarea '{descripcion}' eliminada correctamente.")
+
+            return store.mutar(calcular)
 
     except (json.JSONDecodeError, IOError) as e:
         print(f"Error al leer/escribir o archivo corrupto {ruta_archivo} al eliminar: {e}")
@@ -122,16 +154,18 @@ def eliminar_tarea(tarea_a_eliminar, email):
 
 
 def mostrar_tareas(email):
-    """Muestra todas las tareas del usuario, devolviendo dict {tareas: []} o vacío si falla."""
+    """Muestra todas las tareas del usuario, devolviendo dict {tareas: []} o vacío si falla.
+
+    El diccionario devuelto es una copia: modificarlo no afecta al almacén de tareas.
+    """
     ruta_archivo = f"usuarios/{email}/tareas.json"
     try:
-        with open(ruta_archivo, "r", encoding='utf-8') as file:
-            data = json.load(file)
-            # Validar estructura básica
-            if not isinstance(data, dict) or "tareas" not in data or not isinstance(data["tareas"], list):
-                print(f"Advertencia: Formato inesperado en {ruta_archivo} para {email}. Devolviendo vacío.")
-                return {"tareas": []}
-            return data # Devuelve el diccionario completo {"tareas": [...]}
+        data = get_task_store(email).instantanea()
+        # Validar estructura básica
+        if not isinstance(data, dict) or "tareas" not in data or not isinstance(data["tareas"], list):
+            print(f"Advertencia: Formato inesperado en {ruta_archivo} para {email}. Devolviendo vacío.")
+            return {"tareas": []}
+        return data # Devuelve el diccionario completo {"tareas": [...]}
     except FileNotFoundError:
         print(f"Archivo de tareas no encontrado para {email}. Devolviendo lista vacía.")
         # Devolver estructura esperada aunque esté vacía
@@ -144,73 +178,78 @@ def mostrar_tareas(email):
         return {"tareas": []}
 
 
+def obtener_tarea(clave, email):
+    """Devuelve (una copia de) la tarea con ese id o descripción, o None si no existe o no se puede leer."""
+    try:
+        tarea = get_task_store(email).buscar(clave)
+        return copia_tarea(tarea) if tarea is not None else None
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    except Exception as e:
+        print(f"Error inesperado al buscar la tarea '{clave}' para {email}: {e}")
+        return None
+
+
 def modificar_tarea(nombre_tarea_original, nuevos_datos_tarea, email):
-    """Modifica una tarea existente con nuevos datos."""
+    """Modifica una tarea existente (identificada por id o por descripción) con nuevos datos."""
     ruta_archivo = f"usuarios/{email}/tareas.json"
     if not os.path.exists(ruta_archivo):
         return False, "No se encontraron tareas para este usuario."
+    store = get_task_store(email)
+
+    # Recoger los campos presentes en nuevos_datos_tarea (no dependen del estado guardado)
+    cambios, error_cambios = {}, None
+    if "descripcion" in nuevos_datos_tarea:
+         nueva_desc = nuevos_datos_tarea["descripcion"].strip()
+         if nueva_desc: # No permitir descripción vacía
+             cambios["descripcion"] = nueva_desc
+         else:
+             error_cambios = "La nueva descripción no puede estar vacía."
+
+    if "categoria" in nuevos_datos_tarea:
+        cambios["categoria"] = nuevos_datos_tarea["categoria"].strip() if nuevos_datos_tarea["categoria"] else "General"
+
+    if "fecha_limite" in nuevos_datos_tarea:
+        nueva_fecha_limite_str = nuevos_datos_tarea["fecha_limite"]
+        if nueva_fecha_limite_str:
+             try:
+                 # Validar y reformatear la nueva fecha
+                 dt_obj = datetime.strptime(nueva_fecha_limite_str, '%Y-%m-%d %H:%M:%S')
+                 cambios["fecha_limite"] = dt_obj.strftime('%Y-%m-%d %H:%M:%S')
+             except ValueError:
+                 print(f"Advertencia: Formato de nueva fecha inválido: {nueva_fecha_limite_str}. No se actualiza la fecha.")
+                 # Decidir si mantener la anterior o ponerla a None
+                 # Mantengamos la anterior por ahora si la nueva es inválida
+                 pass
+        else:
+             # Si se pasa una cadena vacía o None, quitar la fecha límite
+             cambios["fecha_limite"] = None
+
+    if "completada" in nuevos_datos_tarea:
+        # Asegurarse de que sea un booleano
+        cambios["completada"] = bool(nuevos_datos_tarea["completada"])
+
+    def calcular(store):
+        # Buscar la tarea por id o descripción original (exacta o, si no, la más parecida)
+        tarea_a_modificar, motivo = _resolver_tarea(store, nombre_tarea_original)
+        if tarea_a_modificar is None:
+            return None, (False, motivo or f"La tarea '{nombre_tarea_original}' no se encontró para modificar.")
+        if error_cambios:
+            return None, (False, error_cambios)
+        log.debug("Modificando tarea: %s", tarea_a_modificar)
+        descripcion = tarea_a_modificar.get("descripcion", nombre_tarea_original)
+        # Anotar los cambios en el journal
+        return {"op": "modify", "id": tarea_a_modificar["id"], "cambios": cambios}, (True, f"Tarea '{descripcion}' modificada correctamente.")
 
     try:
-        # Leer archivo
-        with open(ruta_archivo, "r", encoding='utf-8') as file:
-            data = json.load(file)
+        with store.lock:
+            # Leer las tareas
+            data = store.load()
             if "tareas" not in data or not isinstance(data["tareas"], list):
-                 print(f"Advertencia: Formato inválido en {ruta_archivo} al modificar. Reiniciando.")
-                 data = {"tareas": []}
+                 print(f"Advertencia: Formato inválido en {ruta_archivo} al modificar.")
+                 return False, f"La tarea '{nombre_tarea_original}' no se encontró para modificar."
 
-        tareas = data.get("tareas", [])
-        tarea_encontrada_index = -1
-        # Buscar la tarea por descripción original (insensible a mayúsculas/minúsculas)
-        nombre_original_lower = nombre_tarea_original.strip().lower()
-        for i, t in enumerate(tareas):
-            if "descripcion" in t and t["descripcion"].strip().lower() == nombre_original_lower:
-                tarea_encontrada_index = i
-                break
-
-        if tarea_encontrada_index != -1:
-            tarea_a_modificar = tareas[tarea_encontrada_index]
-            print(f"Modificando tarea: {tarea_a_modificar}")
-
-            # Actualizar campos si están presentes en nuevos_datos_tarea
-            if "descripcion" in nuevos_datos_tarea:
-                 nueva_desc = nuevos_datos_tarea["descripcion"].strip()
-                 if nueva_desc: # No permitir descripción vacía
-                     tarea_a_modificar["descripcion"] = nueva_desc
-                 else:
-                     return False, "La nueva descripción no puede estar vacía."
-
-            if "categoria" in nuevos_datos_tarea:
-                tarea_a_modificar["categoria"] = nuevos_datos_tarea["categoria"].strip() if nuevos_datos_tarea["categoria"] else "General"
-
-            if "fecha_limite" in nuevos_datos_tarea:
-                nueva_fecha_limite_str = nuevos_datos_tarea["fecha_limite"]
-                if nueva_fecha_limite_str:
-                     try:
-                         # Validar y reformatear la nueva fecha
-                         dt_obj = datetime.strptime(nueva_fecha_limite_str, '%Y-%m-%d %H:%M:%S')
-                         tarea_a_modificar["fecha_limite"] = dt_obj.strftime('%Y-%m-%d %H:%M:%S')
-                     except ValueError:
-                         print(f"Advertencia: Formato de nueva fecha inválido: {nueva_fecha_limite_str}. No se actualiza la fecha.")
-                         # Decidir si mantener la anterior o ponerla a None
-                         # Mantengamos la anterior por ahora si la nueva es inválida
-                         pass
-                else:
-                     # Si se pasa una cadena vacía o None, quitar la fecha límite
-                     tarea_a_modificar["fecha_limite"] = None
-
-            if "completada" in nuevos_datos_tarea:
-                # Asegurarse de que sea un booleano
-                tarea_a_modificar["completada"] = bool(nuevos_datos_tarea["completada"])
-
-            print(f"Tarea después de modificar: {tarea_a_modificar}")
-
-            # Guardar los cambios
-            with open(ruta_archivo, "w", encoding='utf-8') as file:
-                json.dump(data, file, indent=4, ensure_ascii=False)
-
-            return True, f"Tarea '{nombre_tarea_original}' modificada correctamente."
-        else:
-            return False, f"La tarea '{nombre_tarea_original}' no se encontró para modificar."
+            return store.mutar(calcular)
 
     except (json.JSONDecodeError, IOError) as e:
         print(f"Error al leer/escribir o archivo corrupto {ruta_archivo} al modificar: {e}")
@@ -221,41 +260,32 @@ def modificar_tarea(nombre_tarea_original, nuevos_datos_tarea, email):
 
 
 def marcar_como_completada(tarea_a_completar, email):
-    """Marca una tarea como completada en la lista."""
+    """Marca una tarea como completada en la lista (identificada por id o por descripción)."""
     ruta_archivo = f"usuarios/{email}/tareas.json"
     if not os.path.exists(ruta_archivo):
         return False, "No se encontraron tareas para este usuario."
+    store = get_task_store(email)
 
     try:
-        with open(ruta_archivo, "r+", encoding='utf-8') as file: # Abrir en modo lectura/escritura
-            data = json.load(file)
+        with store.lock:
+            data = store.load()
             if "tareas" not in data or not isinstance(data["tareas"], list):
                  print(f"Advertencia: Formato inválido en {ruta_archivo} al completar. Reiniciando.")
                  data = {"tareas": []}
 
-            tareas = data.get("tareas", [])
-            tarea_encontrada = False
-            tarea_a_completar_lower = tarea_a_completar.strip().lower()
-
-            for t in tareas:
-                 if "descripcion" in t and t["descripcion"].strip().lower() == tarea_a_completar_lower:
-                     if not t.get("completada", False): # Marcar solo si no estaba ya completada
-                         t["completada"] = True
-                         tarea_encontrada = True
-                         print(f"Marcando como completada: {t}")
-                         break # Terminar bucle una vez encontrada y marcada
-                     else:
-                         # Si ya estaba completada, considerarlo éxito pero informar
-                         return True, f"La tarea '{tarea_a_completar}' ya estaba marcada como completada."
-
-            if tarea_encontrada:
-                # Rebobinar y escribir todo el archivo actualizado
-                file.seek(0)
-                json.dump(data, file, indent=4, ensure_ascii=False)
-                file.truncate() # Asegurar que no queden restos del archivo viejo
-                return True, f"Tarea '{tarea_a_completar}' marcada como completada."
-            else:
-                return False, f"La tarea '{tarea_a_completar}' no se encontró en tu lista."
+            def calcular(store):
+                t, motivo = _resolver_tarea(store, tarea_a_completar)
+                if t is None:
+                    return None, (False, motivo or f"La tarea '{tarea_a_completar}' no se encontró en tu lista.")
+                descripcion = t.get("descripcion", tarea_a_completar)
+                if t.get("completada", False):
+                    # Si ya estaba completada, considerarlo éxito pero informar
+                    return None, (True, f"La tarea '{descripcion}' ya estaba marcada como completada.")
+                log.debug("Marcando como completada: %s", t)
+                # Anotar el cambio en el journal (una línea, en vez de reescribir todas las tareas)
+                return {"op": "complete", "id": t["id"]}, (True, f"Tarea '{descripcion}' marcada como completada.")
+
+            return store.mutar(calcular)
 
     except (json.JSONDecodeError, IOError) as e:
         print(f"Error al leer/escribir o archivo corrupto {ruta_archivo} al completar: {e}")
@@ -264,6 +294,143 @@ def marcar_como_completada(tarea_a_completar, email):
         print(f"Error inesperado al marcar como completada: {e}")
         return False, "Error interno inesperado al marcar la tarea como completada."
 
+# --- Operaciones por lotes: una lectura, una escritura (una línea de journal / una transacción) ---
+
+def _resumen_lote(resultados, accion):
+    """Devuelve (exito, mensaje, resultados); exito solo si todos los elementos se aplicaron."""
+    correctos = sum(1 for exito, _ in resultados if exito)
+    return correctos == len(resultados), f"{correctos} de {len(resultados)} tareas {accion}.", resultados
+
+
+def agregar_tareas_lote(tareas, email):
+    """Agrega varias tareas leyendo y guardando el archivo una sola vez.
+
+    tareas es una lista de descripciones o de diccionarios con "descripcion" y, opcionalmente,
+    "categoria", "fecha_limite" y "completada". Devuelve (exito, mensaje, resultados), con un
+    (exito, mensaje) por tarea en el mismo orden. Si falla la escritura no se agrega ninguna.
+    """
+    ruta_archivo = f"usuarios/{email}/tareas.json"
+    crear_archivo_tareas_si_no_existe(ruta_archivo)
+    store = get_task_store(email)
+
+    def calcular(store):
+        resultados, ops, nuevas = [], [], set()
+        for item in tareas:
+            if isinstance(item, str):
+                item = {"descripcion": item}
+            descripcion = (item.get("descripcion") or "").strip() if isinstance(item, dict) else ""
+            if not descripcion:
+                resultados.append((False, "La descripción no puede estar vacía."))
+                continue
+            # Duplicados contra la lista guardada y contra las tareas anteriores del mismo lote
+            desc_norm = normalizar_descripcion(descripcion)
+            if desc_norm in nuevas or store.buscar_por_descripcion(descripcion) is not None:
+                resultados.append((False, f"La tarea '{descripcion}' ya existe en tu lista."))
+                continue
+            nuevas.add(desc_norm)
+            ops.append({"op": "add", "tarea": _crear_tarea(descripcion, item.get("categoria"), item.get("fecha_limite"), item.get("completada", False))})
+            resultados.append((True, f"Tarea '{descripcion}' agregada correctamente."))
+        return ({"op": "lote", "ops": ops} if ops else None), resultados
+
+    try:
+        with store.lock:
+            _preparar_foto(store, ruta_archivo)
+            return _resumen_lote(store.mutar(calcular), "agregadas")
+
+    except Exception as e:
+        print(f"Error al agregar tareas por lote para {email}: {e}")
+        return False, "Error interno al guardar las tareas; no se agregó ninguna.", [(False, "No se guardó.")] * len(tareas)
+
+
+def _lote_sobre_existentes(claves, email, tipo, accion_singular, accion_plural):
+    """Resuelve cada clave (id o descripción) con el índice y aplica todas las operaciones de una vez."""
+    ruta_archivo = f"usuarios/{email}/tareas.json"
+    if not os.path.exists(ruta_archivo):
+        return False, "No se encontraron tareas para este usuario.", [(False, "No se encontró.")] * len(claves)
+    store = get_task_store(email)
+
+    def calcular(store):
+        resultados, ops, vistas = [], [], set()
+        for clave in claves:
+            tarea = store.buscar(clave)
+            if tarea is None or (tipo == "delete" and tarea["id"] in vistas):
+                resultados.append((False, f"La tarea '{clave}' no se encontró en tu lista."))
+                continue
+            descripcion = tarea.get("descripcion", clave)
+            if tipo == "complete" and (tarea.get("completada", False) or tarea["id"] in vistas):
+                resultados.append((True, f"La tarea '{descripcion}' ya estaba marcada como completada."))
+                continue
+            vistas.add(tarea["id"])
+            ops.append({"op": tipo, "id": tarea["id"]})
+            resultados.append((True, f"Tarea '{descripcion}' {accion_singular} correctamente."))
+        return ({"op": "lote", "ops": ops} if ops else None), resultados
+
+    try:
+        return _resumen_lote(store.mutar(calcular), accion_plural)
+
+    except Exception as e:
+        print(f"Error en la operación por lote '{tipo}' para {email}: {e}")
+        return False, "Error interno al guardar los cambios; no se aplicó ninguno.", [(False, "No se guardó.")] * len(claves)
+
+
+def marcar_completadas_lote(claves, email):
+    """Marca como completadas varias tareas (ids o descripciones). Devuelve (exito, mensaje, resultados)."""
+    return _lote_sobre_existentes(claves, email, "complete", "marcada como completada", "marcadas como completadas")
+
+
+def eliminar_tareas_lote(claves, email):
+    """Elimina varias tareas (ids o descripciones). Devuelve (exito, mensaje, resultados)."""
+    return _lote_sobre_existentes(claves, email, "delete", "eliminada", "eliminadas")
+
+
+def consolidar_tareas(email):
+    """Vuelca el journal de cambios en tareas.json (p.ej. antes de subirlo a Drive)."""
+    if not os.path.exists(f"usuarios/{email}/tareas.json"):
+        return False, "No se encontraron tareas para este usuario."
+    try:
+        get_task_store(email).compact()
+        return True, "Tareas consolidadas correctamente."
+    except Exception as e:
+        print(f"Error inesperado al consolidar tareas para {email}: {e}")
+        return False, "Error interno al consolidar las tareas."
+
+def recargar_tareas(email):
+    """Vuelve a leer tareas.json después de reemplazarlo por fuera (p.ej. al descargarlo de Drive)."""
+    try:
+        get_task_store(email).recargar()
+        return True, "Tareas recargadas correctamente."
+    except Exception as e:
+        print(f"Error inesperado al recargar tareas para {email}: {e}")
+        return False, "Error interno al recargar las tareas."
+
+def _consultar_tareas(email, consulta, *args):
+    """Ejecuta una consulta del almacén de tareas con el mismo manejo de errores que mostrar_tareas."""
+    try:
+        return getattr(get_task_store(email), consulta)(*args)
+    except FileNotFoundError:
+        print(f"Archivo de tareas no encontrado para {email}. Devolviendo lista vacía.")
+    except json.JSONDecodeError:
+        print(f"Error: Archivo de tareas corrupto para {email}. Devolviendo lista vacía.")
+    except Exception as e:
+        print(f"Error inesperado al consultar tareas ({consulta}) para {email}: {e}")
+    return []
+
+
+def mostrar_tareas_categoria(categoria, email):
+    """Devuelve la lista de tareas de una categoría (insensible a mayúsculas/minúsculas)."""
+    return _consultar_tareas(email, "tareas_por_categoria", categoria)
+
+
+def tareas_con_fecha_limite(email, inicio_dt, fin_dt):
+    """Devuelve las tareas con fecha límite entre dos datetime (inclusive), ordenadas por fecha límite."""
+    return _consultar_tareas(email, "tareas_con_limite_entre", inicio_dt, fin_dt)
+
+
+def primeras_tareas_con_fecha(email, n=5):
+    """Devuelve (las n tareas con fecha límite más temprana, total de tareas con fecha límite)."""
+    resultado = _consultar_tareas(email, "primeras_con_limite", n)
+    return resultado if resultado else ([], 0)
+
 # --- Nueva Función de Reporte Genérica ---
 def generar_reporte(periodo_tipo, fecha_inicio, fecha_fin, email):
     """
@@ -291,30 +458,8 @@ def generar_reporte(periodo_tipo, fecha_inicio, fecha_fin, email):
 
     try:
         # Leer datos de tareas
-        tareas_data = mostrar_tareas(email) # Reutilizar función de carga segura
-        tareas = tareas_data.get("tareas", [])
-
-        tareas_del_periodo = []
-        # Convertir fechas de inicio/fin a datetime para comparación completa (incluyendo hora 00:00 y 23:59:59)
-        inicio_dt = datetime.combine(fecha_inicio, datetime.min.time())
-        fin_dt = datetime.combine(fecha_fin, datetime.max.time())
-
-        for tarea in tareas:
-            fecha_ref_str = tarea.get("fecha_limite") or tarea.get("fecha_creacion")
-            if fecha_ref_str:
-                try:
-                    fecha_obj = datetime.strptime(fecha_ref_str, '%Y-%m-%d %H:%M:%S')
-                    # Filtrar si la fecha de la tarea está dentro del rango [inicio_dt, fin_dt]
-                    if inicio_dt <= fecha_obj <= fin_dt:
-                        tareas_del_periodo.append(tarea)
-                except ValueError:
-                    # Podríamos intentar parsear solo la fecha si la hora falla
-                    try:
-                       fecha_obj_date = datetime.strptime(fecha_ref_str.split(" ")[0], '%Y-%m-%d').date()
-                       if fecha_inicio <= fecha_obj_date <= fecha_fin:
-                           tareas_del_periodo.append(tarea)
-                    except ValueError:
-                        pass # Ignorar tareas con formato de fecha inválido
+        # Filtrar por período en el almacén (con el backend SQLite la consulta usa el índice de fechas)
+        tareas_del_periodo = _consultar_tareas(email, "tareas_en_periodo", fecha_inicio, fecha_fin)
 
         # Ordenar tareas del período
         tareas_del_periodo.sort(key=lambda t: (
@@ -464,15 +609,11 @@ def generar_reporte(periodo_tipo, fecha_inicio, fecha_fin, email):
 
                 # Verificar si está vencida (comparando con la fecha actual, no con el fin del período)
                 is_overdue = False
-                if tarea.get("fecha_limite"):
-                     try:
-                         limite_dt = datetime.strptime(tarea.get("fecha_limite"), '%Y-%m-%d %H:%M:%S').date()
-                         if limite_dt < now_date: # Comparar con hoy
-                             status_class = "status-overdue"
-                             icon = "✕" # Icono vencido
-                             is_overdue = True
-                     except ValueError:
-                         pass # Ignorar error de formato
+                limite = limite_dt(tarea) # Ya interpretada al cargar (None si falta o es inválida)
+                if limite is not None and limite.date() < now_date: # Comparar con hoy
+                     status_class = "status-overdue"
+                     icon = "✕" # Icono vencido
+                     is_overdue = True
 
                 reporte_html += f"""
                      <li class="{status_class}">
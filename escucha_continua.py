@@ -0,0 +1,230 @@
+# escucha_continua.py
+# Modo manos libres: el micrófono se escucha sin parar y cada frase se reconoce y se entrega como comando,
+# sin pulsar el botón ni esperar al aviso de la consola.
+#
+#   hilo CapturaAudio     lee el micrófono bloque a bloque y lo escribe en un AnilloAudio (búfer circular
+#                         de tamaño fijo); no hace nada más, así que nunca se pierde audio del dispositivo
+#   hilo SegmentacionVoz  lee del anillo, separa las frases por energía (RMS sobre el umbral calibrado del
+#                         usuario, con un poco de audio previo y fin tras una pausa), las reconoce con el
+#                         motor del usuario y llama a al_reconocer(texto)
+#
+# La captura sigue mientras se reconoce una frase y mientras se ejecuta el comando anterior (en la GUI,
+# en el hilo de VoiceCommandWorker), así que en un dictado de varias tareas no se espera a cada una.
+# Mientras el asistente habla se escribe silencio en el anillo, para que no se escuche a sí mismo.
+#
+# Con palabra de activación (VOCETASKS_PALABRA_ACTIVACION, por defecto "asistente"; "" la desactiva)
+# solo cuentan las frases que empiezan por ella ("asistente, agrega pan") o la que sigue a decirla sola.
+
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    import audioop
+except ImportError: # Python 3.13+ sin audioop-lts
+    audioop = None
+
+import speech_recognition as sr
+
+import reconocimiento
+import trazas
+import utils
+
+log = trazas.obtener("escucha_continua")
+
+PALABRA_ACTIVACION = os.environ.get("VOCETASKS_PALABRA_ACTIVACION", "asistente").strip().lower()
+ESPERA_TRAS_ACTIVACION_S = 8.0 # Tras decir solo la palabra de activación, cuánto se espera el comando
+CAPACIDAD_ANILLO_S = 30.0
+AUDIO_PREVIO_S = 0.3 # Se añade al principio de cada frase: el inicio de la primera sílaba queda bajo el umbral
+PAUSA_FIN_S = 0.8 # Silencio que cierra una frase (como pause_threshold de speech_recognition)
+DURACION_MIN_S = 0.3 # Más corto es un golpe o un chasquido
+DURACION_MAX_S = 15.0
+
+
+class AnilloAudio:
+    """Búfer circular de bytes con un escritor y un lector en hilos distintos.
+
+    Si el lector se retrasa más que la capacidad, se pisa el audio más antiguo (y se cuenta en perdidos).
+    """
+
+    def __init__(self, capacidad):
+        self._datos = bytearray(capacidad)
+        self.capacidad = capacidad
+        self._escritos = 0 # Totales desde el principio: posición = total % capacidad
+        self._leidos = 0
+        self.perdidos = 0
+        self._cerrado = False
+        self._condicion = threading.Condition()
+
+    def escribir(self, bloque):
+        n = len(bloque)
+        if n > self.capacidad:
+            bloque, n = bloque[-self.capacidad:], self.capacidad
+        with self._condicion:
+            inicio = self._escritos % self.capacidad
+            primera = min(n, self.capacidad - inicio)
+            self._datos[inicio:inicio + primera] = bloque[:primera]
+            self._datos[:n - primera] = bloque[primera:]
+            self._escritos += n
+            retraso = self._escritos - self._leidos
+            if retraso > self.capacidad:
+                self.perdidos += retraso - self.capacidad
+                self._leidos = self._escritos - self.capacidad
+            self._condicion.notify()
+
+    def leer(self, n, timeout=None):
+        """Siguientes n bytes; None si se cierra (o vence timeout) antes de que haya tantos."""
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._cerrado or self._escritos - self._leidos >= n, timeout):
+                return None
+            if self._escritos - self._leidos < n:
+                return None
+            inicio = self._leidos % self.capacidad
+            primera = min(n, self.capacidad - inicio)
+            bloque = bytes(self._datos[inicio:inicio + primera]) + bytes(self._datos[:n - primera])
+            self._leidos += n
+            return bloque
+
+    def cerrar(self):
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
+
+
+def _energia(bloque, ancho):
+    if audioop is not None:
+        return audioop.rms(bloque, ancho)
+    muestras = memoryview(bloque).cast({1: "b", 2: "h", 4: "i"}[ancho])
+    return (sum(m * m for m in muestras) / max(1, len(muestras))) ** 0.5
+
+
+class EscuchaContinua:
+    """Escucha continua para el usuario email; al_reconocer(texto) recibe cada comando reconocido.
+
+    al_reconocer se llama desde el hilo de segmentación: en la GUI debe limitarse a emitir una señal.
+    """
+
+    def __init__(self, al_reconocer, email=None, palabra_activacion=PALABRA_ACTIVACION):
+        self.al_reconocer = al_reconocer
+        self.email = email
+        self.palabra_activacion = (palabra_activacion or "").strip().lower()
+        self._detener = threading.Event()
+        self._hilos = []
+        self._anillo = None
+        self._activado_hasta = 0.0 # Instante hasta el que se acepta una frase sin palabra de activación
+
+    @property
+    def activa(self):
+        return any(hilo.is_alive() for hilo in self._hilos)
+
+    def iniciar(self):
+        if self.activa:
+            return
+        self._detener.clear()
+        motor = utils.motor_reconocimiento_usuario(self.email)
+        if motor.necesita_microfono: # El hilo de captura arranca el de segmentación al abrir el micrófono
+            hilo = threading.Thread(target=self._capturar, args=(motor,), name="CapturaAudio", daemon=True)
+        else: # Motor de pruebas: las frases llegan ya como texto, no hay audio que segmentar
+            hilo = threading.Thread(target=self._bucle_sin_audio, args=(motor,), name="SegmentacionVoz", daemon=True)
+        self._hilos = [hilo]
+        hilo.start()
+
+    def detener(self, timeout=2.0):
+        self._detener.set()
+        if self._anillo is not None:
+            self._anillo.cerrar()
+        for hilo in list(self._hilos):
+            if hilo is not threading.current_thread():
+                hilo.join(timeout)
+
+    def _capturar(self, motor):
+        try:
+            with utils.microfono.en_exclusiva(self.email) as fuente:
+                ancho, frecuencia, bloque = fuente.SAMPLE_WIDTH, fuente.SAMPLE_RATE, fuente.CHUNK
+                umbral = utils.microfono.reconocedor.energy_threshold
+                self._anillo = AnilloAudio(int(CAPACIDAD_ANILLO_S * frecuencia) * ancho)
+                segmentacion = threading.Thread(target=self._segmentar, name="SegmentacionVoz", daemon=True,
+                                                 args=(motor, self._anillo, ancho, frecuencia, bloque, umbral))
+                self._hilos.append(segmentacion)
+                segmentacion.start()
+                silencio = bytes(bloque * ancho)
+                while not self._detener.is_set():
+                    datos = fuente.stream.read(bloque)
+                    self._anillo.escribir(silencio if utils.servicio_voz.hablando else datos)
+        except Exception as e:
+            log.exception("La captura continua se detuvo: %s", e)
+        finally:
+            if self._anillo is not None:
+                self._anillo.cerrar()
+                if self._anillo.perdidos:
+                    log.warning("Escucha continua: se perdieron %d bytes de audio (reconocimiento más lento que la voz)",
+                                self._anillo.perdidos)
+
+    def _segmentar(self, motor, anillo, ancho, frecuencia, bloque, umbral):
+        bytes_bloque = bloque * ancho
+        segundos_bloque = bloque / frecuencia
+        previo = deque(maxlen=max(1, round(AUDIO_PREVIO_S / segundos_bloque)))
+        bloques_pausa = max(1, round(PAUSA_FIN_S / segundos_bloque))
+        bloques_min = max(1, round(DURACION_MIN_S / segundos_bloque))
+        bloques_max = round(DURACION_MAX_S / segundos_bloque)
+        frase, silencios = [], 0
+        while True:
+            datos = anillo.leer(bytes_bloque)
+            if datos is None:
+                return # Anillo cerrado: se ha detenido la escucha
+            voz = _energia(datos, ancho) > umbral
+            if not frase:
+                if voz:
+                    frase = list(previo) + [datos]
+                    silencios = 0
+                else:
+                    previo.append(datos)
+                continue
+            frase.append(datos)
+            silencios = 0 if voz else silencios + 1
+            if silencios < bloques_pausa and len(frase) < bloques_max:
+                continue
+            util = len(frase) - silencios - len(previo)
+            if util >= bloques_min:
+                self._reconocer(motor, sr.AudioData(b"".join(frase), frecuencia, ancho))
+            frase = []
+            previo.clear()
+
+    def _bucle_sin_audio(self, motor):
+        while not self._detener.is_set():
+            if not self._reconocer(motor, None):
+                self._detener.wait(0.5)
+
+    def _reconocer(self, motor, audio):
+        try:
+            with trazas.tramo("reconocer", motor=motor.nombre, modo="continuo"):
+                texto = motor.reconocer(audio).strip().lower()
+        except reconocimiento.NoEntendido:
+            log.debug("Escucha continua: frase no entendida")
+            return False
+        except reconocimiento.ErrorServicio as e:
+            log.warning("Escucha continua: error del motor de reconocimiento (%s): %s", motor.nombre, e)
+            return False
+        comando = self._filtrar_activacion(texto)
+        if comando:
+            log.debug("Escucha continua: comando %r", comando)
+            self.al_reconocer(comando)
+        return True
+
+    def _filtrar_activacion(self, texto):
+        """Comando de la frase según la palabra de activación, o None si la frase no va dirigida al asistente."""
+        if not self.palabra_activacion:
+            return texto
+        if texto.startswith(self.palabra_activacion):
+            resto = texto[len(self.palabra_activacion):].lstrip(" ,.:")
+            if not resto: # Solo "asistente": el comando viene en la siguiente frase
+                self._activado_hasta = time.monotonic() + ESPERA_TRAS_ACTIVACION_S
+                utils.hablar("¿Sí?")
+                return None
+            return resto
+        if time.monotonic() < self._activado_hasta:
+            self._activado_hasta = 0.0
+            return texto
+        log.debug("Escucha continua: frase sin palabra de activación ignorada: %r", texto)
+        return None
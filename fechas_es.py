@@ -0,0 +1,417 @@
+# fechas_es.py
+# Reconocimiento de expresiones de fecha y hora en español dentro de un comando.
+#
+# buscar_fecha() recorre el texto una sola vez, token a token, y devuelve dónde está la expresión
+# (posiciones en el texto original, para poder recortarla de la descripción) y la fecha que significa.
+# Reconoce, entre otras:
+#   hoy, mañana, pasado mañana, esta tarde, esta noche, este fin de semana
+#   (el) viernes, este viernes, el próximo viernes, el viernes que viene, el viernes de la semana que viene,
+#   el viernes 13
+#   la semana que viene, el mes que viene, el año que viene
+#   el 25, el día 25, 25 de diciembre (de 2025), 25/12, 25/12/2025, 2025-12-25
+#   a las 5, a las 17:30, a las cinco y media, a las 6 menos cuarto, a las 8 de la tarde, 5pm, al mediodía
+#   por la mañana / tarde / noche
+#   dentro de dos semanas, en 3 días, en media hora
+# y sus combinaciones ("el próximo viernes a las 5", "mañana por la tarde", "a las 10 del lunes").
+# De las versiones anteriores (que pasaban el comando a parsedatetime en inglés) se aceptan también
+# tomorrow, today, tonight y "at" ("tomorrow at 5pm").
+#
+# Criterios cuando la expresión no lo dice todo:
+#   - sin hora: a las 9:00 (la misma hora por defecto que parsedatetime, para no cambiar las tareas)
+#   - horas de 1 a 7 sin "de la mañana"/"am": de la tarde ("a las 5" es 17:00)
+#   - solo hora: hoy, o mañana si esa hora ya pasó
+#   - "el viernes"/"el próximo viernes": el siguiente viernes (dentro de 1 a 7 días); "este viernes": de 0 a 6
+#   - "el viernes 13": el siguiente día 13 que cae en viernes
+#   - "a las 3" seguido de un plural ("a las 3 amigas") no es una hora: el artículo es del sustantivo
+#   - día sin año o sin mes: la siguiente vez que llega ese día
+
+import calendar
+import re
+import unicodedata
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+# Expresión reconocida: posiciones [inicio, fin) en el texto analizado y fecha resultante
+FechaEncontrada = namedtuple("FechaEncontrada", ["inicio", "fin", "fecha"])
+
+_Token = namedtuple("_Token", ["texto", "inicio", "fin"])
+
+# Fechas (25/12, 2025-12-25), horas (17:30, 5pm, 17h), números y palabras
+_RE_TOKEN = re.compile(r"\d+(?:[:/.-]\d+)*(?:am|pm|h)?|\w+|[^\w\s]", re.IGNORECASE)
+_RE_HORA = re.compile(r"(\d{1,2})(?::(\d{2}))?(am|pm|h)?$")
+_RE_FECHA_NUMERICA = re.compile(r"(\d{1,4})[/.-](\d{1,2})(?:[/.-](\d{1,4}))?$")
+
+HORA_POR_DEFECTO = time(9, 0)
+
+DIAS_SEMANA = {"lunes": 0, "martes": 1, "miercoles": 2, "jueves": 3, "viernes": 4, "sabado": 5, "domingo": 6}
+MESES = {"enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+         "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12}
+NUMEROS = {"un": 1, "uno": 1, "una": 1, "primero": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6,
+           "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "once": 11, "doce": 12, "trece": 13, "catorce": 14,
+           "quince": 15, "dieciseis": 16, "diecisiete": 17, "dieciocho": 18, "diecinueve": 19, "veinte": 20,
+           "veintiun": 21, "veintiuno": 21, "veintiuna": 21, "veintidos": 22, "veintitres": 23, "veinticuatro": 24,
+           "veinticinco": 25, "veintiseis": 26, "veintisiete": 27, "veintiocho": 28, "veintinueve": 29,
+           "treinta": 30, "cuarenta": 40, "cincuenta": 50}
+DECENAS = {"treinta", "cuarenta", "cincuenta"} # Admiten "y <unidad>": treinta y uno, cuarenta y cinco
+# Hora que corresponde a "por la mañana", "esta tarde", etc.
+PERIODOS = {"manana": time(9, 0), "madrugada": time(5, 0), "mediodia": time(12, 0), "tarde": time(16, 0), "noche": time(20, 0)}
+UNIDADES = {"minuto": "minutos", "minutos": "minutos", "hora": "horas", "horas": "horas", "dia": "dias",
+            "dias": "dias", "semana": "semanas", "semanas": "semanas", "mes": "meses", "meses": "meses",
+            "ano": "anos", "anos": "anos"}
+
+_PREFIJOS = (("antes", "de"), ("antes",), ("para",), ("hasta",))
+_PREFIJOS_HORA = (("a", "las"), ("a", "la"), ("sobre", "las"), ("sobre", "la"), ("hacia", "las"), ("hacia", "la"),
+                  ("para", "las"), ("para", "la"), ("de", "las"), ("de", "la"), ("las",), ("at",))
+# Palabras terminadas en "s" que sí pueden seguir a una hora ("a las 5 menos cuarto" aparte)
+_PLURALES_TRAS_HORA = {"las", "los", "mas", "tras", "pues", "antes", "despues", "dias", "semanas", "meses"} | set(DIAS_SEMANA)
+_SIGUIENTE = (("que", "viene"), ("proximo",), ("proxima",), ("siguiente",))
+
+
+def plegar(texto):
+    """Minúsculas y sin tildes (la ñ queda como n): 'Mañana' -> 'manana'."""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _sumar_meses(dia, meses):
+    mes_total = dia.month - 1 + meses
+    anio, mes = dia.year + mes_total // 12, mes_total % 12 + 1
+    return dia.replace(year=anio, month=mes, day=min(dia.day, calendar.monthrange(anio, mes)[1]))
+
+
+def _fecha_valida(anio, mes, dia):
+    try:
+        return date(anio, mes, dia)
+    except ValueError:
+        return None
+
+
+class _Analizador:
+    """Gramática de descenso recursivo sobre los tokens; cada regla devuelve (valor, siguiente_token) o None."""
+
+    def __init__(self, tokens, ahora):
+        self.tokens = tokens
+        self.ahora = ahora
+        self.hoy = ahora.date()
+
+    def _palabra(self, i):
+        return self.tokens[i].texto if i < len(self.tokens) else None
+
+    def _frase(self, i, palabras):
+        for palabra in palabras:
+            if self._palabra(i) != palabra:
+                return None
+            i += 1
+        return i
+
+    def _alguna(self, i, frases):
+        """Índice tras la frase más larga de frases que empieza en i, o None."""
+        mejor = None
+        for frase in frases:
+            j = self._frase(i, frase)
+            if j is not None and (mejor is None or j > mejor):
+                mejor = j
+        return mejor
+
+    def _numero(self, i):
+        palabra = self._palabra(i)
+        if palabra is None:
+            return None
+        if palabra.isdigit():
+            return int(palabra), i + 1
+        if palabra in NUMEROS:
+            valor = NUMEROS[palabra]
+            if palabra in DECENAS and self._palabra(i + 1) == "y" and NUMEROS.get(self._palabra(i + 2), 10) < 10:
+                return valor + NUMEROS[self._palabra(i + 2)], i + 3
+            return valor, i + 1
+        return None
+
+    # --- Días ---
+
+    def _dia(self, i):
+        """(fecha, hora implícita o None, siguiente) para la expresión de día que empieza en i."""
+        j = self._frase(i, ("pasado", "manana"))
+        if j is not None:
+            return self.hoy + timedelta(days=2), None, j
+        palabra = self._palabra(i)
+        if palabra in ("manana", "tomorrow"):
+            return self.hoy + timedelta(days=1), None, i + 1
+        if palabra in ("hoy", "today"):
+            return self.hoy, None, i + 1
+        if palabra == "tonight":
+            return self.hoy, PERIODOS["noche"], i + 1
+        if palabra == "esta" and self._palabra(i + 1) in PERIODOS:
+            return self.hoy, PERIODOS[self._palabra(i + 1)], i + 2
+
+        j = self._alguna(i, (("fin", "de", "semana"), ("el", "fin", "de", "semana"), ("este", "fin", "de", "semana")))
+        if j is not None:
+            return self.hoy + timedelta(days=(5 - self.hoy.weekday()) % 7), None, j
+
+        j = self._alguna(i, (("la", "semana", "que", "viene"), ("la", "proxima", "semana"), ("la", "semana", "proxima"),
+                             ("la", "siguiente", "semana"), ("semana", "que", "viene"), ("proxima", "semana")))
+        if j is not None:
+            return self.hoy + timedelta(days=7), None, j
+        j = self._alguna(i, (("el", "mes", "que", "viene"), ("el", "proximo", "mes"), ("el", "mes", "proximo"),
+                             ("el", "siguiente", "mes"), ("mes", "que", "viene"), ("proximo", "mes")))
+        if j is not None:
+            return _sumar_meses(self.hoy, 1), None, j
+        j = self._alguna(i, (("el", "ano", "que", "viene"), ("el", "proximo", "ano"), ("el", "ano", "proximo"),
+                             ("ano", "que", "viene"), ("proximo", "ano")))
+        if j is not None:
+            return _sumar_meses(self.hoy, 12), None, j
+
+        return self._dia_semana(i) or self._dia_del_mes(i)
+
+    def _dia_semana(self, i):
+        j = self._alguna(i, (("el",), ("del",), ("este",), ("al",))) or i
+        este = self._palabra(i) == "este"
+        j = self._alguna(j, (("proximo",), ("siguiente",))) or j
+        if self._palabra(j) not in DIAS_SEMANA:
+            return None
+        dia_semana = DIAS_SEMANA[self._palabra(j)]
+        j += 1
+        # "el viernes de la semana que viene": el viernes de la semana siguiente a esta
+        k = self._alguna(j, (("de", "la", "semana", "que", "viene"), ("de", "la", "proxima", "semana"),
+                             ("de", "la", "semana", "proxima"), ("de", "la", "siguiente", "semana")))
+        if k is not None:
+            lunes_siguiente = self.hoy + timedelta(days=7 - self.hoy.weekday())
+            return lunes_siguiente + timedelta(days=dia_semana), None, k
+        j = self._alguna(j, _SIGUIENTE) or j
+        numero = self._palabra(j)
+        if numero is not None and numero.isdigit() and 1 <= int(numero) <= 31:
+            # "el viernes 13" (o "el viernes 13 de diciembre"): la fecha la da el número
+            return self._dia_semana_y_numero(dia_semana, int(numero), j + 1)
+        dias = (dia_semana - self.hoy.weekday()) % 7
+        if dias == 0 and not este:
+            dias = 7
+        return self.hoy + timedelta(days=dias), None, j
+
+    def _dia_semana_y_numero(self, dia_semana, dia, j):
+        mes = MESES.get(self._palabra(j + 1)) if self._palabra(j) == "de" else None
+        if mes is not None:
+            return self._siguiente_aniversario(mes, dia, j + 2)
+        # El siguiente día con ese número que cae en ese día de la semana (ocurre al menos una vez en 14 meses)
+        primero = self.hoy.replace(day=1)
+        candidatas = [_fecha_valida(m.year, m.month, dia) for m in (_sumar_meses(primero, n) for n in range(15))]
+        candidatas = [f for f in candidatas if f is not None and f >= self.hoy]
+        coinciden = [f for f in candidatas if f.weekday() == dia_semana]
+        fecha = (coinciden or candidatas or [None])[0]
+        return (fecha, None, j) if fecha else None
+
+    def _dia_del_mes(self, i):
+        j = self._alguna(i, (("el",), ("del",))) or i
+        con_articulo = j > i
+        k = self._frase(j, ("dia",))
+        if k is not None:
+            j, con_articulo = k, True
+
+        numerica = _RE_FECHA_NUMERICA.match(self._palabra(j) or "")
+        if numerica:
+            return self._fecha_numerica(numerica, j + 1)
+
+        numero = self._numero(j)
+        if numero is None or not 1 <= numero[0] <= 31:
+            return None
+        dia, j = numero
+        mes = MESES.get(self._palabra(j + 1)) if self._palabra(j) == "de" else None
+        if mes is None:
+            # Un número suelto solo es un día si va con artículo ("el 25", "el día 3")
+            if not con_articulo:
+                return None
+            fecha = _fecha_valida(self.hoy.year, self.hoy.month, dia)
+            if fecha is None or fecha < self.hoy:
+                siguiente = _sumar_meses(self.hoy.replace(day=1), 1)
+                fecha = _fecha_valida(siguiente.year, siguiente.month, dia)
+            return (fecha, None, j) if fecha else None
+        j += 2
+        if self._palabra(j) in ("de", "del") and (self._palabra(j + 1) or "").isdigit() and len(self._palabra(j + 1)) == 4:
+            fecha = _fecha_valida(int(self._palabra(j + 1)), mes, dia)
+            return (fecha, None, j + 2) if fecha else None
+        return self._siguiente_aniversario(mes, dia, j)
+
+    def _fecha_numerica(self, coincidencia, j):
+        a, b, c = coincidencia.groups()
+        if len(a) == 4: # 2025-12-25
+            fecha = _fecha_valida(int(a), int(b), int(c)) if c else None
+        elif c: # 25/12/2025 o 25/12/25
+            anio = int(c) + 2000 if len(c) == 2 else int(c)
+            fecha = _fecha_valida(anio, int(b), int(a))
+        else: # 25/12
+            return self._siguiente_aniversario(int(b), int(a), j)
+        return (fecha, None, j) if fecha else None
+
+    def _siguiente_aniversario(self, mes, dia, j):
+        fecha = _fecha_valida(self.hoy.year, mes, dia)
+        if fecha is not None and fecha < self.hoy:
+            fecha = _fecha_valida(self.hoy.year + 1, mes, dia)
+        return (fecha, None, j) if fecha else None
+
+    # --- Horas ---
+
+    def _hora(self, i):
+        """(hora, siguiente) para "a las 5 y media de la tarde", "17:30", "por la noche", "al mediodía"..."""
+        j = self._alguna(i, (("a", "mediodia"), ("al", "mediodia"), ("a", "medianoche")))
+        if j is not None:
+            return (time(0, 0) if self._palabra(j - 1) == "medianoche" else time(12, 0)), j
+        j = self._alguna(i, (("por", "la"), ("en", "la"), ("de", "la"), ("a", "la")))
+        if j is not None and self._palabra(j) in PERIODOS:
+            return PERIODOS[self._palabra(j)], j + 1
+
+        j = self._alguna(i, _PREFIJOS_HORA)
+        inicio_hora = j if j is not None else i
+        token = _RE_HORA.match(self._palabra(inicio_hora) or "")
+        explicita = False # Con minutos, am/pm o parte del día: no hay duda de que es una hora
+        if token:
+            hora, minuto = int(token.group(1)), int(token.group(2) or 0)
+            sufijo = token.group(3)
+            explicita = bool(token.group(2) or sufijo)
+            j = inicio_hora + 1
+            # Sin "a las", solo cuenta una hora inequívoca (17:30, 5pm, 17h), no un número suelto
+            if inicio_hora == i and not (token.group(2) or sufijo in ("am", "pm", "h")):
+                return None
+        else:
+            if inicio_hora == i:
+                return None # Las horas en palabras necesitan "a las": "cinco" suelto no es una hora
+            numero = self._numero(inicio_hora)
+            if numero is None:
+                return None
+            (hora, j), minuto, sufijo = numero, 0, None
+        if hora > 24 or minuto > 59:
+            return None
+        if self._palabra(j) in ("horas", "hs"): # "a las 17 horas"
+            j, explicita = j + 1, True
+        inicio_minutos = j
+
+        # Minutos: "y media", "y cuarto", "menos cuarto", "y 10", "en punto"
+        k = self._frase(j, ("y", "media"))
+        if k is not None:
+            minuto, j = 30, k
+        elif self._frase(j, ("y", "cuarto")) is not None:
+            minuto, j = 15, j + 2
+        elif self._frase(j, ("menos", "cuarto")) is not None:
+            if hora == 0:
+                return None # "a las 0 menos cuarto" sería la víspera, no las 23:45 de hoy
+            hora, minuto, j = hora - 1, 45, j + 2
+        elif self._palabra(j) == "y" and self._numero(j + 1) and self._numero(j + 1)[0] < 60:
+            minuto, j = self._numero(j + 1)
+        elif self._palabra(j) == "menos" and self._numero(j + 1) and 1 <= self._numero(j + 1)[0] < 60:
+            if hora == 0:
+                return None
+            valor, k = self._numero(j + 1)
+            hora, minuto, j = hora - 1, 60 - valor, k
+        else:
+            j = self._frase(j, ("en", "punto")) or j
+
+        # Parte del día: "de la tarde", "pm", "de la mañana"...
+        if sufijo not in ("am", "pm") and self._palabra(j) in ("am", "pm"):
+            sufijo, j = self._palabra(j), j + 1
+        k = self._alguna(j, (("de", "la"), ("por", "la"), ("del",)))
+        periodo = self._palabra(k) if k is not None else None
+        if periodo in ("manana", "madrugada"):
+            sufijo, j = "am", k + 1
+        elif periodo in ("tarde", "noche") and hora >= 1:
+            sufijo, j = "pm", k + 1
+        elif periodo == "mediodia":
+            j = k + 1
+        siguiente = self._palabra(j)
+        if (j == inicio_minutos and not explicita and sufijo is None and siguiente is not None and siguiente.isalpha()
+                and siguiente.endswith("s") and siguiente not in _PLURALES_TRAS_HORA):
+            return None # "a las 3 amigas": "las" va con el sustantivo, no es una hora
+
+        hora %= 24
+        if sufijo == "pm" and hora < 12:
+            hora += 12
+        elif sufijo == "am" and hora == 12:
+            hora = 0
+        elif sufijo is None and 1 <= hora <= 7:
+            hora += 12 # "a las 5" es por la tarde salvo que se diga "de la mañana"
+        return time(hora, minuto), j
+
+    # --- Expresiones completas ---
+
+    def _relativa(self, i):
+        j = self._alguna(i, (("dentro", "de"), ("en",), ("de", "aqui", "a")))
+        if j is None:
+            return None
+        if self._palabra(j) == "media" and self._palabra(j + 1) == "hora":
+            cantidad, unidad, j = 30, "minutos", j + 2
+        else:
+            numero = self._numero(j)
+            if numero is None or UNIDADES.get(self._palabra(numero[1])) is None:
+                return None
+            cantidad, unidad = numero[0], UNIDADES[self._palabra(numero[1])]
+            j = numero[1] + 1
+        base = self.ahora.replace(second=0, microsecond=0)
+        if unidad == "meses" or unidad == "anos":
+            meses = cantidad * (12 if unidad == "anos" else 1)
+            return datetime.combine(_sumar_meses(base.date(), meses), base.time()), j
+        return base + timedelta(**{"minutes": cantidad} if unidad == "minutos" else {"hours": cantidad} if unidad == "horas"
+                                else {"days": cantidad * (7 if unidad == "semanas" else 1)}), j
+
+    def _dia_y_hora(self, i):
+        dia = self._dia(i)
+        if dia is None:
+            return None
+        fecha, hora, j = dia
+        con_hora = self._hora(j)
+        if con_hora is not None:
+            hora, j = con_hora
+        return datetime.combine(fecha, hora or HORA_POR_DEFECTO), j
+
+    def _hora_y_dia(self, i):
+        con_hora = self._hora(i)
+        if con_hora is None:
+            return None
+        hora, j = con_hora
+        dia = self._dia(self._frase(j, ("de",)) or j) or self._dia(j) # "a las 5 de mañana", "a las 5 el viernes"
+        if dia is not None:
+            return datetime.combine(dia[0], hora), dia[2]
+        fecha = datetime.combine(self.hoy, hora)
+        if fecha <= self.ahora:
+            fecha += timedelta(days=1)
+        return fecha, j
+
+    def expresion(self, i):
+        """(fecha, siguiente) para la expresión temporal que empieza en el token i, o None."""
+        for inicio in (self._alguna(i, _PREFIJOS), i):
+            if inicio is None:
+                continue
+            try:
+                resultado = self._relativa(inicio) or self._dia_y_hora(inicio) or self._hora_y_dia(inicio)
+            except (ValueError, OverflowError):
+                return None # "en 9000 años", "dentro de 99999999999 días": fuera del rango de datetime
+            if resultado is not None:
+                return resultado
+        return None
+
+
+def tokenizar(texto):
+    return [_Token(plegar(m.group()), m.start(), m.end()) for m in _RE_TOKEN.finditer(texto)]
+
+
+def buscar_fechas(texto, ahora=None):
+    """Todas las expresiones de fecha de texto, de izquierda a derecha (sin solaparse)."""
+    tokens = tokenizar(texto)
+    analizador = _Analizador(tokens, ahora or datetime.now())
+    encontradas = []
+    i = 0
+    while i < len(tokens):
+        resultado = analizador.expresion(i)
+        if resultado is None:
+            i += 1
+            continue
+        fecha, j = resultado
+        encontradas.append(FechaEncontrada(tokens[i].inicio, tokens[j - 1].fin, fecha))
+        i = j
+    return encontradas
+
+
+def buscar_fecha(texto, ahora=None):
+    """La última expresión de fecha de texto (en un comando, el plazo suele ir al final), o None."""
+    encontradas = buscar_fechas(texto, ahora)
+    return encontradas[-1] if encontradas else None
+
+
+def quitar_fecha(texto, encontrada):
+    """texto sin la expresión encontrada, con los espacios normalizados."""
+    return " ".join((texto[:encontrada.inicio] + " " + texto[encontrada.fin:]).split())
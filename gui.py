@@ -2,13 +2,11 @@
 
 import sys
 import os
-import json
 import datetime
 from datetime import timedelta 
 import re
 import html
 from collections import defaultdict
-import traceback 
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QLabel, QPushButton, QLineEdit, QTextEdit,
@@ -23,24 +21,35 @@ from PyQt5.QtCore import (Qt, QDate, QTimer, pyqtSignal, QThread, QDateTime,
 from PyQt5.QtGui import QIcon, QFont, QColor, QTextCharFormat, QPixmap
 
 from commands import (agregar_tarea, eliminar_tarea, mostrar_tareas, modificar_tarea,
-                     marcar_como_completada, generar_reporte)
-from user_management import UserManager
+                     marcar_como_completada, generar_reporte, consolidar_tareas,
+                     mostrar_tareas_categoria, tareas_con_fecha_limite, obtener_tarea, recargar_tareas)
+from user_management import obtener_user_manager
+from task_store import limite_dt
+import trazas
 from google_drive_sync import sync_tasks_to_drive, sync_tasks_from_drive
 
 try:
-    from utils import (escuchar_comando, hablar, cambiar_modo_entrada, MODO_ENTRADA,
+    from utils import (escuchar_comando, hablar, callar, cambiar_modo_entrada, MODO_ENTRADA,
                        cargar_modo_entrada_usuario, obtener_configuracion_usuario)
 except ImportError:
     print("ADVERTENCIA: No se pudo importar 'utils'. La funcionalidad de voz y algunas configuraciones pueden no estar disponibles.")
     def escuchar_comando(): print("Escucha no disponible"); return "No entendí"
     def hablar(texto): print(f"Hablar (simulado): {texto}")
+    def callar(): pass
     def cambiar_modo_entrada(modo, email): print(f"Cambio de modo no disponible ({modo})"); return False, "Función no disponible"
     MODO_ENTRADA = 'texto'
     def cargar_modo_entrada_usuario(email): pass
     def obtener_configuracion_usuario(email): return {}
 
+try:
+    from escucha_continua import EscuchaContinua
+except ImportError: # Sin speech_recognition no hay escucha continua
+    EscuchaContinua = None
+
 from main import interpretar_comando, mostrar_ayuda as obtener_manual_texto
 
+log = trazas.obtener("gui")
+
 
 class DriveSyncWorker(QObject): 
     syncFinished = pyqtSignal(bool, str, str)
@@ -52,21 +61,21 @@ class DriveSyncWorker(QObject):
     def do_sync_upload(self):
         if self._is_running or not self.email: return
         self._is_running = True; op_type = 'upload'
-        try: success, message = sync_tasks_to_drive(self.email); self.syncFinished.emit(success, message, op_type)
+        try: consolidar_tareas(self.email); success, message = sync_tasks_to_drive(self.email); self.syncFinished.emit(success, message, op_type)
         except Exception as e: self.syncFinished.emit(False, f"Error inesperado en worker (subida): {e}", op_type)
         finally: self._is_running = False
     @pyqtSlot()
     def do_sync_download(self):
         if self._is_running or not self.email: return
         self._is_running = True; op_type = 'download'
-        try: success, message = sync_tasks_from_drive(self.email); self.syncFinished.emit(success, message, op_type)
+        try: success, message = sync_tasks_from_drive(self.email); recargar_tareas(self.email); self.syncFinished.emit(success, message, op_type)
         except Exception as e: self.syncFinished.emit(False, f"Error inesperado en worker (descarga): {e}", op_type)
         finally: self._is_running = False
     @pyqtSlot()
     def do_initial_sync_download(self):
         if self._is_running or not self.email: return
         self._is_running = True; op_type = 'initial_download'
-        try: success, message = sync_tasks_from_drive(self.email); self.syncFinished.emit(success, message, op_type)
+        try: success, message = sync_tasks_from_drive(self.email); recargar_tareas(self.email); self.syncFinished.emit(success, message, op_type)
         except Exception as e: self.syncFinished.emit(False, f"Error inesperado en worker (descarga inicial): {e}", op_type)
         finally: self._is_running = False
 
@@ -81,11 +90,13 @@ class VoiceCommandWorker(QObject):
     request_view_change = pyqtSignal(int)
     request_logout = pyqtSignal()
     request_show_manual = pyqtSignal()
+    continuous_command_heard = pyqtSignal(str) # Emitida desde el hilo de EscuchaContinua
 
     def __init__(self, user_manager):
         super().__init__()
         self.user_manager = user_manager
         self._is_running_listener = False
+        self.continuous_command_heard.connect(self.process_continuous_command, Qt.QueuedConnection)
 
     @pyqtSlot()
     def start_listening(self):
@@ -120,17 +131,29 @@ class VoiceCommandWorker(QObject):
         finally:
             self._is_running_listener = False
 
+    @pyqtSlot(str)
+    def process_continuous_command(self, texto_comando):
+        # La escucha continua sigue capturando la siguiente frase mientras este hilo ejecuta el comando
+        self.command_recognized.emit(texto_comando)
+        self.process_command_text(texto_comando)
+
     def process_command_text(self, texto_comando):
         if not self.user_manager.current_user:
             self.command_processed.emit(False, "Usuario no logueado."); return
 
-        accion_interpretada = interpretar_comando(texto_comando)
+        try:
+            accion_interpretada = interpretar_comando(texto_comando)
+        except Exception:
+            # Esto corre en un slot de Qt: una excepción sin capturar puede cerrar la aplicación
+            log.exception("Error interpretando %r", texto_comando)
+            accion_interpretada = 'desconocido'
         email_usuario = self.user_manager.current_user
         success = False
         message = f"Comando '{texto_comando}' no reconocido." 
         needs_refresh = False
-        print(f"GUI VoiceWorker: Texto comando: '{texto_comando}', Acción interpretada: {accion_interpretada}") 
+        log.debug("VoiceWorker: texto %r, acción interpretada: %s", texto_comando, accion_interpretada)
 
+        tramo_ejecutar = trazas.tramo("ejecutar", accion=accion_interpretada[0] if isinstance(accion_interpretada, tuple) else accion_interpretada).iniciar()
         try:
             if isinstance(accion_interpretada, tuple):
                 comando_clave = accion_interpretada[0]
@@ -196,8 +219,7 @@ class VoiceCommandWorker(QObject):
                 
                 elif comando_clave == 'mostrar_categoria':
                     categoria_buscada = accion_interpretada[1]
-                    todas_las_tareas_data = mostrar_tareas(email_usuario)
-                    tareas_de_categoria = [t['descripcion'] for t in todas_las_tareas_data.get("tareas", []) if t.get("categoria", "General").lower() == categoria_buscada.lower()] 
+                    tareas_de_categoria = [t['descripcion'] for t in mostrar_tareas_categoria(categoria_buscada, email_usuario)]
                     if tareas_de_categoria:
                         message = f"Tareas en '{categoria_buscada}': " + ", ".join(tareas_de_categoria[:3])
                         if len(tareas_de_categoria) > 3: message += f" y {len(tareas_de_categoria)-3} más."
@@ -263,7 +285,9 @@ class VoiceCommandWorker(QObject):
         except Exception as e:
             success = False
             message = f"Error al procesar comando por voz: {str(e)}"
-            print(f"Error detallado en process_command_text: {e}\n{traceback.format_exc()}")
+            log.exception("Error en process_command_text con %r", texto_comando)
+        finally:
+            tramo_ejecutar.terminar()
 
         self.command_processed.emit(success, message)
         if 'hablar' in globals() and callable(globals()['hablar']):
@@ -503,12 +527,12 @@ class TaskDialog(QDialog):
             self.category_combo.setCurrentText(category)
             fecha_limite_str = self.task_data.get("fecha_limite")
             if fecha_limite_str:
-                try:
-                    dt_obj = datetime.datetime.strptime(fecha_limite_str, '%Y-%m-%d %H:%M:%S')
+                dt_obj = limite_dt(self.task_data)
+                if dt_obj is not None:
                     qdt = QDateTime(dt_obj.year, dt_obj.month, dt_obj.day, dt_obj.hour, dt_obj.minute, dt_obj.second)
                     self.datetime_edit.setDateTime(qdt)
                     self.no_due_date_checkbox.setChecked(False); self.datetime_edit.setEnabled(True)
-                except ValueError:
+                else:
                     print(f"Advertencia: Formato de fecha inválido al editar: {fecha_limite_str}."); self.no_due_date_checkbox.setChecked(True); self.datetime_edit.setEnabled(False)
             else: self.no_due_date_checkbox.setChecked(True); self.datetime_edit.setEnabled(False)
             self.completed_checkbox.setChecked(self.task_data.get("completada", False))
@@ -616,13 +640,12 @@ class TasksViewWidget(QWidget):
                 font = desc_item.font(); font.setStrikeOut(True)
                 for item_ in [desc_item, cat_item, due_date_item, completed_item]: item_.setFont(font); item_.setBackground(QColor(235, 245, 235)); item_.setForeground(QColor(120, 120, 120))
             elif due_date_str and isinstance(due_date_str, str): 
-                try:
-                    if datetime.datetime.strptime(due_date_str, '%Y-%m-%d %H:%M:%S') < now_datetime: 
-                        for item_ in [desc_item, due_date_item]: item_.setForeground(QColor("red")); font_b = item_.font(); font_b.setBold(True); item_.setFont(font_b)
-                except ValueError: pass 
+                due_dt = limite_dt(task_item) # Interpretada una vez al cargar, no en cada refresco
+                if due_dt is not None and due_dt < now_datetime: 
+                    for item_ in [desc_item, due_date_item]: item_.setForeground(QColor("red")); font_b = item_.font(); font_b.setBold(True); item_.setFont(font_b)
             self.task_table.setItem(row_idx, 0, desc_item); self.task_table.setItem(row_idx, 1, cat_item); self.task_table.setItem(row_idx, 2, due_date_item); self.task_table.setItem(row_idx, 3, completed_item)
             actions_widget = QWidget(); actions_layout = QHBoxLayout(actions_widget); actions_layout.setContentsMargins(5,0,5,0); actions_layout.setSpacing(5); actions_layout.setAlignment(Qt.AlignCenter)
-            icon_size = 24; original_desc_for_action = task_item.get("descripcion","") 
+            icon_size = 24; original_desc_for_action = task_item.get("id") or task_item.get("descripcion","") 
             comp_icon_path = os.path.join("icons","complete.png"); comp_icon = QIcon(comp_icon_path) if os.path.exists(comp_icon_path) else QIcon.fromTheme("task-complete")
             comp_btn = QPushButton(comp_icon, "", actions_widget); comp_btn.setToolTip("Marcar Completada/Pendiente"); comp_btn.setFixedSize(icon_size,icon_size); comp_btn.setEnabled(not is_completed); comp_btn.clicked.connect(lambda ch, d=original_desc_for_action: self.complete_task(d)); actions_layout.addWidget(comp_btn)
             edit_icon_path = os.path.join("icons","edit.png"); edit_icon = QIcon(edit_icon_path) if os.path.exists(edit_icon_path) else QIcon.fromTheme("document-edit")
@@ -658,7 +681,7 @@ class TasksViewWidget(QWidget):
             if not description: QMessageBox.warning(self, "Descripción Inválida", "La descripción no puede estar vacía."); return
             if not self.user_manager.current_user: QMessageBox.warning(self,"Error de Usuario","No hay usuario."); return
             op_type = "modificar" if dialog_instance.task_data else "agregar"
-            orig_desc = dialog_instance.task_data.get("descripcion") if dialog_instance.task_data else None
+            orig_desc = (dialog_instance.task_data.get("id") or dialog_instance.task_data.get("descripcion")) if dialog_instance.task_data else None
             if op_type == "agregar": success, message = agregar_tarea(description, task_data_from_dialog.get("categoria"), task_data_from_dialog.get("fecha_limite"), self.user_manager.current_user, task_data_from_dialog.get("completada",False))
             else: success, message = modificar_tarea(orig_desc, task_data_from_dialog, self.user_manager.current_user)
             if success: self.request_refresh_views.emit()
@@ -671,7 +694,9 @@ class TasksViewWidget(QWidget):
             else: QMessageBox.warning(self, "Error al Completar", message)
 
     def delete_task(self, task_description):
-        if task_description and QMessageBox.question(self, "Confirmar", f"Eliminar '{task_description}'?", QMessageBox.Yes|QMessageBox.No) == QMessageBox.Yes:
+        task_found = obtener_tarea(task_description, self.user_manager.current_user) if task_description and self.user_manager.current_user else None
+        display_desc = task_found.get("descripcion", task_description) if task_found else task_description
+        if task_description and QMessageBox.question(self, "Confirmar", f"Eliminar '{display_desc}'?", QMessageBox.Yes|QMessageBox.No) == QMessageBox.Yes:
             if self.user_manager.current_user:
                 success, message = eliminar_tarea(task_description, self.user_manager.current_user)
                 if success: self.request_refresh_views.emit()
@@ -679,7 +704,7 @@ class TasksViewWidget(QWidget):
 
     def modify_task(self, task_name_to_modify):
         if not task_name_to_modify: return
-        task_data_to_modify = next((t for t in self.tasks_data.get("tareas", []) if isinstance(t,dict) and t.get("descripcion","").strip().lower() == task_name_to_modify.strip().lower()), None)
+        task_data_to_modify = obtener_tarea(task_name_to_modify, self.user_manager.current_user) if self.user_manager.current_user else None
         if not task_data_to_modify: QMessageBox.warning(self,"No Encontrada",f"Tarea '{task_name_to_modify}' no encontrada."); return
         dialog = TaskDialog(self.user_manager, task_data=task_data_to_modify, parent=self)
         all_categories_mod = set(t.get("categoria","General").strip() or "General" for t in self.tasks_data.get("tareas",[]) if isinstance(t,dict))
@@ -721,27 +746,27 @@ class CalendarViewWidget(QWidget):
         pending_fmt, overdue_fmt, completed_fmt, mixed_fmt = QTextCharFormat(), QTextCharFormat(), QTextCharFormat(), QTextCharFormat()
         pending_fmt.setBackground(QColor("#FFFACD")); overdue_fmt.setBackground(QColor("#FFC0CB")); overdue_fmt.setFontWeight(QFont.Bold); completed_fmt.setBackground(QColor("#90EE90")); mixed_fmt.setBackground(QColor("#ADD8E6"))
         fmts = {"pending":pending_fmt, "overdue":overdue_fmt, "completed":completed_fmt, "mixed":mixed_fmt}
-        tasks_by_date = defaultdict(lambda: {'pending':0,'completed':0,'overdue':0}); today = QDate.currentDate()
+        tasks_by_date = defaultdict(lambda: {'pending':0,'completed':0,'overdue':0}); today = datetime.date.today()
         
-        tasks_list_calendar = self.tasks_data.get("tareas", [])
-        if not isinstance(tasks_list_calendar, list): tasks_list_calendar = []
+        # Solo las tareas con límite en el mes mostrado (consulta por rango en el almacén)
+        tasks_list_calendar = []
+        if self.user_manager.current_user and date_iter.isValid():
+            month_start = datetime.datetime.combine(date_iter.toPyDate(), datetime.time.min)
+            month_end = datetime.datetime.combine(date_iter.addDays(date_iter.daysInMonth() - 1).toPyDate(), datetime.time.max)
+            tasks_list_calendar = tareas_con_fecha_limite(self.user_manager.current_user, month_start, month_end)
 
         for task in tasks_list_calendar:
             if not isinstance(task, dict): continue
-            due_str = task.get("fecha_limite") 
-            if isinstance(due_str, str): 
-                try:
-                    qdt = QDateTime.fromString(due_str, "yyyy-MM-dd HH:mm:ss")
-                    if qdt.isValid():
-                        qdate = qdt.date(); completed = task.get("completada",False)
-                        if completed: tasks_by_date[qdate]['completed']+=1
-                        else: 
-                            tasks_by_date[qdate]['pending']+=1
-                            if qdate < today: tasks_by_date[qdate]['overdue']+=1
-                except Exception as e: 
-                    print(f"Error al procesar fecha '{due_str}' para resaltado: {e}")
+            due_dt = limite_dt(task) # datetime ya interpretado (None si no tiene fecha válida)
+            if due_dt is not None: 
+                due_date = due_dt.date(); completed = task.get("completada",False)
+                if completed: tasks_by_date[due_date]['completed']+=1
+                else: 
+                    tasks_by_date[due_date]['pending']+=1
+                    if due_date < today: tasks_by_date[due_date]['overdue']+=1
         
-        for qd, counts in tasks_by_date.items():
+        for due_date, counts in tasks_by_date.items():
+            qd = QDate(due_date.year, due_date.month, due_date.day)
             if qd.year()==year and qd.month()==month:
                 fmt_key = "overdue" if counts['overdue']>0 else ("mixed" if counts['pending']>0 and counts['completed']>0 else ("pending" if counts['pending']>0 else ("completed" if counts['completed']>0 else None)))
                 if fmt_key and fmt_key in fmts: self.calendar_widget.setDateTextFormat(qd, QTextCharFormat(fmts[fmt_key]))
@@ -755,18 +780,10 @@ class CalendarViewWidget(QWidget):
         tasks_on_date = []
         now_dt = datetime.datetime.now()
         
-        tasks_list_for_display = self.tasks_data.get("tareas", [])
-        if not isinstance(tasks_list_for_display, list): 
-            tasks_list_for_display = []
-
-        for task_item_disp in tasks_list_for_display:
-            if not isinstance(task_item_disp, dict): 
-                continue 
-
-            due_date_val = task_item_disp.get("fecha_limite") 
-
-            if isinstance(due_date_val, str) and due_date_val.startswith(selected_date_str):
-                tasks_on_date.append(task_item_disp)
+        # Tareas con límite en el día seleccionado (consulta por rango en el almacén)
+        if self.user_manager.current_user and q_date_selected.isValid():
+            day = q_date_selected.toPyDate()
+            tasks_on_date = list(tareas_con_fecha_limite(self.user_manager.current_user, datetime.datetime.combine(day, datetime.time.min), datetime.datetime.combine(day, datetime.time.max)))
         
         tasks_on_date.sort(key=lambda t:(t.get("fecha_limite",""),t.get("descripcion","").lower()))
         html_str = f"<style>body{{font-size:10pt;}}.task-item{{margin-bottom:8px;padding:6px 8px;border-left:4px solid #ccc;}}.task-item.completed{{border-left-color:#28a745;background-color:#e8f5e9;text-decoration:line-through;color:grey;}}.task-item.overdue{{border-left-color:#dc3545;background-color:#fdecea;}}.task-item.pending{{border-left-color:#ffc107;}}.task-desc{{font-weight:bold;}}.task-details{{font-size:9pt;color:#555;}}</style><b>Tareas para {selected_date_str}:</b> ({len(tasks_on_date)})<br><br>"
@@ -775,12 +792,12 @@ class CalendarViewWidget(QWidget):
                 comp_html, desc_html, cat_html, due_full_html = t_html_item.get("completada",False), html.escape(t_html_item.get('descripcion','N/A')), html.escape(t_html_item.get('categoria','N/A')), t_html_item.get('fecha_limite')
                 time_str_html, overdue_html, status_cls_html = "", False, "pending"
                 if due_full_html and isinstance(due_full_html, str): 
-                    try: 
-                        due_dt_obj_item = datetime.datetime.strptime(due_full_html, '%Y-%m-%d %H:%M:%S')
+                    due_dt_obj_item = limite_dt(t_html_item)
+                    if due_dt_obj_item is not None: 
                         time_str_html = due_dt_obj_item.strftime(' a las %H:%M')
                         if not comp_html and due_dt_obj_item < now_dt: 
                             overdue_html, status_cls_html = True, "overdue"
-                    except ValueError: time_str_html = " (Hora Inv.)"
+                    else: time_str_html = " (Hora Inv.)"
                 if comp_html: status_cls_html="completed"
                 overdue_lbl_str = '<span style="color:red;font-weight:bold;">¡VENCIDA!</span> ' if overdue_html else ""
                 html_str+=f"<div class='task-item {status_cls_html}'><span class='task-desc'>{desc_html}</span><span class='task-details'>{overdue_lbl_str}Cat: {cat_html} | Límite: {selected_date_str}{time_str_html}</span></div>"
@@ -964,6 +981,14 @@ class TaskCalendarWindow(QMainWindow):
         self.tool_bar.addAction(self.action_voice_command)
         self.voice_button_label_original_tooltip=self.action_voice_command.toolTip()
         
+        self.continuous_listening = None
+        self.action_continuous_listening=QAction(get_ico("mic","👂"),"Escucha Continua",self)
+        self.action_continuous_listening.setToolTip("Escuchar sin pulsar el botón: di 'asistente' y el comando (Ctrl+Shift+L)")
+        self.action_continuous_listening.setCheckable(True)
+        self.action_continuous_listening.toggled.connect(self.toggle_continuous_listening)
+        self.action_continuous_listening.setShortcut(Qt.CTRL + Qt.SHIFT + Qt.Key_L)
+        self.tool_bar.addAction(self.action_continuous_listening)
+        
         self.action_show_manual = QAction(get_ico("help", "❓"), "Ayuda/Manual", self)
         self.action_show_manual.setToolTip("Mostrar el manual de usuario y guía de comandos (F1)") 
         self.action_show_manual.triggered.connect(self.mostrar_manual_popup)
@@ -1035,7 +1060,27 @@ class TaskCalendarWindow(QMainWindow):
     @pyqtSlot()
     def trigger_voice_command_listening(self):
         if not ('escuchar_comando' in globals() and callable(globals()['escuchar_comando'])): QMessageBox.warning(self,"Voz no Disponible","Función no configurada.");return
+        callar() # Si el asistente aún está hablando, el usuario quiere interrumpirle
         self.action_voice_command.setEnabled(False);QMetaObject.invokeMethod(self.voice_worker,"start_listening",Qt.QueuedConnection)
+    @pyqtSlot(bool)
+    def toggle_continuous_listening(self, checked):
+        if checked:
+            if EscuchaContinua is None:
+                QMessageBox.warning(self,"Voz no Disponible","La escucha continua necesita speech_recognition.")
+                self.action_continuous_listening.setChecked(False); return
+            callar()
+            self.continuous_listening = EscuchaContinua(self.voice_worker.continuous_command_heard.emit, self.user_manager.current_user)
+            self.continuous_listening.iniciar()
+            self.action_voice_command.setEnabled(False) # El micrófono es de la escucha continua
+            palabra = self.continuous_listening.palabra_activacion
+            self._set_statusbar_style_and_message(f"Escucha continua activada: di '{palabra}' y tu comando." if palabra else "Escucha continua activada.","QStatusBar{background-color:#e6f7ff;color:#005a9e;}")
+        else:
+            self.stop_continuous_listening()
+            self.action_voice_command.setEnabled(True)
+            self._set_statusbar_style_and_message("Escucha continua desactivada.","QStatusBar{background-color:#e6ffee;color:#006400;}")
+    def stop_continuous_listening(self):
+        if self.continuous_listening is not None:
+            self.continuous_listening.detener(timeout=0.5); self.continuous_listening = None
     @pyqtSlot(bool,str)
     def handle_listening_status(self,is_listening,message):
         self.action_voice_command.setToolTip(message if is_listening else self.voice_button_label_original_tooltip);style_ex="";is_err=any(ek.lower() in message.lower() for ek in ["error","no se recibió","no logueado","no entendí","no pude entender","no implementado","no se pudo procesar"])
@@ -1044,17 +1089,17 @@ class TaskCalendarWindow(QMainWindow):
         elif is_err:style_ex="QStatusBar{background-color:#ffe6e6;color:#d8000c;font-weight:bold;}"
         else:style_ex="QStatusBar{background-color:#e6ffee;color:#006400;}"
         self._set_statusbar_style_and_message(message,style_ex,persistent=(is_listening or "procesando" in message.lower()),timeout=7000 if not(is_listening or "procesando" in message.lower())else 0)
-        if not is_listening:self.action_voice_command.setEnabled(True)
+        if not is_listening and self.continuous_listening is None:self.action_voice_command.setEnabled(True)
     @pyqtSlot(str)
-    def handle_command_recognized_text(self,text): print(f"GUI:Comando:{text}");self._set_statusbar_style_and_message(f"Has dicho:\"{text}\"-Procesando...","QStatusBar{background-color:#fffacd;color:#5c5c00;}",persistent=True)
+    def handle_command_recognized_text(self,text): log.debug("Comando reconocido: %r",text);self._set_statusbar_style_and_message(f"Has dicho:\"{text}\"-Procesando...","QStatusBar{background-color:#fffacd;color:#5c5c00;}",persistent=True)
     @pyqtSlot(bool,str)
-    def handle_command_processed_status(self,success,message): print(f"GUI:Procesado-Éxito:{success},Msg:{message}")
+    def handle_command_processed_status(self,success,message): log.debug("Comando procesado. Éxito: %s. Mensaje: %s",success,message)
     @pyqtSlot(str)
     def speak_message_from_gui(self,text_to_speak):
         if 'hablar' in globals() and callable(globals()['hablar']): hablar(text_to_speak)
     @pyqtSlot(str, int, int)
     def handle_voice_request_report(self, period_type, year, month):
-        print(f"GUI: Solicitud de reporte por voz: {period_type}, {month}/{year}")
+        log.debug("Solicitud de reporte por voz: %s, %s/%s", period_type, month, year)
         if not (hasattr(self, 'reports_view') and self.reports_view): QMessageBox.warning(self, "Error", "Vista de reportes no disponible."); return
         if period_type == "mensual":
             self.reports_view.period_type_combo.setCurrentText("Mensual")
@@ -1068,40 +1113,36 @@ class TaskCalendarWindow(QMainWindow):
             QMessageBox.information(self, "Comando de Voz", msg_unsupported)
     @pyqtSlot(int)
     def handle_voice_request_view_change(self, view_index):
-        print(f"GUI: Solicitud de cambio de vista por voz al índice: {view_index}")
+        log.debug("Solicitud de cambio de vista por voz al índice: %s", view_index)
         if 0 <= view_index < self.views_stack.count(): self.change_view(view_index)
         else:
             msg_err_view = f"No se pudo cambiar a la vista (índice {view_index} no válido)."
             if 'hablar' in globals() and callable(globals()['hablar']): self.speak_message_from_gui(msg_err_view)
             QMessageBox.warning(self, "Error de Vista", msg_err_view)
     @pyqtSlot()
-    def handle_voice_request_logout(self): print("GUI: Logout por voz."); self.logout()
+    def handle_voice_request_logout(self): log.debug("Logout por voz."); self.logout()
     def check_upcoming_tasks_for_notification(self):
         if not self.user_manager.current_user: return
         try:
-            current_tasks_data = mostrar_tareas(self.user_manager.current_user)
             upcoming_tasks_to_notify, now = [], datetime.datetime.now()
-            
-            tasks_list = current_tasks_data.get("tareas", [])
-            if not isinstance(tasks_list, list): tasks_list = []
+            # Solo las tareas que vencen en las próximas 24 h (consulta por rango sobre el índice de fechas)
+            tasks_list = tareas_con_fecha_limite(self.user_manager.current_user, now, now + timedelta(days=1))
 
             for tarea in tasks_list:
                 if not isinstance(tarea, dict): continue
                 if not tarea.get("completada", False):
                     fecha_limite_str = tarea.get("fecha_limite")
                     task_id_tuple = (tarea.get("descripcion","").strip().lower(), fecha_limite_str)
-                    if fecha_limite_str and isinstance(fecha_limite_str, str): 
-                        try:
-                            fecha_limite_obj = datetime.datetime.strptime(fecha_limite_str, '%Y-%m-%d %H:%M:%S')
-                            if timedelta(0) < (fecha_limite_obj - now) <= timedelta(days=1) and task_id_tuple not in self.checked_tasks_for_notification:
-                                upcoming_tasks_to_notify.append(tarea)
-                                self.checked_tasks_for_notification.add(task_id_tuple)
-                        except ValueError: pass
+                    fecha_limite_obj = limite_dt(tarea)
+                    if fecha_limite_obj is not None: 
+                        if timedelta(0) < (fecha_limite_obj - now) <= timedelta(days=1) and task_id_tuple not in self.checked_tasks_for_notification:
+                            upcoming_tasks_to_notify.append(tarea)
+                            self.checked_tasks_for_notification.add(task_id_tuple)
             for tarea_notif in upcoming_tasks_to_notify:
                 fl_str_notif = tarea_notif.get("fecha_limite")
                 if fl_str_notif and isinstance(fl_str_notif, str): 
                     try:
-                        td_notif = datetime.datetime.strptime(fl_str_notif,'%Y-%m-%d %H:%M:%S') - now
+                        td_notif = limite_dt(tarea_notif) - now
                         d_notif,r_s_notif=divmod(td_notif.total_seconds(),86400);h_notif,r_s_notif=divmod(r_s_notif,3600);m_notif,_=divmod(r_s_notif,60)
                         parts_notif=[f"{int(val)} {unit}{'s' if int(val)!=1 else ''}" for val,unit in [(d_notif,"día"),(h_notif,"hora"),(m_notif,"minuto")] if int(val)>0]
                         time_msg_notif = f"Faltan {', '.join(parts_notif[:-1])+' y '+parts_notif[-1] if len(parts_notif)>1 else (parts_notif[0] if parts_notif else 'menos de un minuto')}."
@@ -1111,6 +1152,7 @@ class TaskCalendarWindow(QMainWindow):
     def closeEvent(self, event):
         print("Cerrando TaskCalendarWindow...")
         self.notification_timer.stop()
+        self.stop_continuous_listening()
         threads_to_stop = [("Drive", self.drive_thread), ("Voz", self.voice_command_thread)]
         if hasattr(self, 'reports_view') and hasattr(self.reports_view, 'report_thread'):
              threads_to_stop.append(("Reportes", self.reports_view.report_thread))
@@ -1124,18 +1166,18 @@ class TaskCalendarWindow(QMainWindow):
 
 class MainWindow(QMainWindow):
     def __init__(self):
-        super().__init__(); self.user_manager = UserManager(); self.task_calendar_window = None
+        super().__init__(); self.user_manager = obtener_user_manager(); self.task_calendar_window = None
         self.setWindowTitle("VoceTasks - Inicio"); self.setGeometry(200,200,450,380); self.setMinimumSize(400,350); self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
         self.logo_path="logo.png" 
         if os.path.exists(self.logo_path): self.setWindowIcon(QIcon(self.logo_path))
-        else:print(f"DEBUG:Icono '{self.logo_path}' no encontrado.")
+        else:log.debug("Icono %r no encontrado.",self.logo_path)
         self.central_widget=QWidget();self.setCentralWidget(self.central_widget);self.layout=QVBoxLayout(self.central_widget);self.layout.setContentsMargins(30,20,30,30);self.layout.setSpacing(15);self.layout.setAlignment(Qt.AlignCenter)
         self.logo_label=QLabel(self);logo_ok=False
         if os.path.exists(self.logo_path):
             pixmap=QPixmap(self.logo_path)
             if not pixmap.isNull():self.logo_label.setPixmap(pixmap.scaled(120,120,Qt.KeepAspectRatio,Qt.SmoothTransformation));self.logo_label.setAlignment(Qt.AlignCenter);logo_ok=True
-            else:print(f"DEBUG:No se pudo cargar QPixmap'{self.logo_path}'.")
-        if not logo_ok:self.logo_label.setText("VoceTasks");self.logo_label.setFont(QFont("Arial",24,QFont.Bold));self.logo_label.setAlignment(Qt.AlignCenter);print(f"DEBUG:Logo'{self.logo_path}'no cargado.Texto mostrado.")
+            else:log.debug("No se pudo cargar QPixmap %r.",self.logo_path)
+        if not logo_ok:self.logo_label.setText("VoceTasks");self.logo_label.setFont(QFont("Arial",24,QFont.Bold));self.logo_label.setAlignment(Qt.AlignCenter);log.debug("Logo %r no cargado. Texto mostrado.",self.logo_path)
         self.layout.addWidget(self.logo_label);self.layout.addSpacing(10)
         self.title_label=QLabel("Bienvenido a VoceTasks",self);self.title_label.setObjectName("mainWindowTitleLabel");self.title_label.setFont(QFont("Arial",18,QFont.Bold));self.title_label.setAlignment(Qt.AlignCenter);self.layout.addWidget(self.title_label);self.layout.addSpacing(25)
         bw,bh=180,45;self.btn_login=QPushButton("Iniciar Sesión",self);self.btn_login.setFixedSize(bw,bh);self.btn_login.clicked.connect(self.show_login_dialog);self.layout.addWidget(self.btn_login,alignment=Qt.AlignCenter)
@@ -1157,8 +1199,7 @@ def load_stylesheet(filepath):
 if __name__=="__main__":
     try:
         if not os.path.exists("usuarios"): os.makedirs("usuarios",exist_ok=True)
-        if not os.path.exists("usuarios.json"):
-            with open("usuarios.json","w",encoding='utf-8') as file_ujs: json.dump({"usuarios":[]}, file_ujs, indent=4)
+        obtener_user_manager() # Crea su almacenamiento si no existe (usuarios.json, o usuarios.db con el backend SQLite)
     except Exception as e_init: print(f"Error crítico inicialización: {e_init}"); sys.exit(1)
     app=QApplication(sys.argv);stylesheet_data=load_stylesheet("styles.qss")
     if stylesheet_data: app.setStyleSheet(stylesheet_data)
@@ -5,16 +5,91 @@ from commands import (
     mostrar_tareas,
     modificar_tarea,
     marcar_como_completada,
-    generar_reporte
+    generar_reporte,
+    mostrar_tareas_categoria,
+    primeras_tareas_con_fecha
 )
-from user_management import UserManager
+from user_management import obtener_user_manager
+import fechas_es
+import trazas
 import os
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import parsedatetime as pdt
 from parsedatetime import Calendar, Constants
 
-user_manager = UserManager()
+user_manager = None # Se crea en main(): importar este módulo no carga los usuarios
+log = trazas.obtener("main")
+
+# parsedatetime: Constants construye las tablas y expresiones regulares del idioma (lo costoso) y el
+# Calendar solo las lee, así que se comparte una para todo el proceso. El Calendar guarda el estado
+# del análisis en curso, así que hay uno por hilo (consola, VoiceCommandWorker de la GUI).
+_constantes_pdt = None
+_constantes_pdt_lock = threading.Lock()
+_calendarios_pdt = threading.local()
+
+def calendario_pdt():
+    """Calendar en_US de parsedatetime del hilo actual; se crea la primera vez que se necesita."""
+    global _constantes_pdt
+    calendario = getattr(_calendarios_pdt, 'calendario', None)
+    if calendario is None:
+        with _constantes_pdt_lock:
+            if _constantes_pdt is None:
+                _constantes_pdt = Constants("en_US", usePyICU=False)
+        calendario = _calendarios_pdt.calendario = Calendar(_constantes_pdt)
+    return calendario
+
+# parsedatetime toma por fecha cualquier número ("leer 1984" es hoy, "pagar 100 euros" es la 1:00) y
+# abreviaturas que en español son palabras ("ir al mar" es en marzo). Solo se acepta lo que encuentra si
+# contiene una palabra de fecha u hora en inglés completa o una hora o fecha con formato (5pm, 17:30, 12/10).
+_RE_FECHA_INGLES = re.compile(
+    r"\b(?:today|tonight|tomorrow|yesterday|noon|midnight|morning|afternoon|evening|weekend"
+    r"|(?:minute|hour|day|week|month|year)s?"
+    r"|monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+    r"|january|february|march|april|june|july|august|september|october|november|december)\b"
+    r"|\d\s*(?:am|pm)\b|\d:\d\d|\d[/-]\d", re.IGNORECASE)
+
+def _es_fecha_parsedatetime(texto, estado):
+    return estado > 0 and _RE_FECHA_INGLES.search(texto) is not None
+
+def _fecha_parsedatetime(texto, ahora):
+    """Respaldo para lo que fechas_es no reconoce: parseDT (en inglés) con "mañana" traducido."""
+    texto_pdt = texto.replace("mañana", "tomorrow")
+    log.debug("parseDT en_US. Ref: %s. Parseando: %r", ahora, texto_pdt)
+    fecha, estado = calendario_pdt().parseDT(texto_pdt, ahora)
+    return fecha if _es_fecha_parsedatetime(texto_pdt, estado) else None
+
+def interpretar_fecha(texto, ahora=None):
+    """datetime de la expresión de fecha de texto (la última si hay varias), o None."""
+    ahora = ahora or datetime.now()
+    with trazas.tramo("fecha") as tramo:
+        encontrada = fechas_es.buscar_fecha(texto, ahora)
+        if encontrada is not None:
+            return encontrada.fecha
+        tramo.anotar(respaldo="parsedatetime")
+        return _fecha_parsedatetime(texto, ahora)
+
+def separar_fecha(texto, ahora=None):
+    """Separa la fecha de una descripción: (texto sin la expresión de fecha, datetime) o (texto, None).
+
+    La expresión se localiza con la gramática de fechas_es, que devuelve su posición exacta. Si no
+    reconoce nada, se recurre a Calendar.nlp() de parsedatetime (una llamada, también con posiciones),
+    quedándose solo con lo que de verdad parece una fecha (ver _RE_FECHA_INGLES).
+    """
+    ahora = ahora or datetime.now()
+    with trazas.tramo("fecha") as tramo:
+        encontrada = fechas_es.buscar_fecha(texto, ahora)
+        if encontrada is None:
+            tramo.anotar(respaldo="parsedatetime")
+            log.debug("nlp en_US. Ref: %s. Buscando fecha en: %r", ahora, texto)
+            resultados = [r for r in calendario_pdt().nlp(texto, ahora) or () if _es_fecha_parsedatetime(r[4], r[1])]
+            if not resultados:
+                return texto, None
+            fecha, _, inicio, fin, _ = resultados[-1]
+            encontrada = fechas_es.FechaEncontrada(inicio, fin, fecha)
+        return fechas_es.quitar_fecha(texto, encontrada), encontrada.fecha
 
 def limpiar_conectores_fecha(texto):
     """Elimina conectores de fecha comunes del final del texto."""
@@ -25,241 +100,331 @@ def limpiar_conectores_fecha(texto):
             return texto[:-len(f" {conector}")].strip()
     return texto
 
-def interpretar_comando(comando):
-    """Interpreta comandos de manera más flexible"""
-    ahora_inicio_interprete = datetime.now()
-    print(f"DEBUG main.py - datetime.now() al inicio de interpretar_comando: {ahora_inicio_interprete}") 
-    comando = comando.lower().strip()
-    comando = re.sub(r'\s+', ' ', comando) # <-- MEJORA: Normalizar espacios
-
-    cal_pdt_en = Calendar(Constants("en_US", usePyICU=False))
-
-    # Gestión de Usuario
-    if any(frase in comando for frase in ['registrar', 'registro', 'crear cuenta', 'nueva cuenta']): # Añadido sinónimo
-        return 'registrar'
-    if any(frase in comando for frase in ['iniciar sesion', 'login', 'ingresar', 'acceder', 'entrar']): # Añadido sinónimo
-        return 'login'
-    if any(frase in comando for frase in ['cerrar sesion', 'logout', 'salir cuenta', 'desconectar']): # Añadido sinónimo
-        return 'logout'
-    
-    # Ayuda y Manual
-    if any(frase in comando for frase in ['ayuda', 'comandos', 'que puedes hacer', 'manual', 'tutorial', 'instrucciones']): # Añadido sinónimos
-        return 'ayuda'
-
-    # Modo Silencioso
-    if any(frase in comando for frase in ['modo silencioso', 'modo texto', 'silencio']): # Añadido sinónimo
-        if 'activar' in comando or 'encender' in comando or 'pon' in comando and 'silencio' in comando :
-            return 'activar_silencioso'
-        elif 'desactivar' in comando or 'apagar' in comando or 'quita' in comando and 'silencio' in comando:
-            return 'desactivar_silencioso'
+# --- Interpretación de comandos ---
+# Tabla de intenciones en orden de prioridad: (intención, frases que la activan). Si el comando contiene
+# frases de varias intenciones gana la primera de la tabla, el mismo criterio que la antigua cadena de
+# "if any(frase in comando ...)". Las frases se buscan como subcadenas ('ver' también está en 'verificar').
+INTENCIONES = (
+    ('registrar', ('registrar', 'registro', 'crear cuenta', 'nueva cuenta')),
+    ('login', ('iniciar sesion', 'login', 'ingresar', 'acceder', 'entrar')),
+    ('logout', ('cerrar sesion', 'logout', 'salir cuenta', 'desconectar')),
+    ('ayuda', ('ayuda', 'comandos', 'que puedes hacer', 'manual', 'tutorial', 'instrucciones')),
+    ('silencioso', ('modo silencioso', 'modo texto', 'silencio')),
+    ('mostrar', ('muestra', 'muestrame', 'enseñame', 'dame', 'ver', 'lista', 'listar', 'mostrar', 'dime mis', 'que tareas tengo', 'cuales son mis tareas')),
+    ('agregar', ('agrega', 'añade', 'anota', 'crear', 'nueva', 'nuevo', 'agregar', 'apunta', 'registrar tarea')),
+    ('eliminar', ('elimina', 'borrar', 'quitar', 'remover', 'descartar', 'eliminar')),
+    ('modificar', ('modificar', 'cambiar', 'reemplazar', 'actualizar', 'editar')),
+    ('recordatorio', ('recordar', 'recordatorio', 'recordarme', 'poner fecha limite', 'establecer limite', 'fijar fecha')),
+    ('completar', ('completar', 'completada', 'terminada', 'finalizar', 'marcar como completada', 'hecho con', 'lista')),
+    # Solo si además se menciona la categoría (ver _MARCAS)
+    ('categoria', ('asignar', 'poner', 'cambiar categoria a')),
+    ('calendario', ('calendario', 'agenda', 'eventos', 'ver agenda')),
+)
+# Palabras que no son una intención por sí solas, pero que otras intenciones exigen
+_MARCAS = (
+    ('menciona_categoria', ('categoria', 'categoría')),
+)
+_INTENCION_REQUIERE = {'categoria': 'menciona_categoria'}
+
+def _compilar_intenciones(tabla):
+    """Un único regex que encuentra en una pasada todas las frases de la tabla, incluso solapadas."""
+    intenciones_por_frase = {}
+    for intencion, frases in tabla:
+        for frase in frases:
+            intenciones_por_frase.setdefault(frase, set()).add(intencion)
+    frases = sorted(intenciones_por_frase, key=len, reverse=True)
+    # En cada posición el regex devuelve solo la frase más larga; las frases que son prefijo suyo
+    # ('ver' en 'ver agenda') también están ahí, así que se le suman sus intenciones
+    activadas = {frase: frozenset().union(*(intenciones_por_frase[otra] for otra in frases if frase.startswith(otra)))
+                 for frase in frases}
+    # El lookahead hace que se pruebe cada posición del texto, sin consumirlo
+    patron = re.compile('(?=(' + '|'.join(re.escape(frase) for frase in frases) + '))')
+    return patron, activadas
+
+_RE_INTENCIONES, _INTENCIONES_POR_FRASE = _compilar_intenciones(INTENCIONES + _MARCAS)
+
+def detectar_intenciones(comando):
+    """Conjunto de intenciones (y marcas) cuyas frases aparecen en el comando ya normalizado."""
+    encontradas = set()
+    for coincidencia in _RE_INTENCIONES.finditer(comando):
+        encontradas |= _INTENCIONES_POR_FRASE[coincidencia.group(1)]
+    return encontradas
+
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_MOSTRAR_CATEGORIA = re.compile(r'(?:mostrar|ver|lista|listar)\s+tareas\s+de\s+categor[ií]a\s+([\w\s]+)', re.IGNORECASE)
+_RE_AGREGAR_TAREA = re.compile(r'(?:agrega|añade|anota|crear|nueva|nuevo|agregar|apunta|registrar tarea)\s+tarea\s+(.+)', re.IGNORECASE)
+_RE_AGREGAR_SIMPLE = re.compile(r'(?:agrega|añade|anota|crear|nueva|nuevo|agregar|apunta|registrar tarea)\s+(.+)', re.IGNORECASE)
+_RE_AGREGAR_CATEGORIA = re.compile(r'(.*?)\s*(?:en\s+categor[ií]a|categor[ií]a)\s+([\w\s]+?)(?:\s+(?:para|el|en|cuando)|$)', re.IGNORECASE)
+_RE_ELIMINAR = re.compile(r'(?:elimina|borrar|quitar|remover|descartar|eliminar)\s+(.+)', re.IGNORECASE)
+_RE_MODIFICAR_DESCRIPCION = re.compile(r'(?:modificar|editar|cambiar)\s+descripci[oó]n\s+de\s+(.+?)\s+a\s+(.+)', re.IGNORECASE)
+_RE_MODIFICAR_FECHA = re.compile(r'(?:modificar|editar|cambiar)\s+fecha\s+de\s+(.+?)\s+a\s+(.+)', re.IGNORECASE)
+_RE_MODIFICAR_CATEGORIA = re.compile(r'(?:modificar|editar|cambiar)\s+categor[ií]a\s+de\s+(.+?)\s+a\s+([\w\s]+)', re.IGNORECASE)
+_RE_MODIFICAR_GENERAL = re.compile(r'(?:modificar|cambiar|reemplazar|actualizar|editar)\s+(.+?)\s+por\s+(.+)', re.IGNORECASE)
+_RE_RECORDAR_CONECTOR = re.compile(r'(?:recordar|recordatorio|recordarme|poner fecha limite a|establecer limite para|fijar fecha para)\s+(.+?)\s+(?:para el|el|para|con limite|para cuando sea el|cuando sea el|cuando sea|para cuando)\s+(.+)', re.IGNORECASE)
+_RE_RECORDAR_SIMPLE = re.compile(r'(?:recordar|recordatorio|recordarme|poner fecha limite(?: a)?|establecer limite(?: para)?|fijar fecha(?: para)?)\s+(.+)', re.IGNORECASE)
+_RE_COMPLETAR = re.compile(r'(?:completar|completada|terminada|finalizar|marcar como completada|hecho con|lista)\s+(.+)', re.IGNORECASE)
+_RE_ASIGNAR_CATEGORIA = re.compile(r'asignar\s+categor[ií]a\s+([\w\s]+?)\s+a\s+(?:tarea\s+)?(.+)', re.IGNORECASE)
+_RE_PONER_EN_CATEGORIA = re.compile(r'poner\s+(?:tarea\s+)?(.+?)\s+en\s+categor[ií]a\s+([\w\s]+)', re.IGNORECASE)
+_RE_REPORTE = re.compile(r'(?:generar|crear|mostrar|dame el)\s+reporte(?:\s+de\s+tareas)?\s+de\s+(\w+)\s+de\s+(\d{4})', re.IGNORECASE)
+MESES = {'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8, 'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12}
+
+def _interpretar_silencioso(comando):
+    if 'activar' in comando or 'encender' in comando or 'pon' in comando and 'silencio' in comando :
+        return 'activar_silencioso'
+    elif 'desactivar' in comando or 'apagar' in comando or 'quita' in comando and 'silencio' in comando:
+        return 'desactivar_silencioso'
+    else:
+        return 'toggle_silencioso'
+
+def _interpretar_mostrar(comando):
+    match_categoria = _RE_MOSTRAR_CATEGORIA.search(comando)
+    if match_categoria:
+         return ('mostrar_categoria', match_categoria.group(1).strip())
+    return 'mostrar'
+
+def _interpretar_agregar(comando):
+    texto_payload = ""
+    # Primero el patrón más específico que incluye "tarea"
+    match_cmd_tarea = _RE_AGREGAR_TAREA.match(comando)
+    if match_cmd_tarea:
+        texto_payload = match_cmd_tarea.group(1).strip()
+    else: # Luego el patrón más general
+        match_cmd_simple = _RE_AGREGAR_SIMPLE.match(comando)
+        if match_cmd_simple:
+            texto_payload = match_cmd_simple.group(1).strip()
         else:
-            return 'toggle_silencioso'
-
-    # Mostrar Tareas
-    if any(frase in comando for frase in ['muestra', 'muestrame', 'enseñame', 'dame', 'ver', 'lista', 'listar', 'mostrar', 'dime mis', 'que tareas tengo', 'cuales son mis tareas']): # Añadido sinónimos
-        match_categoria = re.search(r'(?:mostrar|ver|lista|listar)\s+tareas\s+de\s+categor[ií]a\s+([\w\s]+)', comando, re.IGNORECASE)
-        if match_categoria:
-             return ('mostrar_categoria', match_categoria.group(1).strip())
-        return 'mostrar'
-
-    # Agregar Tareas
-    if any(frase in comando for frase in ['agrega', 'añade', 'anota', 'crear', 'nueva', 'nuevo', 'agregar', 'apunta', 'registrar tarea']): # Añadido sinónimos
-        texto_payload = ""
-        # Primero el patrón más específico que incluye "tarea"
-        match_cmd_tarea = re.match(r'(?:agrega|añade|anota|crear|nueva|nuevo|agregar|apunta|registrar tarea)\s+tarea\s+(.+)', comando, re.IGNORECASE)
-        if match_cmd_tarea:
-            texto_payload = match_cmd_tarea.group(1).strip()
-        else: # Luego el patrón más general
-            match_cmd_simple = re.match(r'(?:agrega|añade|anota|crear|nueva|nuevo|agregar|apunta|registrar tarea)\s+(.+)', comando, re.IGNORECASE)
-            if match_cmd_simple:
-                texto_payload = match_cmd_simple.group(1).strip()
-            else:
-                return ('agregar_sin_info', None, None, None)
-
-        if not texto_payload:
             return ('agregar_sin_info', None, None, None)
 
-        descripcion_final = texto_payload
-        fecha_extraida_str = None
-        categoria_extraida_str = None
-        texto_para_procesar_fecha_y_desc = texto_payload
-        
-        match_cat = re.search(r'(.*?)\s*(?:en\s+categor[ií]a|categor[ií]a)\s+([\w\s]+?)(?:\s+(?:para|el|en|cuando)|$)', texto_para_procesar_fecha_y_desc, re.IGNORECASE)
-        
-        if match_cat:
-            parte_antes_cat_keyword = match_cat.group(1).strip()
-            categoria_potencial = match_cat.group(2).strip()
-            texto_despues_nombre_cat = texto_para_procesar_fecha_y_desc[match_cat.end(2):].strip() 
-            
-            ahora_ref_cat_check = datetime.now()
-            _, cat_is_date_flag = cal_pdt_en.parseDT(categoria_potencial.replace("mañana", "tomorrow"), ahora_ref_cat_check)
-
-            es_fecha_mas_explicita_despues = False
-            if texto_despues_nombre_cat:
-                 texto_despues_para_check = texto_despues_nombre_cat.replace("mañana", "tomorrow")
-                 _, es_fecha_mas_explicita_despues_flag = cal_pdt_en.parseDT(texto_despues_para_check, ahora_ref_cat_check)
-                 if es_fecha_mas_explicita_despues_flag > 0 and (texto_despues_nombre_cat.lower().startswith("para") or texto_despues_nombre_cat.lower().startswith("el")):
-                     es_fecha_mas_explicita_despues = True
-
-            if categoria_potencial and not (cat_is_date_flag > 0 and es_fecha_mas_explicita_despues):
-                categoria_extraida_str = categoria_potencial
-                texto_para_procesar_fecha_y_desc = (parte_antes_cat_keyword + " " + texto_despues_nombre_cat).strip()
-                descripcion_final = texto_para_procesar_fecha_y_desc
+    if not texto_payload:
+        return ('agregar_sin_info', None, None, None)
+
+    descripcion_final = texto_payload
+    fecha_extraida_str = None
+    categoria_extraida_str = None
+    texto_para_procesar_fecha_y_desc = texto_payload
+    
+    match_cat = _RE_AGREGAR_CATEGORIA.search(texto_para_procesar_fecha_y_desc)
+    
+    if match_cat:
+        parte_antes_cat_keyword = match_cat.group(1).strip()
+        categoria_potencial = match_cat.group(2).strip()
+        texto_despues_nombre_cat = texto_para_procesar_fecha_y_desc[match_cat.end(2):].strip() 
         
-        palabras_para_fecha = texto_para_procesar_fecha_y_desc.split()
-        descripcion_final = texto_para_procesar_fecha_y_desc
-
-        if palabras_para_fecha:
-            for i in range(min(5, len(palabras_para_fecha)), 0, -1): 
-                posible_fecha_texto_original = " ".join(palabras_para_fecha[len(palabras_para_fecha)-i:])
-                posible_fecha_texto_para_pdt = posible_fecha_texto_original.replace("mañana", "tomorrow")
-                
-                ahora_ref_fecha = datetime.now()
-                print(f"DEBUG main.py - Usando en_US. Ref: {ahora_ref_fecha}. Parseando: '{posible_fecha_texto_para_pdt}'")
-                fecha_dt_obj, parse_status = cal_pdt_en.parseDT(posible_fecha_texto_para_pdt, ahora_ref_fecha)
-
-                if parse_status > 0:
-                    desc_candidata = " ".join(palabras_para_fecha[:len(palabras_para_fecha)-i]).strip()
-                    desc_candidata = limpiar_conectores_fecha(desc_candidata)
-                    if desc_candidata: 
-                        descripcion_final = desc_candidata
-                        fecha_extraida_str = fecha_dt_obj.strftime("%Y-%m-%d %H:%M:%S")
-                        break 
-                    else: 
-                        if categoria_extraida_str:
-                            return ('agregar_sin_descripcion_con_fecha_cat', fecha_dt_obj.strftime("%Y-%m-%d %H:%M:%S"), categoria_extraida_str)
-                        else:
-                            return ('agregar_sin_descripcion_con_fecha', fecha_dt_obj.strftime("%Y-%m-%d %H:%M:%S"), None)
-            
-        if not fecha_extraida_str : 
-            descripcion_final = limpiar_conectores_fecha(descripcion_final)
-
-        if not descripcion_final.strip():
-            if fecha_extraida_str and categoria_extraida_str:
-                return ('agregar_sin_descripcion_con_fecha_cat', fecha_extraida_str, categoria_extraida_str)
-            elif fecha_extraida_str:
-                return ('agregar_sin_descripcion_con_fecha', fecha_extraida_str, None)
-            elif categoria_extraida_str:
-                return ('agregar_sin_descripcion_con_cat', None, categoria_extraida_str)
+        ahora_ref_cat_check = datetime.now()
+        cat_es_fecha = interpretar_fecha(categoria_potencial, ahora_ref_cat_check) is not None
+
+        es_fecha_mas_explicita_despues = False
+        if texto_despues_nombre_cat and cat_es_fecha:
+             if interpretar_fecha(texto_despues_nombre_cat, ahora_ref_cat_check) is not None and (texto_despues_nombre_cat.lower().startswith("para") or texto_despues_nombre_cat.lower().startswith("el")):
+                 es_fecha_mas_explicita_despues = True
+
+        if categoria_potencial and not (cat_es_fecha and es_fecha_mas_explicita_despues):
+            categoria_extraida_str = categoria_potencial
+            texto_para_procesar_fecha_y_desc = (parte_antes_cat_keyword + " " + texto_despues_nombre_cat).strip()
+            descripcion_final = texto_para_procesar_fecha_y_desc
+    
+    descripcion_final = texto_para_procesar_fecha_y_desc
+
+    desc_candidata, fecha_dt_obj = separar_fecha(texto_para_procesar_fecha_y_desc)
+    if fecha_dt_obj is not None:
+        desc_candidata = limpiar_conectores_fecha(desc_candidata.strip())
+        if desc_candidata: 
+            descripcion_final = desc_candidata
+            fecha_extraida_str = fecha_dt_obj.strftime("%Y-%m-%d %H:%M:%S")
+        else: 
+            if categoria_extraida_str:
+                return ('agregar_sin_descripcion_con_fecha_cat', fecha_dt_obj.strftime("%Y-%m-%d %H:%M:%S"), categoria_extraida_str)
             else:
-                return ('agregar_sin_info', None, None, None)
-
-        if not fecha_extraida_str and not categoria_extraida_str:
-            ahora_ref_desc_check = datetime.now()
-            texto_desc_para_check_fecha = descripcion_final.replace("mañana", "tomorrow")
-            dt_obj_desc_check, ps_desc_check = cal_pdt_en.parseDT(texto_desc_para_check_fecha, ahora_ref_desc_check)
-            if ps_desc_check > 0 and len(descripcion_final.split()) <= 3: 
-                return ('agregar_sin_descripcion_con_fecha', dt_obj_desc_check.strftime("%Y-%m-%d %H:%M:%S"), None)
-
-        return ('agregar', descripcion_final.strip(), fecha_extraida_str, categoria_extraida_str)
-
-    # Eliminar Tareas
-    if any(frase in comando for frase in ['elimina', 'borrar', 'quitar', 'remover', 'descartar', 'eliminar']): # Añadido sinónimos
-        match_tarea = re.search(r'(?:elimina|borrar|quitar|remover|descartar|eliminar)\s+(.+)', comando, re.IGNORECASE)
-        if match_tarea:
-            tarea = match_tarea.group(1).strip()
-            if tarea: return ('eliminar', tarea)
-        return 'desconocido'
-
-    # Modificar Tareas
-    if any(frase in comando for frase in ['modificar', 'cambiar', 'reemplazar', 'actualizar', 'editar']): # Añadido sinónimo
-        ahora_ref_mod = datetime.now()
-        cal_pdt_en_mod = Calendar(Constants("en_US", usePyICU=False))
-
-        match_desc = re.search(r'(?:modificar|editar|cambiar)\s+descripci[oó]n\s+de\s+(.+?)\s+a\s+(.+)', comando, re.IGNORECASE) # Añadido 'editar', 'cambiar'
-        if match_desc: return ('modificar_descripcion', match_desc.group(1).strip(), match_desc.group(2).strip())
-        
-        match_fecha = re.search(r'(?:modificar|editar|cambiar)\s+fecha\s+de\s+(.+?)\s+a\s+(.+)', comando, re.IGNORECASE) # Añadido 'editar', 'cambiar'
-        if match_fecha:
-            tarea_orig_fecha = match_fecha.group(1).strip()
-            nueva_fecha_texto_orig = match_fecha.group(2).strip()
-            nueva_fecha_texto_pdt = nueva_fecha_texto_orig.replace("mañana", "tomorrow")
-            print(f"DEBUG main.py - Modificar fecha. Ref: {ahora_ref_mod}. Parseando: '{nueva_fecha_texto_pdt}'")
-            dt_obj_fecha, ps_fecha = cal_pdt_en_mod.parseDT(nueva_fecha_texto_pdt, ahora_ref_mod)
-            if ps_fecha > 0: return ('modificar_fecha', tarea_orig_fecha, dt_obj_fecha.strftime("%Y-%m-%d %H:%M:%S"))
-            else: return ('modificar_fecha_invalida', tarea_orig_fecha, nueva_fecha_texto_orig)
+                return ('agregar_sin_descripcion_con_fecha', fecha_dt_obj.strftime("%Y-%m-%d %H:%M:%S"), None)
         
-        match_cat_mod = re.search(r'(?:modificar|editar|cambiar)\s+categor[ií]a\s+de\s+(.+?)\s+a\s+([\w\s]+)', comando, re.IGNORECASE) # Añadido 'editar', 'cambiar'
-        if match_cat_mod: return ('modificar_categoria', match_cat_mod.group(1).strip(), match_cat_mod.group(2).strip())
-        
-        match_general = re.search(r'(?:modificar|cambiar|reemplazar|actualizar|editar)\s+(.+?)\s+por\s+(.+)', comando, re.IGNORECASE) # Añadido 'editar'
-        if match_general: return ('modificar_descripcion', match_general.group(1).strip(), match_general.group(2).strip())
-        return 'desconocido_modificar'
-
-    # Recordatorios (revisar si esta lógica sigue siendo necesaria o si 'agregar' la cubre)
-    if any(frase in comando for frase in ['recordar', 'recordatorio', 'recordarme', 'poner fecha limite', 'establecer limite', 'fijar fecha']): # Añadido sinónimo
-        ahora_ref_rec = datetime.now()
-        cal_pdt_en_rec = Calendar(Constants("en_US", usePyICU=False))
-        # ... (resto de la lógica de recordatorio, usando cal_pdt_en_rec y reemplazo de "mañana")
-        match_rec_conector = re.search(r'(?:recordar|recordatorio|recordarme|poner fecha limite a|establecer limite para|fijar fecha para)\s+(.+?)\s+(?:para el|el|para|con limite|para cuando sea el|cuando sea el|cuando sea|para cuando)\s+(.+)', comando, re.IGNORECASE)
-        if match_rec_conector:
-            desc_rec = match_rec_conector.group(1).strip()
-            fecha_texto_rec_orig = match_rec_conector.group(2).strip()
-            fecha_texto_rec_pdt = fecha_texto_rec_orig.replace("mañana", "tomorrow")
-            print(f"DEBUG main.py - Recordar conector. Ref: {ahora_ref_rec}. Parseando: '{fecha_texto_rec_pdt}'")
-            dt_obj_rec, ps_rec = cal_pdt_en_rec.parseDT(fecha_texto_rec_pdt, ahora_ref_rec)
-            if ps_rec > 0: return ('agregar', limpiar_conectores_fecha(desc_rec), dt_obj_rec.strftime("%Y-%m-%d %H:%M:%S"), None) 
-            else: return ('recordatorio_sin_fecha_clara', desc_rec, fecha_texto_rec_orig)
-        
-        match_rec_simple = re.search(r'(?:recordar|recordatorio|recordarme|poner fecha limite|establecer limite|fijar fecha)\s+(.+)', comando, re.IGNORECASE)
-        if match_rec_simple:
-            texto_completo_rec = match_rec_simple.group(1).strip()
-            palabras_rec = texto_completo_rec.split()
-            if palabras_rec:
-                for i in range(min(len(palabras_rec), 5), 0, -1):
-                    segmento_fecha_candidato_rec_orig = " ".join(palabras_rec[len(palabras_rec)-i:])
-                    segmento_fecha_candidato_rec_pdt = segmento_fecha_candidato_rec_orig.replace("mañana", "tomorrow")
-                    print(f"DEBUG main.py - Recordar simple. Ref: {ahora_ref_rec}. Parseando: '{segmento_fecha_candidato_rec_pdt}'")
-                    dt_obj_rec_seg, ps_rec_seg = cal_pdt_en_rec.parseDT(segmento_fecha_candidato_rec_pdt, ahora_ref_rec)
-                    if ps_rec_seg > 0:
-                        desc_rec_seg = " ".join(palabras_rec[:len(palabras_rec)-i]).strip()
-                        desc_rec_seg = limpiar_conectores_fecha(desc_rec_seg)
-                        if desc_rec_seg: return ('agregar', desc_rec_seg, dt_obj_rec_seg.strftime("%Y-%m-%d %H:%M:%S"), None)
-                        else: return ('recordatorio_sin_tarea_clara', dt_obj_rec_seg.strftime("%Y-%m-%d %H:%M:%S"))
-                return ('agregar', limpiar_conectores_fecha(texto_completo_rec), None, None) 
-        return 'desconocido_recordatorio'
-
-
-    # Completar Tareas
-    if any(frase in comando for frase in ['completar', 'completada', 'terminada', 'finalizar', 'marcar como completada', 'hecho con', 'lista']): # Añadido sinónimos
-        match_tarea = re.search(r'(?:completar|completada|terminada|finalizar|marcar como completada|hecho con|lista)\s+(.+)', comando, re.IGNORECASE)
-        if match_tarea:
-            tarea = match_tarea.group(1).strip()
-            # Evitar que "lista de tareas" se confunda con completar "de tareas"
-            if tarea.lower() not in ["de tareas", "tareas"]:
-                return ('completar', tarea)
-        return 'desconocido'
-
-    # Categorías (asignar/poner en)
-    if 'categor[ií]a' in comando and any(frase in comando for frase in ['asignar', 'poner en', 'cambiar categoria a']): # Añadido 'cambiar categoria a'
-        # "asignar categoría Y a tarea X"
-        match_asignar_cat_tarea = re.search(r'asignar\s+categor[ií]a\s+([\w\s]+?)\s+a\s+(?:tarea\s+)?(.+)', comando, re.IGNORECASE)
-        if match_asignar_cat_tarea: return ('modificar_categoria', limpiar_conectores_fecha(match_asignar_cat_tarea.group(2).strip()), match_asignar_cat_tarea.group(1).strip())
-        
-        # "poner tarea X en categoría Y"
-        match_poner_tarea_cat = re.search(r'poner\s+(?:tarea\s+)?(.+?)\s+en\s+categor[ií]a\s+([\w\s]+)', comando, re.IGNORECASE)
-        if match_poner_tarea_cat: return ('modificar_categoria', limpiar_conectores_fecha(match_poner_tarea_cat.group(1).strip()), match_poner_tarea_cat.group(2).strip())
+    if not fecha_extraida_str : 
+        descripcion_final = limpiar_conectores_fecha(descripcion_final)
+
+    if not descripcion_final.strip():
+        if fecha_extraida_str and categoria_extraida_str:
+            return ('agregar_sin_descripcion_con_fecha_cat', fecha_extraida_str, categoria_extraida_str)
+        elif fecha_extraida_str:
+            return ('agregar_sin_descripcion_con_fecha', fecha_extraida_str, None)
+        elif categoria_extraida_str:
+            return ('agregar_sin_descripcion_con_cat', None, categoria_extraida_str)
+        else:
+            return ('agregar_sin_info', None, None, None)
+
+    return ('agregar', descripcion_final.strip(), fecha_extraida_str, categoria_extraida_str)
+
+def _interpretar_eliminar(comando):
+    match_tarea = _RE_ELIMINAR.search(comando)
+    if match_tarea:
+        tarea = match_tarea.group(1).strip()
+        if tarea: return ('eliminar', tarea)
+    return 'desconocido'
 
-        # "cambiar categoria a Y para tarea X" o "cambiar categoria de tarea X a Y" (ya cubierto por 'modificar')
-        return 'desconocido_categoria'
+def _interpretar_modificar(comando):
+    ahora_ref_mod = datetime.now()
 
+    match_desc = _RE_MODIFICAR_DESCRIPCION.search(comando)
+    if match_desc: return ('modificar_descripcion', match_desc.group(1).strip(), match_desc.group(2).strip())
+    
+    match_fecha = _RE_MODIFICAR_FECHA.search(comando)
+    if match_fecha:
+        tarea_orig_fecha = match_fecha.group(1).strip()
+        nueva_fecha_texto_orig = match_fecha.group(2).strip()
+        log.debug("Modificar fecha. Ref: %s. Parseando: %r", ahora_ref_mod, nueva_fecha_texto_orig)
+        dt_obj_fecha = interpretar_fecha(nueva_fecha_texto_orig, ahora_ref_mod)
+        if dt_obj_fecha is not None: return ('modificar_fecha', tarea_orig_fecha, dt_obj_fecha.strftime("%Y-%m-%d %H:%M:%S"))
+        else: return ('modificar_fecha_invalida', tarea_orig_fecha, nueva_fecha_texto_orig)
+    
+    match_cat_mod = _RE_MODIFICAR_CATEGORIA.search(comando)
+    if match_cat_mod: return ('modificar_categoria', match_cat_mod.group(1).strip(), match_cat_mod.group(2).strip())
+    
+    match_general = _RE_MODIFICAR_GENERAL.search(comando)
+    if match_general: return ('modificar_descripcion', match_general.group(1).strip(), match_general.group(2).strip())
+    return 'desconocido_modificar'
+
+def _interpretar_recordatorio(comando):
+    # (revisar si esta lógica sigue siendo necesaria o si 'agregar' la cubre)
+    ahora_ref_rec = datetime.now()
+    match_rec_simple = _RE_RECORDAR_SIMPLE.search(comando)
+    if match_rec_simple:
+        texto_completo_rec = match_rec_simple.group(1).strip()
+        # Una sola pasada localiza la fecha donde esté ("recordar el lunes llamar a juan")
+        desc_rec, dt_obj_rec = separar_fecha(texto_completo_rec, ahora_ref_rec)
+        if dt_obj_rec is not None:
+            desc_rec = limpiar_conectores_fecha(desc_rec.strip())
+            if desc_rec: return ('agregar', desc_rec, dt_obj_rec.strftime("%Y-%m-%d %H:%M:%S"), None)
+            else: return ('recordatorio_sin_tarea_clara', dt_obj_rec.strftime("%Y-%m-%d %H:%M:%S"))
+        # Hay un conector de fecha ("recordar X para Y") pero Y no es una fecha reconocible
+        match_rec_conector = _RE_RECORDAR_CONECTOR.search(comando)
+        if match_rec_conector:
+            return ('recordatorio_sin_fecha_clara', match_rec_conector.group(1).strip(), match_rec_conector.group(2).strip())
+        if texto_completo_rec:
+            return ('agregar', limpiar_conectores_fecha(texto_completo_rec), None, None) 
+    return 'desconocido_recordatorio'
+
+def _interpretar_completar(comando):
+    match_tarea = _RE_COMPLETAR.search(comando)
+    if match_tarea:
+        tarea = match_tarea.group(1).strip()
+        # Evitar que "lista de tareas" se confunda con completar "de tareas"
+        if tarea.lower() not in ["de tareas", "tareas"]:
+            return ('completar', tarea)
+    return 'desconocido'
+
+def _interpretar_categoria(comando):
+    # "asignar categoría Y a tarea X"
+    match_asignar_cat_tarea = _RE_ASIGNAR_CATEGORIA.search(comando)
+    if match_asignar_cat_tarea: return ('modificar_categoria', limpiar_conectores_fecha(match_asignar_cat_tarea.group(2).strip()), match_asignar_cat_tarea.group(1).strip())
+    
+    # "poner tarea X en categoría Y"
+    match_poner_tarea_cat = _RE_PONER_EN_CATEGORIA.search(comando)
+    if match_poner_tarea_cat: return ('modificar_categoria', limpiar_conectores_fecha(match_poner_tarea_cat.group(1).strip()), match_poner_tarea_cat.group(2).strip())
 
-    if any(frase in comando for frase in ['calendario', 'agenda', 'eventos', 'ver agenda']): # Añadido sinónimo
-        return 'ver_calendario_local'
+    # "cambiar categoria a Y para tarea X" o "cambiar categoria de tarea X a Y" (ya cubierto por 'modificar')
+    return 'desconocido_categoria'
 
-    match_reporte = re.search(r'(?:generar|crear|mostrar|dame el)\s+reporte(?:\s+de\s+tareas)?\s+de\s+(\w+)\s+de\s+(\d{4})', comando, re.IGNORECASE) # Añadido 'dame el'
+def _interpretar_reporte(comando):
+    match_reporte = _RE_REPORTE.search(comando)
     if match_reporte:
-        mes_texto = match_reporte.group(1).lower()
-        año_str = match_reporte.group(2)
-        meses_map = {'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8, 'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12}
-        mes = meses_map.get(mes_texto)
+        mes = MESES.get(match_reporte.group(1).lower())
         try:
-            año = int(año_str)
+            año = int(match_reporte.group(2))
             if mes and 1900 < año < 2200: return ('generar_reporte', año, mes)
         except ValueError: pass
-             
     return 'desconocido'
 
+# Intención -> función que extrae sus datos (las que no tienen datos devuelven el nombre fijo)
+_INTERPRETES = {
+    'registrar': lambda comando: 'registrar',
+    'login': lambda comando: 'login',
+    'logout': lambda comando: 'logout',
+    'ayuda': lambda comando: 'ayuda',
+    'silencioso': _interpretar_silencioso,
+    'mostrar': _interpretar_mostrar,
+    'agregar': _interpretar_agregar,
+    'eliminar': _interpretar_eliminar,
+    'modificar': _interpretar_modificar,
+    'recordatorio': _interpretar_recordatorio,
+    'completar': _interpretar_completar,
+    'categoria': _interpretar_categoria,
+    'calendario': lambda comando: 'ver_calendario_local',
+}
+
+class CacheLRU:
+    """Diccionario acotado que descarta lo menos usado; seguro entre hilos y con contadores de aciertos."""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def buscar(self, claves):
+        """(True, valor) para la primera de claves que esté guardada, o (False, None); cuenta un acierto o un fallo."""
+        with self._lock:
+            for clave in claves:
+                if clave in self._datos:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, self._datos[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor):
+        if self.capacidad <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def vaciar(self):
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = self.fallos = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": len(self._datos), "capacidad": self.capacidad}
+
+# Los usuarios repiten mucho los mismos comandos ("muestra mis tareas"): se guarda la interpretación
+# por texto normalizado. Si el resultado incluye una fecha resuelta ("mañana", "a las 5"), depende del
+# momento en que se dijo y solo se reutiliza dentro del mismo minuto.
+cache_comandos = CacheLRU(int(os.environ.get("VOCETASKS_CACHE_COMANDOS", "256")))
+_RE_FECHA_RESUELTA = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+def _depende_del_momento(accion):
+    return isinstance(accion, tuple) and any(isinstance(valor, str) and _RE_FECHA_RESUELTA.match(valor) for valor in accion)
+
+def normalizar_comando(comando):
+    return _RE_ESPACIOS.sub(' ', comando.lower().strip()) # <-- MEJORA: Normalizar espacios
+
+def interpretar_comando(comando):
+    """Interpreta comandos de manera más flexible (con caché de los comandos ya interpretados)"""
+    with trazas.tramo("normalizar"):
+        comando = normalizar_comando(comando)
+    minuto = datetime.now().strftime("%Y-%m-%d %H:%M")
+    encontrado, accion = cache_comandos.buscar(((comando, None), (comando, minuto)))
+    if encontrado:
+        log.debug("Comando %r en caché: %s", comando, accion)
+        return accion
+    with trazas.tramo("intencion") as tramo:
+        accion = _interpretar_comando_normalizado(comando)
+        tramo.anotar(accion=accion[0] if isinstance(accion, tuple) else accion)
+    log.debug("Comando %r interpretado: %s", comando, accion)
+    cache_comandos.guardar((comando, minuto if _depende_del_momento(accion) else None), accion)
+    return accion
+
+def _interpretar_comando_normalizado(comando):
+    encontradas = detectar_intenciones(comando)
+    for intencion, _ in INTENCIONES:
+        if intencion in encontradas and _INTENCION_REQUIERE.get(intencion, intencion) in encontradas:
+            return _INTERPRETES[intencion](comando)
+
+    # Sin frase de intención: solo queda el reporte, que se reconoce por su forma completa
+    return _interpretar_reporte(comando)
+
 
 def mostrar_ayuda(): # Sin cambios, ya contiene el manual
     manual = """
@@ -291,7 +456,8 @@ guía rápida para empezar:
         * `agregar Comprar pan`
         * `agregar Reunión con el equipo para mañana a las 10 am en categoría Trabajo`
         * `agregar Llamar al cliente para el viernes` 
-            (Nota: "mañana" por voz se traduce internamente a "tomorrow" para mejorar la precisión)
+            (Fechas en español: "mañana", "pasado mañana", "el próximo lunes", "el 25 de diciembre",
+            "a las 5 y media de la tarde", "dentro de dos semanas"...)
         * `agregar Idea para el proyecto en categoría Ideas`
 * **Eliminar una Tarea:** `eliminar [descripción de la tarea]`
     * Ejemplo: `eliminar Comprar pan`
@@ -302,7 +468,7 @@ guía rápida para empezar:
 * **Modificar Descripción:** `modificar descripción de [tarea antigua] a [nueva descripción]`
     * Ejemplo: `modificar descripción de Llamar al cliente a Llamar a Juan Pérez`
 * **Modificar Fecha:** `modificar fecha de [tarea] a [nueva fecha]`
-    * Ejemplo: `modificar fecha de Llamar a Juan Pérez a tomorrow 2 pm`
+    * Ejemplo: `modificar fecha de Comprar pan a mañana a las 2 de la tarde`
 * **Modificar Categoría:** `modificar categoría de [tarea] a [nueva categoría]`
     * También: `asignar categoría [categoría] a [tarea]` o `poner [tarea] en categoría [categoría]`
     * Ejemplo: `modificar categoría de Comprar pan a Compras`
@@ -335,9 +501,9 @@ def main():
     global user_manager
     if not os.path.exists("usuarios"):
         os.makedirs("usuarios", exist_ok=True)
-    if not os.path.exists(user_manager.users_file):
-         with open(user_manager.users_file, "w", encoding='utf-8') as file:
-             json.dump({"usuarios": []}, file, indent=4)
+    if user_manager is None:
+        # El gestor crea su propio almacenamiento si no existe (usuarios.json, o usuarios.db con el backend SQLite)
+        user_manager = obtener_user_manager()
 
     print("Iniciando VoceTasks en modo consola.")
     print("Para usar la interfaz gráfica, ejecuta: python gui.py")
@@ -395,10 +561,15 @@ def main():
             user_manager.logout()
             break
 
-        accion = interpretar_comando(comando_entrada_original)
+        try:
+            accion = interpretar_comando(comando_entrada_original)
+        except Exception:
+            # Un fallo del intérprete no debe cerrar la sesión: se responde como a un comando no reconocido
+            log.exception("Error interpretando %r", comando_entrada_original)
+            accion = 'desconocido'
         respuesta_para_hablar = f"Comando '{comando_entrada_original}' no reconocido o acción no implementada en CLI."
-        print(f"Acción interpretada: {accion}") 
 
+        tramo_ejecutar = trazas.tramo("ejecutar", accion=accion[0] if isinstance(accion, tuple) else accion).iniciar()
         try:
             if isinstance(accion, tuple):
                 clave_accion = accion[0]
@@ -447,8 +618,7 @@ def main():
                     respuesta_para_hablar = msg
                 elif clave_accion == 'mostrar_categoria':
                     categoria_a_mostrar = accion[1]
-                    datos_tareas = mostrar_tareas(user_manager.current_user)
-                    tareas_filtradas = [t for t in datos_tareas.get('tareas', []) if t.get('categoria', '').lower() == categoria_a_mostrar.lower()] 
+                    tareas_filtradas = mostrar_tareas_categoria(categoria_a_mostrar, user_manager.current_user)
                     if tareas_filtradas:
                         respuesta_para_hablar = f"Tareas en categoría '{categoria_a_mostrar}':"
                         print(respuesta_para_hablar)
@@ -517,16 +687,16 @@ def main():
                     else:
                         respuesta_para_hablar = "Función de cambio de modo no disponible."
                 elif accion == 'ver_calendario_local':
-                    datos_tareas_cal_cli = mostrar_tareas(user_manager.current_user)
-                    tareas_con_fecha_cli = sorted([t_cal for t_cal in datos_tareas_cal_cli.get('tareas', []) if t_cal.get('fecha_limite')],key=lambda x: x['fecha_limite']) 
+                    # Solo las 5 primeras del índice ordenado por fecha límite (sin ordenar toda la lista)
+                    tareas_con_fecha_cli, total_con_fecha_cli = primeras_tareas_con_fecha(user_manager.current_user, 5)
                     if tareas_con_fecha_cli:
                         respuesta_para_hablar = "Próximas tareas con fecha límite:"
                         print("\n" + respuesta_para_hablar)
-                        for t_cal_item in tareas_con_fecha_cli[:5]:
+                        for t_cal_item in tareas_con_fecha_cli:
                              estado_cal_cli = "Completada" if t_cal_item.get('completada') else "Pendiente"
                              print(f"  - {t_cal_item['descripcion']} para el {t_cal_item['fecha_limite']} ({estado_cal_cli})")
-                        if len(tareas_con_fecha_cli) > 5: print(f"  ...y {len(tareas_con_fecha_cli)-5} más.")
-                        respuesta_para_hablar = f"Se listaron {len(tareas_con_fecha_cli)} tareas con fecha." if len(tareas_con_fecha_cli) >= 1 else "No tienes tareas con fecha."
+                        if total_con_fecha_cli > 5: print(f"  ...y {total_con_fecha_cli-5} más.")
+                        respuesta_para_hablar = f"Se listaron {total_con_fecha_cli} tareas con fecha." if total_con_fecha_cli >= 1 else "No tienes tareas con fecha."
                     else:
                         respuesta_para_hablar = "No tienes tareas con fecha límite asignada."
                 elif accion == 'logout':
@@ -542,6 +712,8 @@ def main():
             import traceback
             traceback.print_exc() 
             respuesta_para_hablar = "Ocurrió un error inesperado."
+        finally:
+            tramo_ejecutar.terminar()
 
         print(f"Respuesta: {respuesta_para_hablar}")
         if 'hablar' in globals() and callable(globals()['hablar']): hablar(respuesta_para_hablar)
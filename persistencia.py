@@ -0,0 +1,210 @@
+# persistencia.py
+# Escrituras a prueba de caídas para los archivos de datos (tareas, journal, usuarios).
+#
+# escribir_atomico() escribe en un temporal del mismo directorio y lo renombra sobre el destino:
+# quien lea el archivo ve la versión anterior completa o la nueva completa, nunca una a medias.
+# La durabilidad frente a cortes de luz (fsync) se elige con VOCETASKS_FSYNC:
+#   "no"      sin fsync; el sistema operativo vuelca los datos cuando quiere
+#   "siempre" fsync en cada escritura
+#   "grupo"   (por defecto) igual de durable que "siempre": cada escritura vuelve cuando un fsync
+#             posterior a ella ha terminado, pero las que llegan mientras otro fsync está en curso
+#             (otros hilos, otros usuarios, el journal de usuarios) se sincronizan juntas en el
+#             siguiente, con un único fsync por archivo en lugar de uno por operación
+#   "diferido" los anexos y renombrados vuelven sin esperar y un hilo los sincroniza en grupo tras
+#             VOCETASKS_FSYNC_VENTANA_MS (20 ms): más rápido en ráfagas (importaciones, dictado),
+#             pero un corte de luz puede perder las escrituras de esa última ventana
+#
+# En todos los modos salvo "no", el contenido de una reescritura completa se sincroniza antes de
+# renombrarla, así que una caída nunca deja una foto vacía o a medias.
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl # Bloqueos entre procesos (POSIX); en Windows solo quedan los bloqueos entre hilos
+except ImportError:
+    fcntl = None
+
+MODO_FSYNC = os.environ.get("VOCETASKS_FSYNC", "grupo").strip().lower()
+VENTANA_GRUPO = float(os.environ.get("VOCETASKS_FSYNC_VENTANA_MS", "20")) / 1000.0
+
+
+def _fsync_ruta(ruta):
+    """fsync de un archivo o directorio por ruta (los directorios no se pueden abrir en Windows)."""
+    try:
+        fd = os.open(ruta, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.fsync(fd)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+class GroupCommit:
+    """Agrupa los fsync de varios hilos en lotes: un fsync por archivo y lote.
+
+    sincronizar() (modo "grupo") espera a que termine un fsync que cubra su escritura: si no hay
+    ninguno en curso, el llamador hace de líder y sincroniza todo lo anotado hasta ese momento; si lo
+    hay, espera, y el siguiente líder sincroniza de una vez lo que se acumuló entretanto.
+    programar() (modo "diferido") solo anota la ruta; un hilo hace de líder tras cada ventana.
+    """
+
+    def __init__(self, ventana=VENTANA_GRUPO):
+        self.ventana = ventana
+        self.fsyncs = 0 # fsync realizados (diagnóstico y benchmarks)
+        self._cond = threading.Condition()
+        self._pendientes = set()
+        self._lote_abierto = 1 # Lote en el que entran las rutas anotadas ahora
+        self._lote_hecho = 0 # Último lote ya sincronizado
+        self._en_curso = False
+        self._hilo = None
+
+    def sincronizar(self, ruta):
+        """Hace durable lo escrito en ruta hasta ahora; vuelve cuando el fsync que lo cubre ha terminado."""
+        with self._cond:
+            self._pendientes.add(ruta)
+            self._esperar_lote(self._lote_abierto)
+
+    def programar(self, ruta):
+        """Anota que ruta tiene escrituras sin sincronizar; vuelve enseguida."""
+        with self._cond:
+            self._pendientes.add(ruta)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="group-commit", daemon=True)
+                self._hilo.start()
+            self._cond.notify_all()
+
+    def vaciar(self):
+        """Espera a que todo lo anotado hasta ahora esté sincronizado."""
+        with self._cond:
+            if self._pendientes or self._en_curso:
+                self._esperar_lote(self._lote_abierto)
+
+    def _esperar_lote(self, lote):
+        # Con self._cond tomado; lo suelta mientras espera o mientras hace los fsync como líder
+        while self._lote_hecho < lote:
+            if self._en_curso:
+                self._cond.wait()
+                continue
+            rutas, self._pendientes = self._pendientes, set()
+            en_curso = self._lote_abierto
+            self._lote_abierto += 1
+            self._en_curso = True
+            hechos = 0
+            self._cond.release()
+            try:
+                for ruta in rutas:
+                    if _fsync_ruta(ruta):
+                        hechos += 1
+            finally:
+                self._cond.acquire()
+                self.fsyncs += hechos
+                self._lote_hecho = en_curso
+                self._en_curso = False
+                self._cond.notify_all()
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while not self._pendientes:
+                    self._cond.wait()
+            # Dejar que se acumulen las escrituras que llegan casi a la vez
+            time.sleep(self.ventana)
+            self.vaciar()
+
+
+group_commit = GroupCommit()
+# Al salir, no perder los fsync diferidos que aún estén en la ventana
+atexit.register(group_commit.vaciar)
+
+
+class BloqueoArchivo:
+    """flock sobre un archivo .lock para coordinar procesos (consola y GUI sobre los mismos datos).
+
+    Reentrante dentro del proceso: lock es el RLock que protege el estado en memoria de su dueño y se
+    toma siempre antes que el flock, así que un hilo puede anidar tomar() (uno compartido dentro de
+    uno exclusivo no hace nada) y los demás hilos del proceso esperan en lock.
+    """
+
+    def __init__(self, ruta, lock):
+        self.ruta = ruta
+        self.lock = lock
+        self._fd = None
+        self._nivel = 0 # 0 ninguno, 1 compartido, 2 exclusivo (protegido por self.lock)
+
+    @contextmanager
+    def tomar(self, exclusivo):
+        nivel = 2 if exclusivo else 1
+        with self.lock:
+            if fcntl is None or self._nivel >= nivel:
+                yield
+                return
+            if self._fd is None:
+                try:
+                    self._fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+                except FileNotFoundError:
+                    # El directorio todavía no existe: no hay nada que proteger
+                    yield
+                    return
+            anterior = self._nivel
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+            self._nivel = nivel
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_SH if anterior else fcntl.LOCK_UN)
+                self._nivel = anterior
+
+
+def _sincronizar_directorio(directorio):
+    # Hace durable el renombrado (la entrada del directorio), no solo el contenido
+    if MODO_FSYNC == "siempre":
+        _fsync_ruta(directorio)
+    elif MODO_FSYNC == "grupo":
+        group_commit.sincronizar(directorio)
+    elif MODO_FSYNC == "diferido":
+        group_commit.programar(directorio)
+
+
+def escribir_atomico(ruta, contenido, encoding='utf-8'):
+    """Reemplaza el contenido de ruta de forma atómica (temporal + os.replace)."""
+    directorio = os.path.dirname(ruta) or "."
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    datos = contenido.encode(encoding) if isinstance(contenido, str) else contenido
+    try:
+        # os.open respeta la umask igual que open(ruta, "w")
+        fd = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        with os.fdopen(fd, "wb") as file:
+            file.write(datos)
+            if MODO_FSYNC != "no":
+                # El contenido debe ser durable antes de que el nombre apunte a él
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    _sincronizar_directorio(directorio)
+
+
+def anexar(ruta, texto, encoding='utf-8'):
+    """Añade texto al final de ruta y lo sincroniza según MODO_FSYNC (en "diferido", sin esperar)."""
+    with open(ruta, "a", encoding=encoding) as file:
+        file.write(texto)
+        if MODO_FSYNC == "siempre":
+            file.flush()
+            os.fsync(file.fileno())
+    if MODO_FSYNC == "grupo":
+        group_commit.sincronizar(ruta)
+    elif MODO_FSYNC == "diferido":
+        group_commit.programar(ruta)
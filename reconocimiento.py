@@ -0,0 +1,161 @@
+# reconocimiento.py
+# Motores de reconocimiento de voz intercambiables para utils.escuchar_comando. Cada usuario elige el
+# suyo en su configuración ("motor_reconocimiento"); sin preferencia se usa VOCETASKS_MOTOR_RECONOCIMIENTO
+# (por defecto "google"):
+#   "google"  servicio web de Google (speech_recognition.recognize_google); necesita conexión
+#   "vosk"    reconocimiento local sin red con Vosk (pip install vosk + un modelo en español, p. ej.
+#             vosk-model-small-es-0.42, en VOCETASKS_VOSK_MODELO). El modelo se carga una vez por
+#             proceso, en segundo plano desde que se elige el motor, y se mantiene en memoria
+#   "texto"   sustituto determinista para pruebas: no usa el micrófono y devuelve las frases de
+#             VOCETASKS_RECONOCIMIENTO_ARCHIVO (una por línea) o las pasadas con alimentar()
+
+import json
+import os
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+import trazas
+
+log = trazas.obtener("reconocimiento")
+
+MOTOR_POR_DEFECTO = os.environ.get("VOCETASKS_MOTOR_RECONOCIMIENTO", "google").strip().lower()
+IDIOMA = "es-ES"
+RUTA_MODELO_VOSK = os.environ.get("VOCETASKS_VOSK_MODELO", os.path.join("modelos", "vosk-model-small-es-0.42"))
+FRECUENCIA_VOSK = 16000
+
+
+class NoEntendido(Exception):
+    """Se capturó audio pero no se reconoció ninguna frase."""
+
+
+class ErrorServicio(Exception):
+    """El motor no está disponible (sin conexión, sin modelo, dependencia no instalada...)."""
+
+
+class MotorReconocimiento(ABC):
+    """Interfaz: reconocer(audio) -> texto. audio es un speech_recognition.AudioData (None si el motor
+    no usa el micrófono). Lanza NoEntendido o ErrorServicio.
+
+    Un motor que no implemente reconocer() no se puede instanciar (TypeError al crearlo en obtener_motor).
+    """
+
+    nombre = ""
+    necesita_microfono = True
+
+    @abstractmethod
+    def reconocer(self, audio):
+        """Texto reconocido en audio."""
+
+
+class MotorGoogle(MotorReconocimiento):
+    nombre = "google"
+
+    def __init__(self):
+        import speech_recognition as sr
+        self._sr = sr
+        self._reconocedor = sr.Recognizer()
+
+    def reconocer(self, audio):
+        try:
+            return self._reconocedor.recognize_google(audio, language=IDIOMA)
+        except self._sr.UnknownValueError:
+            raise NoEntendido()
+        except self._sr.RequestError as e:
+            raise ErrorServicio(str(e))
+
+
+class MotorVosk(MotorReconocimiento):
+    nombre = "vosk"
+
+    def __init__(self, ruta_modelo=RUTA_MODELO_VOSK):
+        self.ruta_modelo = ruta_modelo
+        self._modelo = None
+        self._error = None
+        self._cargado = threading.Event()
+        # Cargar el modelo (segundos y cientos de MB) sin bloquear a quien eligió el motor
+        threading.Thread(target=self._cargar, name="CargaVosk", daemon=True).start()
+
+    def _cargar(self):
+        try:
+            import vosk
+            vosk.SetLogLevel(-1)
+            if not os.path.isdir(self.ruta_modelo):
+                raise ErrorServicio(f"no existe el modelo de Vosk '{self.ruta_modelo}' (ver VOCETASKS_VOSK_MODELO)")
+            with trazas.tramo("cargar_modelo", motor=self.nombre):
+                self._modelo = vosk.Model(self.ruta_modelo)
+        except ImportError:
+            self._error = ErrorServicio("Vosk no está instalado (pip install vosk)")
+        except ErrorServicio as e:
+            self._error = e
+        except Exception as e:
+            self._error = ErrorServicio(f"no se pudo cargar el modelo de Vosk: {e}")
+        if self._error is not None:
+            log.warning("Reconocimiento local no disponible: %s", self._error)
+        self._cargado.set()
+
+    def reconocer(self, audio):
+        self._cargado.wait()
+        if self._error is not None:
+            raise self._error
+        import vosk
+        reconocedor = vosk.KaldiRecognizer(self._modelo, FRECUENCIA_VOSK)
+        reconocedor.AcceptWaveform(audio.get_raw_data(convert_rate=FRECUENCIA_VOSK, convert_width=2))
+        texto = json.loads(reconocedor.FinalResult()).get("text", "").strip()
+        if not texto:
+            raise NoEntendido()
+        return texto
+
+
+class MotorTexto(MotorReconocimiento):
+    """Devuelve frases fijadas de antemano, en orden; NoEntendido cuando no quedan."""
+
+    nombre = "texto"
+    necesita_microfono = False
+
+    def __init__(self, frases=(), archivo=None):
+        self._frases = queue.Queue()
+        for frase in frases:
+            self.alimentar(frase)
+        if archivo:
+            with open(archivo, "r", encoding='utf-8') as entrada:
+                for linea in entrada:
+                    if linea.strip():
+                        self.alimentar(linea)
+
+    def alimentar(self, frase):
+        self._frases.put(frase.strip())
+
+    def reconocer(self, audio):
+        try:
+            return self._frases.get_nowait()
+        except queue.Empty:
+            raise NoEntendido()
+
+
+def _crear_texto():
+    return MotorTexto(archivo=os.environ.get("VOCETASKS_RECONOCIMIENTO_ARCHIVO"))
+
+
+MOTORES = {"google": MotorGoogle, "vosk": MotorVosk, "texto": _crear_texto}
+
+_motores = {}
+_motores_lock = threading.Lock()
+
+
+def obtener_motor(nombre):
+    """Motor compartido del proceso para nombre (se crea la primera vez); los desconocidos usan el por defecto."""
+    nombre = (nombre or MOTOR_POR_DEFECTO).strip().lower()
+    if nombre not in MOTORES:
+        log.warning("Motor de reconocimiento desconocido '%s'; se usa '%s'", nombre, MOTOR_POR_DEFECTO)
+        nombre = MOTOR_POR_DEFECTO if MOTOR_POR_DEFECTO in MOTORES else "google"
+    with _motores_lock:
+        motor = _motores.get(nombre)
+        if motor is None:
+            motor = _motores[nombre] = MOTORES[nombre]()
+        return motor
+
+
+def motor_para(config):
+    """Motor elegido en la configuración de un usuario (o el por defecto si no tiene preferencia)."""
+    return obtener_motor((config or {}).get("motor_reconocimiento"))
@@ -0,0 +1,82 @@
+# serializacion.py
+# Formato en disco de tareas.json y usuarios.json.
+#
+# VOCETASKS_FORMATO elige cómo se escriben:
+#   "json"          (por defecto) JSON compacto, sin sangría; con orjson si está instalado
+#   "json-legible"  JSON con sangría de 4 espacios (el formato de las versiones anteriores)
+#   "msgpack"       binario con msgpack (requiere el paquete msgpack; solo para instalaciones
+#                   locales: la sincronización con Drive y otras herramientas esperan JSON)
+# La lectura detecta el formato por el contenido, así que los archivos antiguos (JSON con sangría)
+# y los escritos con otro formato se siguen leyendo sin conversión previa.
+#
+# Los errores de lectura se lanzan como json.JSONDecodeError, igual que json.load(), para que
+# el manejo de archivos corruptos de commands.py, task_store.py y user_management.py no cambie.
+
+import json
+import os
+
+from persistencia import escribir_atomico
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATO = os.environ.get("VOCETASKS_FORMATO", "json").strip().lower()
+if FORMATO == "msgpack" and msgpack is None:
+    print("Advertencia: VOCETASKS_FORMATO=msgpack pero msgpack no está instalado. Se usará JSON compacto.")
+    FORMATO = "json"
+
+
+def a_json(obj):
+    """JSON compacto en una sola línea (str); lo usan también las líneas del journal."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def de_json(texto):
+    if orjson is not None:
+        return orjson.loads(texto) # orjson.JSONDecodeError hereda de json.JSONDecodeError
+    return json.loads(texto)
+
+
+def serializar(obj, formato=None):
+    """Devuelve los bytes a escribir en disco según el formato configurado."""
+    formato = formato or FORMATO
+    if formato == "msgpack":
+        return msgpack.packb(obj, use_bin_type=True)
+    if formato == "json-legible":
+        return json.dumps(obj, indent=4, ensure_ascii=False).encode('utf-8')
+    return a_json(obj).encode('utf-8')
+
+
+def deserializar(datos):
+    """Interpreta bytes leídos de disco en cualquiera de los formatos soportados."""
+    inicio = datos.lstrip()[:1]
+    if inicio in (b"{", b"[") or datos.startswith(b"\xef\xbb\xbf"):
+        return de_json(datos.decode('utf-8-sig'))
+    if not inicio:
+        raise json.JSONDecodeError("Archivo vacío", "", 0)
+    if msgpack is None:
+        raise json.JSONDecodeError("Formato desconocido (¿msgpack sin el paquete msgpack instalado?)", "", 0)
+    try:
+        return msgpack.unpackb(datos, raw=False)
+    except Exception as e:
+        raise json.JSONDecodeError(f"msgpack inválido: {e}", "", 0)
+
+
+def cargar_archivo(ruta):
+    """Lee y deserializa un archivo de datos (FileNotFoundError si no existe)."""
+    with open(ruta, "rb") as file:
+        return deserializar(file.read())
+
+
+def guardar_archivo(ruta, obj):
+    """Serializa obj y reemplaza ruta de forma atómica (ver persistencia.escribir_atomico)."""
+    escribir_atomico(ruta, serializar(obj))
@@ -0,0 +1,379 @@
+# sqlite_task_store.py
+# Backend alternativo de tareas sobre SQLite (usuarios/<email>/tareas.db), con índices por fecha límite,
+# categoría, estado y descripción normalizada. Se activa con VOCETASKS_BACKEND_TAREAS=sqlite.
+#
+# Las fechas se guardan tal cual (fecha_limite, fecha_creacion) y, para las consultas por rango,
+# normalizadas a 'YYYY-MM-DD HH:MM:SS' (limite_norm, ref_norm) con el mismo criterio que
+# task_store.parsear_fecha: una fecha guardada sin hora cuenta como las 00:00 de ese día.
+#
+# Migración de todos los usuarios existentes:  python sqlite_task_store.py [directorio_usuarios]
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import timedelta
+
+from persistencia import MODO_FSYNC
+import trazas
+from serializacion import guardar_archivo
+from task_store import (TaskStore, IndiceTareas, FORMATO_FECHA, MUTAR_REINTENTOS, normalizar_descripcion, nuevo_id_tarea,
+                        parsear_fecha, tarea_serializable, copia_tarea)
+
+log = trazas.obtener("sqlite_task_store")
+
+# Columnas propias de la tabla; cualquier otra clave de la tarea se guarda en 'extra' como JSON
+CAMPOS_TAREA = ("id", "descripcion", "categoria", "fecha_creacion", "fecha_limite", "completada")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    pos INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT,
+    descripcion TEXT NOT NULL,
+    descripcion_norm TEXT NOT NULL,
+    categoria TEXT,
+    categoria_norm TEXT,
+    fecha_creacion TEXT,
+    fecha_limite TEXT,
+    completada INTEGER NOT NULL DEFAULT 0,
+    extra TEXT,
+    limite_norm TEXT,
+    ref_norm TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tareas_id ON tareas(id);
+DROP INDEX IF EXISTS idx_tareas_fecha_limite;
+DROP INDEX IF EXISTS idx_tareas_fecha_ref;
+CREATE INDEX IF NOT EXISTS idx_tareas_limite_norm ON tareas(limite_norm);
+CREATE INDEX IF NOT EXISTS idx_tareas_ref_norm ON tareas(ref_norm);
+CREATE INDEX IF NOT EXISTS idx_tareas_categoria ON tareas(categoria_norm);
+CREATE INDEX IF NOT EXISTS idx_tareas_completada ON tareas(completada);
+CREATE INDEX IF NOT EXISTS idx_tareas_descripcion ON tareas(descripcion_norm);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+_SELECT_TAREAS = "SELECT id, descripcion, categoria, fecha_creacion, fecha_limite, completada, extra FROM tareas"
+_INSERT_TAREA = "INSERT INTO tareas (id, descripcion, descripcion_norm, categoria, categoria_norm, fecha_creacion, fecha_limite, completada, extra, limite_norm, ref_norm) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_UPDATE_TAREA = "UPDATE tareas SET id = ?, descripcion = ?, descripcion_norm = ?, categoria = ?, categoria_norm = ?, fecha_creacion = ?, fecha_limite = ?, completada = ?, extra = ?, limite_norm = ?, ref_norm = ? WHERE id = ?"
+
+
+def _normalizar_categoria(categoria):
+    return (categoria or "General").strip().lower()
+
+
+def _fecha_norm(valor):
+    """Fecha en FORMATO_FECHA (comparable como texto), o None si falta o no es válida."""
+    fecha = parsear_fecha(valor)
+    return fecha.strftime(FORMATO_FECHA) if fecha else None
+
+
+def _tarea_a_fila(tarea):
+    extra = {k: v for k, v in tarea.items() if k not in CAMPOS_TAREA and k != "journal_base" and not k.startswith("_")}
+    descripcion = tarea.get("descripcion", "")
+    limite_norm = _fecha_norm(tarea.get("fecha_limite"))
+    # Misma referencia que task_store.anotar_fechas: el límite si existe, si no la creación
+    ref_norm = _fecha_norm(tarea.get("fecha_limite") or tarea.get("fecha_creacion"))
+    return (tarea.get("id") or nuevo_id_tarea(), descripcion, normalizar_descripcion(descripcion), tarea.get("categoria"), _normalizar_categoria(tarea.get("categoria")),
+            tarea.get("fecha_creacion"), tarea.get("fecha_limite"), 1 if tarea.get("completada") else 0,
+            json.dumps(extra, ensure_ascii=False) if extra else None, limite_norm, ref_norm)
+
+
+def _fila_a_tarea(fila):
+    id_tarea, descripcion, categoria, fecha_creacion, fecha_limite, completada, extra = fila
+    tarea = {"id": id_tarea, "descripcion": descripcion, "categoria": categoria, "fecha_creacion": fecha_creacion,
+             "fecha_limite": fecha_limite, "completada": bool(completada)}
+    for campo in ("categoria", "fecha_creacion"):
+        if tarea[campo] is None:
+            # Las tareas antiguas no tenían estas claves; tarea.get(campo, defecto) debe seguir dando el defecto
+            del tarea[campo]
+    if extra:
+        tarea.update(json.loads(extra))
+    return tarea
+
+
+class SqliteTaskStore:
+    """Almacén de tareas de un usuario sobre SQLite, con la misma interfaz que TaskStore.
+
+    tareas.json se sigue usando como formato de intercambio (sincronización con Drive):
+    compact() lo exporta y, si cambió por fuera desde la última exportación, se vuelve a importar al
+    abrir la base o al llamar a recargar() (tras una descarga de Drive); nunca dentro de otra transacción.
+    """
+
+    def __init__(self, email, base_dir="usuarios"):
+        self.email = email
+        self.base_dir = base_dir
+        self.ruta_archivo = f"{base_dir}/{email}/tareas.json"
+        self.ruta_db = f"{base_dir}/{email}/tareas.db"
+        self.lock = threading.RLock()
+        self._conexion = None
+        self._data = None
+        self._indice = None
+        self._data_version = None
+
+    def _conectar(self):
+        if self._conexion is None:
+            os.makedirs(os.path.dirname(self.ruta_db), exist_ok=True)
+            # La conexión se comparte entre hilos (UI, voz, reportes); self.lock serializa el acceso
+            self._conexion = sqlite3.connect(self.ruta_db, check_same_thread=False)
+            columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(tareas)")}
+            if columnas and "id" not in columnas:
+                # Base creada antes de existir los ids: añadir la columna y rellenarla
+                with self._conexion:
+                    self._conexion.execute("ALTER TABLE tareas ADD COLUMN id TEXT")
+                    pos_sin_id = [fila[0] for fila in self._conexion.execute("SELECT pos FROM tareas")]
+                    self._conexion.executemany("UPDATE tareas SET id = ? WHERE pos = ?", [(nuevo_id_tarea(), pos) for pos in pos_sin_id])
+            if columnas and "limite_norm" not in columnas:
+                # Base creada antes de normalizar las fechas: añadir las columnas y calcularlas
+                with self._conexion:
+                    self._conexion.execute("ALTER TABLE tareas ADD COLUMN limite_norm TEXT")
+                    self._conexion.execute("ALTER TABLE tareas ADD COLUMN ref_norm TEXT")
+                    filas = self._conexion.execute("SELECT pos, fecha_limite, fecha_creacion FROM tareas").fetchall()
+                    self._conexion.executemany("UPDATE tareas SET limite_norm = ?, ref_norm = ? WHERE pos = ?",
+                                               [(_fecha_norm(limite), _fecha_norm(limite or creacion), pos) for pos, limite, creacion in filas])
+            self._conexion.executescript(ESQUEMA)
+            if MODO_FSYNC == "no":
+                # Misma política de durabilidad que los archivos JSON (ver persistencia.py)
+                self._conexion.execute("PRAGMA synchronous = OFF")
+            # Recién abierta no hay ninguna transacción en curso: es el momento de importar tareas.json
+            self._importar_json_si_cambio()
+        return self._conexion
+
+    def _firma_json(self):
+        try:
+            st = os.stat(self.ruta_archivo)
+        except FileNotFoundError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _leer_meta(self, clave):
+        fila = self._conectar().execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def _escribir_meta(self, clave, valor):
+        self._conectar().execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (clave, valor))
+
+    def _importar_json_si_cambio(self):
+        """Importa tareas.json (foto + journal) si cambió desde la última importación/exportación."""
+        firma = self._firma_json()
+        if firma is None or firma == self._leer_meta("firma_json"):
+            return
+        try:
+            # TaskStore aplica el journal y asigna ids a las tareas antiguas (lo que puede reescribir tareas.json)
+            data = TaskStore(self.email, base_dir=self.base_dir).load()
+        except (json.JSONDecodeError, IOError) as e:
+            log.warning("No se pudo importar %s a SQLite: %s", self.ruta_archivo, e)
+            return
+        firma = self._firma_json()
+        if isinstance(data, dict) and isinstance(data.get("tareas"), list):
+            self._reemplazar_todo(data["tareas"], firma)
+
+    def _reemplazar_todo(self, tareas, firma_json):
+        conexion = self._conectar()
+        with conexion:
+            conexion.execute("DELETE FROM tareas")
+            conexion.executemany(_INSERT_TAREA, [_tarea_a_fila(t) for t in tareas if isinstance(t, dict)])
+            self._escribir_meta("firma_json", firma_json)
+        self.invalidate()
+
+    def _consultar(self, sql, parametros=()):
+        return [_fila_a_tarea(f) for f in self._conectar().execute(sql, parametros)]
+
+    def invalidate(self):
+        with self.lock:
+            self._data = None
+            self._indice = None
+            self._data_version = None
+
+    def load(self):
+        """Devuelve {"tareas": [...]}; se mantiene en caché mientras ninguna otra conexión escriba en la base."""
+        with self.lock:
+            version = self._conectar().execute("PRAGMA data_version").fetchone()[0]
+            if self._data is None or version != self._data_version:
+                self._data = {"tareas": self._consultar(_SELECT_TAREAS + " ORDER BY pos")}
+                self._indice = IndiceTareas(self._data)
+                self._data_version = version
+            return self._data
+
+    def recargar(self):
+        """Importa tareas.json si cambió por fuera (p. ej. tras descargarlo de Drive)."""
+        with self.lock:
+            if self._conexion is None:
+                self._conectar() # Al abrir la base ya se importa
+            elif self._conexion.in_transaction:
+                raise RuntimeError("recargar() no puede llamarse con una transacción abierta")
+            else:
+                self._importar_json_si_cambio()
+
+    def instantanea(self):
+        """Igual que TaskStore.instantanea: copia de {"tareas": [...]} que no comparte nada con la caché."""
+        with self.lock:
+            return {"tareas": [copia_tarea(t) for t in self.load()["tareas"]]}
+
+    def save(self, data=None):
+        """Reemplaza todas las tareas de la base por las de data."""
+        with self.lock:
+            if data is None:
+                data = self.load()
+            self._reemplazar_todo(data.get("tareas", []), self._leer_meta("firma_json"))
+
+    def apply(self, op):
+        """Traduce una operación de journal (ver task_store.IndiceTareas) a SQL.
+
+        Un lote ({"op": "lote", "ops": [...]}) se ejecuta en una sola transacción.
+        """
+        with self.lock:
+            self.load()
+            self._confirmar(op)
+
+    def mutar(self, calcular):
+        """Igual que TaskStore.mutar: calcular(store) -> (op o None, resultado), recalculado si otra conexión escribió."""
+        with self.lock:
+            for _ in range(MUTAR_REINTENTOS):
+                self.load()
+                version = self._data_version
+                op, resultado = calcular(self)
+                if op is None:
+                    return resultado
+                conexion = self._conectar()
+                # BEGIN IMMEDIATE reserva la escritura; los lectores de otras conexiones no se bloquean
+                conexion.execute("BEGIN IMMEDIATE")
+                if conexion.execute("PRAGMA data_version").fetchone()[0] == version:
+                    self._confirmar(op) # Confirma la transacción abierta
+                    return resultado
+                conexion.rollback()
+                self.invalidate()
+            # Mucha contención: calcular dentro de la transacción de escritura (ya no puede haber conflicto)
+            conexion = self._conectar()
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                self.load()
+                op, resultado = calcular(self)
+            except Exception:
+                conexion.rollback()
+                raise
+            if op is None:
+                conexion.rollback()
+            else:
+                self._confirmar(op)
+            return resultado
+
+    def _confirmar(self, op):
+        conexion = self._conectar()
+        try:
+            with trazas.tramo("persistir", destino="sqlite", op=op.get("op")), conexion:
+                op = self._ejecutar(conexion, op)
+        except Exception:
+            self.invalidate()
+            raise
+        if op is not None:
+            # Mantener la caché al día sin releer la tabla; data_version no cambia con las escrituras propias
+            self._indice.aplicar(op)
+
+    def _ejecutar(self, conexion, op):
+        """Ejecuta op dentro de la transacción abierta; devuelve la operación tal como se aplicó (None si se ignora)."""
+        tipo = op.get("op")
+        if "id" in op:
+            filtro, clave = "id = ?", op["id"]
+        else:
+            filtro, clave = "pos = (SELECT pos FROM tareas WHERE descripcion_norm = ? ORDER BY pos LIMIT 1)", op.get("descripcion")
+        if tipo == "lote":
+            aplicadas = (self._ejecutar(conexion, sub_op) for sub_op in op.get("ops", []))
+            return dict(op, ops=[sub_op for sub_op in aplicadas if sub_op is not None])
+        elif tipo == "add":
+            tarea = dict(op["tarea"])
+            tarea.setdefault("id", nuevo_id_tarea())
+            op = dict(op, tarea=tarea)
+            conexion.execute(_INSERT_TAREA, _tarea_a_fila(tarea))
+        elif tipo == "delete":
+            # Las operaciones antiguas por descripción eliminan todas las coincidencias
+            conexion.execute("DELETE FROM tareas WHERE " + (filtro if "id" in op else "descripcion_norm = ?"), (clave,))
+        elif tipo == "complete":
+            conexion.execute(f"UPDATE tareas SET completada = 1 WHERE {filtro}", (clave,))
+        elif tipo == "modify":
+            fila = conexion.execute(_SELECT_TAREAS + f" WHERE {filtro}", (clave,)).fetchone()
+            if fila is not None:
+                tarea = _fila_a_tarea(fila)
+                tarea.update(op.get("cambios", {}))
+                conexion.execute(_UPDATE_TAREA, _tarea_a_fila(tarea) + (tarea["id"],))
+        else:
+            log.warning("Operación desconocida ignorada: %s", op)
+            return None
+        return op
+
+    def buscar(self, clave):
+        """Devuelve la tarea con ese id o descripción, o None."""
+        with self.lock:
+            self.load()
+            return self._indice.buscar(clave)
+
+    def buscar_por_descripcion(self, descripcion):
+        with self.lock:
+            self.load()
+            return self._indice.buscar_por_descripcion(descripcion)
+
+    def buscar_aproximada(self, texto, n=3):
+        with self.lock:
+            self.load()
+            return self._indice.buscar_aproximada(texto, n)
+
+    def compact(self):
+        """Exporta las tareas a tareas.json (formato de intercambio usado por la sincronización con Drive)."""
+        with self.lock:
+            data = self.load()
+            guardar_archivo(self.ruta_archivo, {"tareas": [tarea_serializable(t) for t in data["tareas"]]})
+            with self._conectar():
+                self._escribir_meta("firma_json", self._firma_json())
+
+    # --- Consultas resueltas con los índices ---
+
+    def tareas_en_periodo(self, fecha_inicio, fecha_fin):
+        """Tareas cuya fecha límite (o de creación) cae entre dos fechas, ambas inclusive."""
+        with self.lock:
+            self.load()
+            return self._consultar(_SELECT_TAREAS + " WHERE ref_norm >= ? AND ref_norm < ? ORDER BY ref_norm, pos",
+                                   (fecha_inicio.strftime('%Y-%m-%d'), (fecha_fin + timedelta(days=1)).strftime('%Y-%m-%d')))
+
+    def tareas_por_categoria(self, categoria):
+        with self.lock:
+            self.load()
+            return self._consultar(_SELECT_TAREAS + " WHERE categoria_norm = ? ORDER BY pos", (_normalizar_categoria(categoria),))
+
+    def tareas_con_limite_entre(self, inicio_dt, fin_dt):
+        with self.lock:
+            self.load()
+            if inicio_dt.microsecond:
+                # Las fechas guardadas no tienen fracciones de segundo: 10:00:00.5 empieza en 10:00:01
+                inicio_dt = inicio_dt.replace(microsecond=0) + timedelta(seconds=1)
+            return self._consultar(_SELECT_TAREAS + " WHERE limite_norm >= ? AND limite_norm <= ? ORDER BY limite_norm, pos",
+                                   (inicio_dt.strftime(FORMATO_FECHA), fin_dt.strftime(FORMATO_FECHA)))
+
+    def primeras_con_limite(self, n):
+        with self.lock:
+            self.load()
+            total = self._conectar().execute("SELECT COUNT(*) FROM tareas WHERE limite_norm IS NOT NULL").fetchone()[0]
+            return self._consultar(_SELECT_TAREAS + " WHERE limite_norm IS NOT NULL ORDER BY limite_norm, pos LIMIT ?", (n,)), total
+
+
+def migrar_usuarios_a_sqlite(base_dir="usuarios"):
+    """Crea/actualiza tareas.db a partir de tareas.json (y su journal) para cada usuario de base_dir."""
+    migrados = 0
+    if not os.path.isdir(base_dir):
+        print(f"No existe el directorio de usuarios '{base_dir}'.")
+        return migrados
+    for email in sorted(os.listdir(base_dir)):
+        if not os.path.isfile(os.path.join(base_dir, email, "tareas.json")):
+            continue
+        store = SqliteTaskStore(email, base_dir=base_dir)
+        with store.lock:
+            total = len(store.load()["tareas"])
+        print(f"{email}: {total} tareas en {store.ruta_db}")
+        migrados += 1
+    return migrados
+
+
+if __name__ == "__main__":
+    directorio = sys.argv[1] if len(sys.argv) > 1 else "usuarios"
+    print(f"Usuarios migrados a SQLite: {migrar_usuarios_a_sqlite(directorio)}")
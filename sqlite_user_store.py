@@ -0,0 +1,146 @@
+# sqlite_user_store.py
+# Backend alternativo de usuarios sobre SQLite (usuarios.db), indexado por email. Se activa con
+# VOCETASKS_BACKEND_USUARIOS=sqlite. A diferencia de usuarios.json, no se carga nada al arrancar:
+# login, registro y configuración leen o escriben solo la fila del usuario afectado.
+#
+# La primera vez se importa usuarios.json (foto + journal) si la base está vacía.
+# Migración explícita:  python sqlite_user_store.py [usuarios.json]
+
+import os
+import sqlite3
+import sys
+
+from persistencia import MODO_FSYNC
+from serializacion import a_json, de_json
+from user_management import UserManager
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    email TEXT PRIMARY KEY,
+    datos TEXT NOT NULL
+);
+"""
+
+# Usuarios leídos por bloque en get_all_users (el lock no se retiene mientras se consumen)
+TAMANO_BLOQUE = 500
+
+
+class SqliteUserManager(UserManager):
+    """UserManager sobre SQLite, con la misma interfaz; cada registro es una fila (email, JSON del usuario).
+
+    Solo se guardan en memoria los usuarios ya consultados en este proceso. La caché se descarta si otra
+    conexión (otro proceso) escribe en la base, igual que sqlite_task_store.SqliteTaskStore.
+    """
+
+    def __init__(self, users_file="usuarios.json"):
+        self.ruta_db = os.path.splitext(users_file)[0] + ".db"
+        self._conexion = None
+        self._cache = {}
+        self._data_version = None
+        super().__init__(users_file)
+
+    def _conectar(self):
+        if self._conexion is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta_db)), exist_ok=True)
+            # La conexión se comparte entre hilos (UI, voz, notificaciones); self._lock serializa el acceso
+            self._conexion = sqlite3.connect(self.ruta_db, check_same_thread=False)
+            self._conexion.executescript(ESQUEMA)
+            if MODO_FSYNC == "no":
+                # Misma política de durabilidad que los archivos JSON (ver persistencia.py)
+                self._conexion.execute("PRAGMA synchronous = OFF")
+        return self._conexion
+
+    def _validar_cache(self):
+        version = self._conectar().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._cache = {}
+            self._data_version = version
+
+    def load_users(self):
+        """Abre la base (importando usuarios.json si está vacía); no lee ningún usuario"""
+        with self._lock:
+            self.users = None # No hay diccionario con todos los usuarios en este backend
+            conexion = self._conectar()
+            if conexion.execute("SELECT 1 FROM usuarios LIMIT 1").fetchone() is None and os.path.exists(self.users_file):
+                self.importar_json()
+            self._cache = {}
+            self._data_version = None
+
+    def importar_json(self):
+        """Copia a la base los usuarios de usuarios.json que aún no estén en ella; devuelve cuántos"""
+        origen = UserManager(self.users_file) # Foto + journal
+        with self._lock:
+            conexion = self._conectar()
+            with conexion:
+                antes = conexion.total_changes
+                conexion.executemany("INSERT OR IGNORE INTO usuarios (email, datos) VALUES (?, ?)",
+                                     [(email, a_json(usuario)) for email, usuario in origen.users.items()])
+                return conexion.total_changes - antes
+
+    def save_users(self):
+        """Cada cambio ya se confirma en su propia transacción: no hay nada que reescribir"""
+
+    def flush(self):
+        """Sin cambios pendientes en este backend (ver save_users)"""
+
+    def _obtener(self, email):
+        if not email:
+            return None
+        with self._lock:
+            self._validar_cache()
+            if email not in self._cache:
+                fila = self._conectar().execute("SELECT datos FROM usuarios WHERE email = ?", (email,)).fetchone()
+                if fila is None:
+                    return None # Los emails inexistentes no se guardan en caché: otro proceso puede registrarlos
+                self._cache[email] = de_json(fila[0])
+            return self._cache[email]
+
+    def _insertar(self, usuario):
+        with self._lock:
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute("INSERT OR REPLACE INTO usuarios (email, datos) VALUES (?, ?)", (usuario["email"], a_json(usuario)))
+            self._validar_cache()
+            self._cache[usuario["email"]] = usuario
+
+    def _actualizar_config(self, email, cambios, reemplazar=False):
+        with self._lock:
+            conexion = self._conectar()
+            # BEGIN IMMEDIATE: leer y reescribir la fila sin que otro proceso cambie la configuración en medio
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                fila = conexion.execute("SELECT datos FROM usuarios WHERE email = ?", (email,)).fetchone()
+                if fila is None:
+                    conexion.rollback()
+                    return False
+                usuario = de_json(fila[0])
+                if reemplazar or not isinstance(usuario.get("config"), dict):
+                    usuario["config"] = {}
+                usuario["config"].update(cambios)
+                conexion.execute("UPDATE usuarios SET datos = ? WHERE email = ?", (a_json(usuario), email))
+                conexion.commit()
+            except BaseException:
+                conexion.rollback()
+                raise
+            self._validar_cache()
+            self._cache[email] = usuario
+            return True
+
+    def _iterar(self):
+        ultimo = ""
+        while True:
+            with self._lock:
+                filas = self._conectar().execute("SELECT email, datos FROM usuarios WHERE email > ? ORDER BY email LIMIT ?",
+                                                 (ultimo, TAMANO_BLOQUE)).fetchall()
+            for email, datos in filas:
+                yield de_json(datos)
+            if len(filas) < TAMANO_BLOQUE:
+                return
+            ultimo = filas[-1][0]
+
+
+if __name__ == "__main__":
+    ruta = sys.argv[1] if len(sys.argv) > 1 else "usuarios.json"
+    gestor = SqliteUserManager(ruta) # Importa usuarios.json si la base está vacía
+    gestor.importar_json()           # ...y, si no, los usuarios que falten
+    print(f"Usuarios en {gestor.ruta_db}: {sum(1 for _ in gestor.get_all_users())}")
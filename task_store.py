@@ -0,0 +1,656 @@
+# task_store.py
+# Caché en memoria de las tareas de cada usuario, compartida por todas las funciones de commands.py.
+#
+# Persistencia: tareas.json es una "foto" (snapshot) y cada cambio posterior se anexa como una línea
+# JSON en tareas.journal.jsonl. Al cargar se lee la foto y se reaplican las operaciones del journal;
+# cuando el journal crece demasiado se compacta en segundo plano reescribiendo la foto.
+#
+# Concurrencia entre procesos (consola y GUI sobre el mismo usuarios/): las lecturas de disco toman un
+# bloqueo compartido y las escrituras uno exclusivo sobre tareas.lock. La foto guarda un número de
+# versión que cada línea del journal incrementa en uno; mutar() calcula el cambio sin bloquear el
+# archivo y solo lo confirma si la versión no cambió entretanto (si cambió, lo recalcula).
+
+import bisect
+import heapq
+import json
+import os
+import re
+import threading
+import unicodedata
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from persistencia import BloqueoArchivo, anexar, escribir_atomico
+from serializacion import a_json, cargar_archivo, de_json, guardar_archivo
+import trazas
+
+log = trazas.obtener("task_store")
+
+# Backend de almacenamiento de tareas: "json" (tareas.json + journal) o "sqlite" (tareas.db, ver sqlite_task_store.py)
+BACKEND_TAREAS = os.environ.get("VOCETASKS_BACKEND_TAREAS", "json").strip().lower()
+
+# Umbrales de compactación del journal
+JOURNAL_MAX_BYTES = 1024 * 1024     # Compactar siempre a partir de 1 MiB
+JOURNAL_MIN_BYTES = 64 * 1024       # Por debajo de esto nunca compensa reescribir la foto
+JOURNAL_RATIO_MAX = 0.5             # ...y por encima, compactar si supera la mitad del tamaño de la foto
+
+# Intentos optimistas de mutar() antes de calcular el cambio con el bloqueo exclusivo ya tomado
+MUTAR_REINTENTOS = 3
+
+# Búsqueda aproximada: ids leídos de las listas de trigramas (las más raras primero) antes de puntuar,
+# y candidatos con más trigramas en común que se puntúan con exactitud
+DIFUSO_MAX_LEIDOS = 2000
+DIFUSO_MAX_CANDIDATOS = 30
+
+
+def normalizar_descripcion(descripcion):
+    """Clave de comparación de descripciones (insensible a mayúsculas/minúsculas y espacios)."""
+    return descripcion.strip().lower()
+
+
+_RE_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+_SIN_TILDES = str.maketrans("áéíóúüñàèìòùç", "aeiouunaeiouc")
+
+def plegar_descripcion(descripcion):
+    """Clave de la búsqueda aproximada: minúsculas, sin tildes ni signos, espacios simples ('Médico!' -> 'medico')."""
+    texto = descripcion.lower().translate(_SIN_TILDES)
+    if not texto.isascii():
+        # Otros signos diacríticos (poco frecuentes): descomponer y quitar las marcas
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return _RE_NO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def trigramas(texto_plegado):
+    # Con dos espacios delante, el principio de la frase pesa más (es lo que mejor se transcribe)
+    relleno = f"  {texto_plegado} "
+    return frozenset([relleno[i:i + 3] for i in range(len(relleno) - 2)])
+
+
+def nuevo_id_tarea():
+    """Identificador estable y único de una tarea."""
+    return uuid.uuid4().hex
+
+
+# --- Fechas ya interpretadas, guardadas en la tarea en memoria ---
+# Las claves que empiezan por "_" son solo de memoria: tarea_serializable() las quita antes de escribir.
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+def parsear_fecha(valor):
+    """'YYYY-MM-DD HH:MM:SS' (o solo 'YYYY-MM-DD') → datetime; None si falta o no es válida."""
+    if not isinstance(valor, str) or not valor:
+        return None
+    try:
+        return datetime.strptime(valor, FORMATO_FECHA)
+    except ValueError:
+        # Tolerar fechas guardadas sin hora
+        try:
+            return datetime.strptime(valor.split(" ")[0], '%Y-%m-%d')
+        except ValueError:
+            return None
+
+
+def anotar_fechas(tarea):
+    """Interpreta una sola vez fecha_limite y la fecha de referencia (límite o, si no hay, creación)."""
+    tarea["_limite_dt"] = parsear_fecha(tarea.get("fecha_limite"))
+    tarea["_ref_dt"] = parsear_fecha(tarea.get("fecha_limite") or tarea.get("fecha_creacion"))
+
+
+def limite_dt(tarea):
+    """datetime de la fecha límite de la tarea (None si no tiene o no es válida)."""
+    if "_limite_dt" not in tarea:
+        anotar_fechas(tarea)
+    return tarea["_limite_dt"]
+
+
+def referencia_dt(tarea):
+    """datetime de la fecha límite o, si no tiene, de la de creación (la que usan los reportes)."""
+    if "_ref_dt" not in tarea:
+        anotar_fechas(tarea)
+    return tarea["_ref_dt"]
+
+
+def tarea_serializable(tarea):
+    """Copia de la tarea sin las claves internas de memoria."""
+    if not isinstance(tarea, dict):
+        return tarea
+    return {clave: valor for clave, valor in tarea.items() if not clave.startswith("_")}
+
+
+def copia_tarea(tarea):
+    """Copia de la tarea para usar fuera del store; conserva las fechas ya interpretadas (_limite_dt, _ref_dt).
+
+    Los reportes y el calendario llaman a limite_dt() sobre estas copias sin volver a interpretar las cadenas.
+    Si se cambia fecha_limite en la copia, las fechas interpretadas quedan desfasadas: los cambios van por el store.
+    """
+    return dict(tarea) if isinstance(tarea, dict) else tarea
+
+
+class IndiceFechas:
+    """Fechas ordenadas (con el id de su tarea al lado) para consultar rangos con bisect en O(log n + k)."""
+
+    def __init__(self):
+        self.fechas = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.fechas)
+
+    def agregar(self, fecha, id_tarea):
+        # bisect_right: a igual fecha se conserva el orden de inserción (el de la lista de tareas)
+        i = bisect.bisect_right(self.fechas, fecha)
+        self.fechas.insert(i, fecha)
+        self.ids.insert(i, id_tarea)
+
+    def quitar(self, fecha, id_tarea):
+        i = bisect.bisect_left(self.fechas, fecha)
+        while i < len(self.fechas) and self.fechas[i] == fecha:
+            if self.ids[i] == id_tarea:
+                del self.fechas[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def rango(self, inicio, fin):
+        """Ids con fecha en [inicio, fin], en orden de fecha."""
+        return self.ids[bisect.bisect_left(self.fechas, inicio):bisect.bisect_right(self.fechas, fin)]
+
+
+class IndiceTrigramas:
+    """Trigramas de las descripciones plegadas -> ids, para encontrar la tarea que el usuario quiso
+    nombrar aunque el reconocimiento de voz no la transcriba igual ("compra leche" por "Comprar leche").
+    """
+
+    def __init__(self):
+        self.por_trigrama = {}
+        self.num_trigramas = {} # id -> cuántos trigramas tiene su descripción (no se guardan los trigramas)
+
+    def agregar(self, id_tarea, descripcion):
+        propios = trigramas(plegar_descripcion(descripcion))
+        self.num_trigramas[id_tarea] = len(propios)
+        for trigrama in propios:
+            self.por_trigrama.setdefault(trigrama, set()).add(id_tarea)
+
+    def quitar(self, id_tarea, descripcion):
+        if self.num_trigramas.pop(id_tarea, None) is None:
+            return
+        for trigrama in trigramas(plegar_descripcion(descripcion)):
+            ids = self.por_trigrama.get(trigrama)
+            if ids is not None:
+                ids.discard(id_tarea)
+                if not ids:
+                    del self.por_trigrama[trigrama]
+
+    def buscar(self, texto, n=3):
+        """Hasta n pares (puntuación, id) de mayor a menor puntuación, entre 0 y 1.
+
+        La puntuación es la media del coeficiente de Dice y de la fracción de trigramas de texto que
+        tiene la descripción: nombrar solo una parte ("leche") también puntúa alto. Los candidatos salen
+        de las listas de trigramas más raras, así que el coste no crece con el número de tareas.
+        """
+        consulta = trigramas(plegar_descripcion(texto))
+        listas = sorted((self.por_trigrama[t] for t in consulta if t in self.por_trigrama), key=len)
+        if not listas:
+            return []
+        comunes = Counter()
+        leidos = 0
+        for ids in listas:
+            if leidos and leidos + len(ids) > DIFUSO_MAX_LEIDOS:
+                break
+            comunes.update(ids)
+            leidos += len(ids)
+        puntuados = []
+        for id_tarea, _ in comunes.most_common(DIFUSO_MAX_CANDIDATOS):
+            en_comun = sum(1 for ids in listas if id_tarea in ids)
+            dice = 2 * en_comun / (len(consulta) + self.num_trigramas[id_tarea])
+            puntuados.append(((dice + en_comun / len(consulta)) / 2, id_tarea))
+        return heapq.nlargest(n, puntuados)
+
+
+class IndiceTareas:
+    """Índices sobre la lista de tareas en memoria: id → tarea, descripción normalizada → id
+    y fechas ordenadas (límite, y límite o creación) para las consultas por rango.
+
+    También aplica las operaciones del journal manteniendo los índices al día:
+      {"op": "add", "tarea": {...}}
+      {"op": "delete", "id": <id>}
+      {"op": "modify", "id": <id>, "cambios": {...}}
+      {"op": "complete", "id": <id>}
+      {"op": "lote", "ops": [...]} (varias de las anteriores, en orden)
+    Las operaciones antiguas identifican la tarea con "descripcion" (normalizada) en lugar de "id".
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.por_id = {}
+        self.por_descripcion = {}
+        self.por_limite = IndiceFechas()
+        self.por_referencia = IndiceFechas()
+        self.ids_asignados = False # True si hubo que generar ids para tareas antiguas
+        self._hay_duplicados = False
+        self._trigramas = None # IndiceTrigramas; se crea en la primera búsqueda aproximada
+        if not isinstance(data.get("tareas"), list):
+            data["tareas"] = []
+        for tarea in data["tareas"]:
+            self._indexar(tarea)
+
+    def _indexar(self, tarea):
+        if not isinstance(tarea, dict):
+            return
+        if not tarea.get("id"):
+            tarea["id"] = nuevo_id_tarea()
+            self.ids_asignados = True
+        self.por_id[tarea["id"]] = tarea
+        self._indexar_descripcion(tarea)
+        self._indexar_fechas(tarea)
+
+    def _indexar_descripcion(self, tarea):
+        if "descripcion" in tarea:
+            if self._trigramas is not None:
+                self._trigramas.agregar(tarea["id"], tarea["descripcion"])
+            # Con descripciones repetidas (datos antiguos) gana la primera, como en la búsqueda lineal
+            if self.por_descripcion.setdefault(normalizar_descripcion(tarea["descripcion"]), tarea["id"]) != tarea["id"]:
+                self._hay_duplicados = True
+
+    def _indexar_fechas(self, tarea):
+        anotar_fechas(tarea)
+        if tarea["_limite_dt"] is not None:
+            self.por_limite.agregar(tarea["_limite_dt"], tarea["id"])
+        if tarea["_ref_dt"] is not None:
+            self.por_referencia.agregar(tarea["_ref_dt"], tarea["id"])
+
+    def _desindexar_fechas(self, tarea):
+        if tarea.get("_limite_dt") is not None:
+            self.por_limite.quitar(tarea["_limite_dt"], tarea["id"])
+        if tarea.get("_ref_dt") is not None:
+            self.por_referencia.quitar(tarea["_ref_dt"], tarea["id"])
+
+    def _desindexar_descripcion(self, tarea):
+        if "descripcion" not in tarea:
+            return
+        if self._trigramas is not None:
+            self._trigramas.quitar(tarea.get("id"), tarea["descripcion"])
+        desc = normalizar_descripcion(tarea["descripcion"])
+        if self.por_descripcion.get(desc) == tarea.get("id"):
+            del self.por_descripcion[desc]
+            if not self._hay_duplicados:
+                return
+            for otra in self.data["tareas"]:
+                if otra is not tarea and isinstance(otra, dict) and "descripcion" in otra and normalizar_descripcion(otra["descripcion"]) == desc:
+                    self.por_descripcion[desc] = otra["id"]
+                    break
+
+    def buscar_por_descripcion(self, descripcion):
+        return self.por_id.get(self.por_descripcion.get(normalizar_descripcion(descripcion)))
+
+    def buscar(self, clave):
+        """Busca una tarea por id o, si no es un id, por descripción (insensible a mayúsculas/minúsculas)."""
+        tarea = self.por_id.get(clave)
+        if tarea is None:
+            tarea = self.buscar_por_descripcion(clave)
+        return tarea
+
+    def buscar_aproximada(self, texto, n=3):
+        """Hasta n pares (puntuación, tarea) con las descripciones más parecidas a texto (ver IndiceTrigramas)."""
+        if self._trigramas is None:
+            # Solo se paga (tiempo y memoria) si el usuario llega a nombrar una tarea de forma inexacta
+            self._trigramas = IndiceTrigramas()
+            for tarea in self.data["tareas"]:
+                if isinstance(tarea, dict) and "descripcion" in tarea:
+                    self._trigramas.agregar(tarea["id"], tarea["descripcion"])
+        return [(puntuacion, self.por_id[id_tarea]) for puntuacion, id_tarea in self._trigramas.buscar(texto, n)]
+
+    def _objetivo(self, op):
+        if "id" in op:
+            return self.por_id.get(op["id"])
+        return self.buscar_por_descripcion(op.get("descripcion", ""))
+
+    def tareas_con_limite_entre(self, inicio, fin):
+        return [self.por_id[i] for i in self.por_limite.rango(inicio, fin)]
+
+    def tareas_con_referencia_entre(self, inicio, fin):
+        return [self.por_id[i] for i in self.por_referencia.rango(inicio, fin)]
+
+    def primeras_con_limite(self, n):
+        """Las n tareas con fecha límite más temprana."""
+        return [self.por_id[i] for i in self.por_limite.ids[:n]]
+
+    def _quitar(self, tarea):
+        self.por_id.pop(tarea.get("id"), None)
+        self._desindexar_descripcion(tarea)
+        self._desindexar_fechas(tarea)
+        tareas = self.data["tareas"]
+        for i, t in enumerate(tareas):
+            if t is tarea:
+                del tareas[i]
+                break
+
+    def aplicar(self, op):
+        tipo = op.get("op")
+        if tipo == "lote":
+            for sub_op in op.get("ops", []):
+                self.aplicar(sub_op)
+        elif tipo == "add":
+            tarea = dict(op["tarea"])
+            self.data["tareas"].append(tarea)
+            self._indexar(tarea)
+        elif tipo == "delete":
+            tarea = self._objetivo(op)
+            while tarea is not None:
+                self._quitar(tarea)
+                # Formato antiguo (por descripción): eliminar todas las tareas con esa descripción
+                tarea = self._objetivo(op) if "id" not in op else None
+        elif tipo in ("modify", "complete"):
+            tarea = self._objetivo(op)
+            if tarea is None:
+                return
+            if tipo == "complete":
+                tarea["completada"] = True
+                return
+            cambios = op.get("cambios", {})
+            cambia_descripcion = "descripcion" in cambios
+            cambian_fechas = "fecha_limite" in cambios or "fecha_creacion" in cambios
+            if cambia_descripcion:
+                self._desindexar_descripcion(tarea)
+            if cambian_fechas:
+                self._desindexar_fechas(tarea)
+            tarea.update(cambios)
+            if cambia_descripcion:
+                self._indexar_descripcion(tarea)
+            if cambian_fechas:
+                self._indexar_fechas(tarea)
+        else:
+            log.warning("Operación de journal desconocida ignorada: %s", op)
+
+
+class TaskStore:
+    """Mantiene en memoria el contenido de usuarios/<email>/tareas.json (foto + journal).
+
+    Los archivos solo se vuelven a leer si cambia su firma en disco (mtime y tamaño),
+    por ejemplo tras una sincronización con Drive o una escritura desde otro proceso.
+    """
+
+    def __init__(self, email, base_dir="usuarios"):
+        self.email = email
+        self.ruta_archivo = f"{base_dir}/{email}/tareas.json"
+        self.ruta_journal = f"{base_dir}/{email}/tareas.journal.jsonl"
+        self.ruta_bloqueo = f"{base_dir}/{email}/tareas.lock"
+        # RLock: las funciones de commands.py encadenan load() y apply() dentro del mismo bloque
+        self.lock = threading.RLock()
+        self._data = None
+        self._indice = None
+        self._firma = None
+        self._compactando = False
+        self._bloqueo = BloqueoArchivo(self.ruta_bloqueo, self.lock)
+
+    def _bloqueo_archivo(self, exclusivo):
+        """Bloqueo entre procesos sobre tareas.lock; reentrante dentro del mismo store."""
+        return self._bloqueo.tomar(exclusivo)
+
+    @staticmethod
+    def _firma_de(ruta):
+        """Devuelve (mtime_ns, tamaño) del archivo o None si no existe."""
+        try:
+            st = os.stat(ruta)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _firma_archivos(self):
+        return (self._firma_de(self.ruta_archivo), self._firma_de(self.ruta_journal))
+
+    def invalidate(self):
+        """Descarta la copia en memoria; la próxima lectura irá a disco."""
+        with self.lock:
+            self._data = None
+            self._indice = None
+            self._firma = None
+
+    def recargar(self):
+        """Tras cambiar tareas.json por fuera (descarga de Drive): no fiarse de la firma, que solo mira mtime y tamaño."""
+        self.invalidate()
+
+    def load(self):
+        """Devuelve el diccionario {"tareas": [...]} del usuario con el journal ya aplicado.
+
+        Lanza FileNotFoundError o json.JSONDecodeError igual que open()/json.load(),
+        para que cada función de commands.py conserve su manejo de errores.
+        """
+        with self.lock:
+            firma = self._firma_archivos()
+            if self._data is not None and firma[0] is not None and firma == self._firma:
+                return self._data
+            self.invalidate()
+            # Bloqueo compartido: los lectores no se bloquean entre sí, pero no leen una escritura a medias
+            with self._bloqueo_archivo(exclusivo=False):
+                firma = self._firma_archivos()
+                if firma[0] is None:
+                    raise FileNotFoundError(f"No existe {self.ruta_archivo}")
+                # Acepta el formato configurado y los anteriores (JSON con sangría), ver serializacion.py
+                data = cargar_archivo(self.ruta_archivo)
+                if not (isinstance(data, dict) and isinstance(data.get("tareas"), list)):
+                    # Formato inesperado: se devuelve tal cual para que commands.py lo trate
+                    return data
+                indice = IndiceTareas(data)
+                self._reaplicar_journal(indice)
+                self._data = data
+                self._indice = indice
+                self._firma = firma
+            if indice.ids_asignados:
+                # Tareas de versiones anteriores sin id: persistir los ids generados para que sean estables.
+                # Fuera del bloqueo compartido: pasar de compartido a exclusivo con él tomado puede
+                # interbloquear a dos procesos que hagan lo mismo
+                with self._bloqueo_archivo(exclusivo=True):
+                    if self._firma_archivos() != firma:
+                        # Otro proceso escribió entre los dos bloqueos (quizá asignando ya los ids): releer
+                        self.invalidate()
+                        return self.load()
+                    self.save(data)
+            return data
+
+    def instantanea(self):
+        """Copia de {"tareas": [...]} para quien la usa fuera del store (GUI, consola), con las fechas ya interpretadas.
+
+        load() devuelve la caché viva, que otros hilos modifican al aplicar operaciones.
+        """
+        with self.lock:
+            data = self.load()
+            if not (isinstance(data, dict) and isinstance(data.get("tareas"), list)):
+                return data
+            return {"tareas": [copia_tarea(t) for t in data["tareas"]]}
+
+    def _reaplicar_journal(self, indice):
+        """Reaplica las operaciones del journal que pertenecen a la foto cargada."""
+        base = indice.data.get("journal_base")
+        if not base:
+            # Foto escrita por otro medio (registro, descarga de Drive...): el journal no le corresponde
+            return
+        version = indice.data.get("version", 0)
+        try:
+            with open(self.ruta_journal, "r", encoding='utf-8') as journal:
+                for linea in journal:
+                    try:
+                        op = de_json(linea)
+                    except json.JSONDecodeError:
+                        # Línea incompleta (p.ej. caída a mitad de escritura): se ignora
+                        continue
+                    if op.get("base") != base:
+                        continue
+                    if "v" in op:
+                        if op["v"] != version + 1:
+                            continue # Línea repetida o fuera de orden
+                        version = op["v"]
+                    else:
+                        version += 1 # Journal escrito antes de existir las versiones
+                    indice.aplicar(op)
+        except FileNotFoundError:
+            pass
+        indice.data["version"] = version
+
+    def save(self, data=None):
+        """Escribe una foto completa, vacía el journal y deja los datos como copia en memoria vigente."""
+        with self.lock, self._bloqueo_archivo(exclusivo=True):
+            if data is None:
+                data = self._data
+            # Cada foto tiene un identificador nuevo: las líneas de journal anteriores dejan de aplicarse
+            data["journal_base"] = uuid.uuid4().hex
+            data["version"] = data.get("version", 0) + 1
+            try:
+                foto = dict(data, tareas=[tarea_serializable(t) for t in data["tareas"]]) if isinstance(data.get("tareas"), list) else data
+                # Temporal + renombrado: una caída a mitad de escritura deja la foto anterior intacta
+                with trazas.tramo("persistir", destino="foto"):
+                    guardar_archivo(self.ruta_archivo, foto)
+                    escribir_atomico(self.ruta_journal, "")
+            except Exception:
+                # No sabemos qué quedó en disco: forzar relectura la próxima vez
+                self.invalidate()
+                raise
+            if self._indice is None or self._indice.data is not data:
+                self._indice = IndiceTareas(data)
+            self._data = data
+            self._firma = self._firma_archivos()
+
+    def apply(self, op):
+        """Aplica una operación en memoria y la anexa al journal (O(tamaño de la operación) en disco).
+
+        Un lote ({"op": "lote", "ops": [...]}) ocupa una sola línea del journal, así que se aplica
+        entero o nada: una línea a medio escribir no se puede decodificar y se descarta al reaplicar.
+        """
+        with self.lock, self._bloqueo_archivo(exclusivo=True):
+            # Con el bloqueo exclusivo, load() incorpora lo que hayan anexado otros procesos
+            self._anexar(self.load(), op)
+
+    def mutar(self, calcular):
+        """Cambio optimista: calcular(store) devuelve (op o None, resultado) y se evalúa sin bloquear el archivo.
+
+        La operación se anexa solo si la versión en disco sigue siendo la usada para calcularla;
+        si otro proceso escribió entretanto, se recalcula sobre sus datos. Con mucha contención, el
+        último intento se calcula con el bloqueo exclusivo tomado para asegurar el progreso.
+        Devuelve el resultado.
+        """
+        with self.lock:
+            for _ in range(MUTAR_REINTENTOS):
+                data = self.load()
+                version = (data.get("journal_base"), data.get("version", 0))
+                op, resultado = calcular(self)
+                if op is None:
+                    return resultado
+                with self._bloqueo_archivo(exclusivo=True):
+                    data = self.load()
+                    if (data.get("journal_base"), data.get("version", 0)) == version:
+                        self._anexar(data, op)
+                        return resultado
+            with self._bloqueo_archivo(exclusivo=True):
+                op, resultado = calcular(self)
+                if op is not None:
+                    self._anexar(self.load(), op)
+                return resultado
+
+    def _anexar(self, data, op):
+        """Aplica op y la escribe al final del journal; requiere self.lock y el bloqueo exclusivo."""
+        if not data.get("journal_base"):
+            # Primera escritura sobre una foto sin identificador: fijarlo antes de empezar a anexar
+            self.save(data)
+        self._indice.aplicar(op)
+        data["version"] = data.get("version", 0) + 1
+        registro = dict(op, base=data["journal_base"], v=data["version"])
+        try:
+            with trazas.tramo("persistir", destino="journal", op=op.get("op")):
+                anexar(self.ruta_journal, a_json(registro) + "\n")
+        except Exception:
+            self.invalidate()
+            raise
+        self._firma = self._firma_archivos()
+        if self._necesita_compactar():
+            self._compactar_en_segundo_plano()
+
+    def _necesita_compactar(self):
+        firma_foto, firma_journal = self._firma
+        if firma_journal is None or firma_journal[1] < JOURNAL_MIN_BYTES:
+            return False
+        tam_foto = firma_foto[1] if firma_foto else 0
+        return firma_journal[1] >= JOURNAL_MAX_BYTES or firma_journal[1] > tam_foto * JOURNAL_RATIO_MAX
+
+    def _compactar_en_segundo_plano(self):
+        if self._compactando:
+            return
+        self._compactando = True
+        threading.Thread(target=self._compactar_hilo, name=f"compactar-{self.email}", daemon=True).start()
+
+    def _compactar_hilo(self):
+        try:
+            self.compact()
+        except Exception as e:
+            log.warning("Error al compactar el journal de tareas de %s: %s", self.email, e)
+        finally:
+            self._compactando = False
+
+    def compact(self):
+        """Vuelca el estado actual a tareas.json y vacía el journal."""
+        with self.lock, self._bloqueo_archivo(exclusivo=True):
+            # Con el bloqueo exclusivo: la foto incluye todo lo que otros procesos hayan anexado
+            self.save(self.load())
+
+    def buscar(self, clave):
+        """Devuelve la tarea con ese id o descripción, o None (O(1) con la caché cargada)."""
+        with self.lock:
+            self.load()
+            return self._indice.buscar(clave) if self._indice else None
+
+    def buscar_por_descripcion(self, descripcion):
+        with self.lock:
+            self.load()
+            return self._indice.buscar_por_descripcion(descripcion) if self._indice else None
+
+    def buscar_aproximada(self, texto, n=3):
+        """Hasta n pares (puntuación, tarea) con la descripción más parecida a texto, de mayor a menor."""
+        with self.lock:
+            self.load()
+            return self._indice.buscar_aproximada(texto, n) if self._indice else []
+
+    # --- Consultas (el backend SQLite las resuelve con índices); devuelven copias de las tareas ---
+
+    def tareas_en_periodo(self, fecha_inicio, fecha_fin):
+        """Tareas cuya fecha límite (o de creación, si no tiene) cae entre dos fechas, ambas inclusive, en orden de fecha."""
+        inicio_dt = datetime.combine(fecha_inicio, datetime.min.time())
+        fin_dt = datetime.combine(fecha_fin, datetime.max.time())
+        with self.lock:
+            self.load()
+            return [copia_tarea(t) for t in self._indice.tareas_con_referencia_entre(inicio_dt, fin_dt)] if self._indice else []
+
+    def tareas_por_categoria(self, categoria):
+        """Tareas de una categoría (comparación insensible a mayúsculas/minúsculas y espacios)."""
+        categoria_norm = categoria.strip().lower()
+        with self.lock:
+            return [copia_tarea(t) for t in self.load().get("tareas", []) if (t.get("categoria") or "General").strip().lower() == categoria_norm]
+
+    def tareas_con_limite_entre(self, inicio_dt, fin_dt):
+        """Tareas con fecha límite en [inicio_dt, fin_dt], ordenadas por fecha límite."""
+        with self.lock:
+            self.load()
+            return [copia_tarea(t) for t in self._indice.tareas_con_limite_entre(inicio_dt, fin_dt)] if self._indice else []
+
+    def primeras_con_limite(self, n):
+        """Devuelve (las n tareas con fecha límite más temprana, total de tareas con fecha límite)."""
+        with self.lock:
+            self.load()
+            if not self._indice:
+                return [], 0
+            return [copia_tarea(t) for t in self._indice.primeras_con_limite(n)], len(self._indice.por_limite)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_task_store(email):
+    """Devuelve el almacén de tareas (único por proceso) asociado al email, según BACKEND_TAREAS."""
+    with _stores_lock:
+        store = _stores.get(email)
+        if store is None:
+            if BACKEND_TAREAS == "sqlite":
+                from sqlite_task_store import SqliteTaskStore
+                store = SqliteTaskStore(email)
+            else:
+                store = TaskStore(email)
+            _stores[email] = store
+        return store
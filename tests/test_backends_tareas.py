@@ -0,0 +1,75 @@
+# Paridad de consultas entre los backends de tareas: TaskStore (tareas.json + journal, índices en
+# memoria) y SqliteTaskStore (tareas.db), sobre los mismos datos sintéticos de los benchmarks.
+
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from benchmarks import datos_sinteticos
+from serializacion import guardar_archivo
+from sqlite_task_store import SqliteTaskStore
+from task_store import TaskStore
+
+EMAIL = "ana@example.com"
+
+
+def _ids(tareas):
+    return [t["id"] for t in tareas]
+
+
+class TestParidadBackends(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._temporal = tempfile.TemporaryDirectory()
+        base = cls._temporal.name
+        os.makedirs(os.path.join(base, EMAIL))
+        tareas = datos_sinteticos.generar_tareas(400, semilla=7, referencia=datetime(2026, 10, 14, 9, 0))["tareas"]
+        # Formatos que también aparecen en archivos reales: fecha sin hora, fecha inválida, sin fechas
+        for i, tarea in enumerate(tareas[:60]):
+            if tarea.get("fecha_limite"):
+                tarea["fecha_limite"] = tarea["fecha_limite"].split(" ")[0] if i % 3 else "pronto"
+        tareas.append({"id": "sin-fechas", "descripcion": "Sin fechas"})
+        tareas.append({"id": "solo-dia", "descripcion": "Solo día", "fecha_limite": "2026-10-20"})
+        guardar_archivo(os.path.join(base, EMAIL, "tareas.json"), {"tareas": tareas})
+        cls.json = TaskStore(EMAIL, base_dir=base)
+        cls.sqlite = SqliteTaskStore(EMAIL, base_dir=base)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.sqlite._conexion is not None:
+            cls.sqlite._conexion.close()
+        cls._temporal.cleanup()
+
+    def test_tareas_con_limite_entre(self):
+        rangos = [
+            (datetime(2026, 10, 20), datetime(2026, 10, 20, 23, 59, 59, 999999)), # Un día: incluye "2026-10-20"
+            (datetime(2026, 10, 19, 23, 59, 59, 500000), datetime(2026, 10, 20)), # Bordes con microsegundos
+            (datetime(2026, 10, 1), datetime(2026, 11, 30, 23, 59, 59)),
+            (datetime(2000, 1, 1), datetime(2100, 1, 1)),
+        ]
+        for inicio, fin in rangos:
+            with self.subTest(inicio=inicio, fin=fin):
+                esperadas = self.json.tareas_con_limite_entre(inicio, fin)
+                self.assertEqual(_ids(self.sqlite.tareas_con_limite_entre(inicio, fin)), _ids(esperadas))
+        self.assertIn("solo-dia", _ids(self.sqlite.tareas_con_limite_entre(*rangos[0])))
+
+    def test_tareas_en_periodo(self):
+        for inicio, fin in ((date(2026, 10, 20), date(2026, 10, 20)), (date(2026, 10, 1), date(2026, 12, 31))):
+            with self.subTest(inicio=inicio, fin=fin):
+                self.assertEqual(sorted(_ids(self.sqlite.tareas_en_periodo(inicio, fin))),
+                                 sorted(_ids(self.json.tareas_en_periodo(inicio, fin))))
+
+    def test_primeras_con_limite(self):
+        primeras_json, total_json = self.json.primeras_con_limite(10)
+        primeras_sqlite, total_sqlite = self.sqlite.primeras_con_limite(10)
+        self.assertEqual(total_sqlite, total_json)
+        self.assertEqual(_ids(primeras_sqlite), _ids(primeras_json))
+
+    def test_tareas_por_categoria(self):
+        categoria = self.json.load()["tareas"][0].get("categoria") or "General"
+        self.assertEqual(_ids(self.sqlite.tareas_por_categoria(categoria)), _ids(self.json.tareas_por_categoria(categoria)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# Gramática de fechas_es: qué expresión reconoce (texto exacto) y qué fecha le da, con una referencia fija.
+
+import unittest
+from datetime import datetime
+
+import fechas_es
+
+AHORA = datetime(2026, 10, 14, 9, 0) # Miércoles
+
+# (texto, expresión reconocida o None, fecha)
+CORPUS = [
+    ("hoy", "hoy", datetime(2026, 10, 14, 9, 0)),
+    ("mañana", "mañana", datetime(2026, 10, 15, 9, 0)),
+    ("pasado mañana", "pasado mañana", datetime(2026, 10, 16, 9, 0)),
+    ("esta tarde", "esta tarde", datetime(2026, 10, 14, 16, 0)),
+    ("mañana por la noche", "mañana por la noche", datetime(2026, 10, 15, 20, 0)),
+    ("este fin de semana", "este fin de semana", datetime(2026, 10, 17, 9, 0)),
+    ("el viernes", "el viernes", datetime(2026, 10, 16, 9, 0)),
+    ("el miércoles", "el miércoles", datetime(2026, 10, 21, 9, 0)),
+    ("este miércoles", "este miércoles", datetime(2026, 10, 14, 9, 0)),
+    ("el próximo lunes a las 5", "el próximo lunes a las 5", datetime(2026, 10, 19, 17, 0)),
+    ("el viernes de la semana que viene", "el viernes de la semana que viene", datetime(2026, 10, 23, 9, 0)),
+    ("el viernes 13", "el viernes 13", datetime(2026, 11, 13, 9, 0)),
+    ("el martes 13 de octubre", "el martes 13 de octubre", datetime(2027, 10, 13, 9, 0)),
+    ("la semana que viene", "la semana que viene", datetime(2026, 10, 21, 9, 0)),
+    ("el mes que viene", "el mes que viene", datetime(2026, 11, 14, 9, 0)),
+    ("el 25", "el 25", datetime(2026, 10, 25, 9, 0)),
+    ("el día 3", "el día 3", datetime(2026, 11, 3, 9, 0)),
+    ("25 de diciembre", "25 de diciembre", datetime(2026, 12, 25, 9, 0)),
+    ("3 de mayo de 2027", "3 de mayo de 2027", datetime(2027, 5, 3, 9, 0)),
+    ("25/12", "25/12", datetime(2026, 12, 25, 9, 0)),
+    ("2026-11-30", "2026-11-30", datetime(2026, 11, 30, 9, 0)),
+    ("a las 17:30", "a las 17:30", datetime(2026, 10, 14, 17, 30)),
+    ("a las cinco y media", "a las cinco y media", datetime(2026, 10, 14, 17, 30)),
+    ("a las 6 menos cuarto", "a las 6 menos cuarto", datetime(2026, 10, 14, 17, 45)),
+    ("a las 8 de la mañana", "a las 8 de la mañana", datetime(2026, 10, 15, 8, 0)),
+    ("a las 10 del lunes", "a las 10 del lunes", datetime(2026, 10, 19, 10, 0)),
+    ("a las 17 horas", "a las 17 horas", datetime(2026, 10, 14, 17, 0)),
+    ("al mediodía", "al mediodía", datetime(2026, 10, 14, 12, 0)),
+    ("5pm", "5pm", datetime(2026, 10, 14, 17, 0)),
+    ("dentro de dos semanas", "dentro de dos semanas", datetime(2026, 10, 28, 9, 0)),
+    ("en media hora", "en media hora", datetime(2026, 10, 14, 9, 30)),
+    ("tomorrow at 5pm", "tomorrow at 5pm", datetime(2026, 10, 15, 17, 0)),
+    ("tonight", "tonight", datetime(2026, 10, 14, 20, 0)),
+    # No son fechas
+    ("a las 3 amigas", None, None),
+    ("leer 1984", None, None),
+    ("pagar 100 euros", None, None),
+    ("cinco", None, None),
+    ("capitulo 7", None, None),
+    # Horas y cantidades fuera de rango: ni 17:60, ni las 23:45 de hoy, ni una excepción
+    ("a las 5 menos 10", "a las 5 menos 10", datetime(2026, 10, 14, 16, 50)),
+    ("a las 5 menos 0", None, None),
+    ("a las 0 menos cuarto", None, None),
+    ("a las 0 menos 10", None, None),
+    ("en 9000 años", None, None),
+    ("dentro de 99999999999 dias", None, None),
+]
+
+
+class TestBuscarFecha(unittest.TestCase):
+    def test_corpus(self):
+        for texto, expresion, fecha in CORPUS:
+            with self.subTest(texto=texto):
+                encontrada = fechas_es.buscar_fecha(texto, AHORA)
+                if expresion is None:
+                    self.assertIsNone(encontrada)
+                    continue
+                self.assertIsNotNone(encontrada)
+                self.assertEqual(texto[encontrada.inicio:encontrada.fin], expresion)
+                self.assertEqual(encontrada.fecha, fecha)
+
+    def test_posicion_dentro_de_un_comando(self):
+        texto = "llamar a Ana el próximo viernes a las 5 sin falta"
+        encontrada = fechas_es.buscar_fecha(texto, AHORA)
+        self.assertEqual(fechas_es.quitar_fecha(texto, encontrada), "llamar a Ana sin falta")
+        self.assertEqual(encontrada.fecha, datetime(2026, 10, 16, 17, 0))
+
+    def test_la_ultima_de_varias(self):
+        encontradas = fechas_es.buscar_fechas("mover lo de mañana al lunes", AHORA)
+        self.assertEqual(len(encontradas), 2)
+        self.assertEqual(fechas_es.buscar_fecha("mover lo de mañana al lunes", AHORA).fecha, datetime(2026, 10, 19, 9, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+# Journals de tareas (task_store.TaskStore) y de usuarios (user_management.UserManager): reaplicación al
+# cargar, líneas que no corresponden a la foto y compactación.
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from serializacion import a_json
+from task_store import TaskStore
+from user_management import UserManager
+
+EMAIL = "ana@example.com"
+
+
+class _EnDirectorioTemporal(unittest.TestCase):
+    """Cada prueba trabaja en un directorio vacío (commands y UserManager usan rutas relativas)."""
+
+    def setUp(self):
+        self._temporal = tempfile.TemporaryDirectory()
+        self._anterior = os.getcwd()
+        os.chdir(self._temporal.name)
+        self.addCleanup(self._temporal.cleanup)
+        self.addCleanup(os.chdir, self._anterior)
+
+
+class TestJournalTareas(_EnDirectorioTemporal):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(f"usuarios/{EMAIL}")
+        self.store = TaskStore(EMAIL)
+        self.store.save({"tareas": [{"id": "t1", "descripcion": "Comprar pan", "fecha_limite": "2026-05-10"}]})
+
+    def _nuevo(self):
+        return TaskStore(EMAIL)
+
+    def _descripciones(self, store):
+        return [t["descripcion"] for t in store.load()["tareas"]]
+
+    def test_reaplica_operaciones_al_cargar(self):
+        self.store.apply({"op": "add", "tarea": {"id": "t2", "descripcion": "Llamar a Luis"}})
+        self.store.apply({"op": "modify", "id": "t1", "cambios": {"descripcion": "Comprar pan integral"}})
+        self.store.apply({"op": "lote", "ops": [{"op": "complete", "id": "t2"},
+                                               {"op": "add", "tarea": {"id": "t3", "descripcion": "Pagar luz"}}]})
+        self.store.apply({"op": "delete", "id": "t3"})
+        otro = self._nuevo()
+        self.assertEqual(self._descripciones(otro), ["Comprar pan integral", "Llamar a Luis"])
+        self.assertTrue(otro.buscar("t2")["completada"])
+        self.assertEqual(otro.load()["version"], self.store.load()["version"])
+
+    def test_ignora_lineas_ajenas_o_incompletas(self):
+        self.store.apply({"op": "add", "tarea": {"id": "t2", "descripcion": "Llamar a Luis"}})
+        data = self.store.load()
+        with open(self.store.ruta_journal, "a", encoding="utf-8") as journal:
+            # Otra foto, versión repetida y una línea cortada a mitad (caída durante la escritura)
+            journal.write(a_json({"op": "add", "tarea": {"id": "x", "descripcion": "De otra foto"}, "base": "otra", "v": data["version"] + 1}) + "\n")
+            journal.write(a_json({"op": "add", "tarea": {"id": "y", "descripcion": "Repetida"}, "base": data["journal_base"], "v": data["version"]}) + "\n")
+            journal.write('{"op": "add", "tarea": {"id": "z"')
+        self.assertEqual(self._descripciones(self._nuevo()), ["Comprar pan", "Llamar a Luis"])
+
+    def test_compactar_vacia_el_journal_y_conserva_el_estado(self):
+        for i in range(20):
+            self.store.apply({"op": "add", "tarea": {"id": f"n{i}", "descripcion": f"Tarea {i}"}})
+        antes = self._descripciones(self.store)
+        self.store.compact()
+        self.assertEqual(os.path.getsize(self.store.ruta_journal), 0)
+        with open(self.store.ruta_archivo, encoding="utf-8") as foto:
+            self.assertEqual([t["descripcion"] for t in json.load(foto)["tareas"]], antes)
+        otro = self._nuevo()
+        self.assertEqual(self._descripciones(otro), antes)
+        # Tras compactar, los cambios de otro proceso se anexan sobre la nueva foto
+        otro.apply({"op": "delete", "id": "n0"})
+        self.assertNotIn("Tarea 0", self._descripciones(self.store))
+
+    def test_foto_sin_journal_base_no_aplica_el_journal_anterior(self):
+        self.store.apply({"op": "add", "tarea": {"id": "t2", "descripcion": "Llamar a Luis"}})
+        # Foto reemplazada por fuera (descarga de Drive): el journal viejo ya no le corresponde
+        with open(self.store.ruta_archivo, "w", encoding="utf-8") as foto:
+            json.dump({"tareas": [{"id": "d1", "descripcion": "Desde Drive"}]}, foto)
+        self.store.recargar()
+        self.assertEqual(self._descripciones(self.store), ["Desde Drive"])
+
+    def test_ids_asignados_a_tareas_antiguas_son_estables(self):
+        with open(self.store.ruta_archivo, "w", encoding="utf-8") as foto:
+            json.dump({"tareas": [{"descripcion": "Sin id"}]}, foto)
+        ids = [self._nuevo().load()["tareas"][0]["id"] for _ in range(2)]
+        self.assertIsNotNone(ids[0])
+        self.assertEqual(ids[0], ids[1])
+
+    def test_copias_con_fechas_interpretadas(self):
+        # instantanea() y las consultas dan copias que ya traen _limite_dt: los reportes no reinterpretan las cadenas
+        copia = self.store.instantanea()
+        self.assertEqual(copia["tareas"][0]["_limite_dt"], datetime(2026, 5, 10))
+        [encontrada] = self.store.tareas_con_limite_entre(datetime(2026, 5, 1), datetime(2026, 5, 31))
+        self.assertEqual(encontrada["_limite_dt"], datetime(2026, 5, 10))
+        encontrada["descripcion"] = "Cambiada"
+        copia["tareas"].clear()
+        self.assertEqual(self._descripciones(self.store), ["Comprar pan"])
+        # Las claves internas nunca llegan al archivo
+        self.store.compact()
+        with open(self.store.ruta_archivo, encoding="utf-8") as foto:
+            self.assertFalse([k for t in json.load(foto)["tareas"] for k in t if k.startswith("_")])
+
+
+class TestJournalUsuarios(_EnDirectorioTemporal):
+    def setUp(self):
+        super().setUp()
+        gestor = UserManager()
+        self.assertTrue(gestor.register_user(EMAIL, "Ana", "clave")[0])
+
+    def test_reaplica_cambios_de_configuracion(self):
+        gestor = UserManager()
+        gestor.update_user_config(EMAIL, {"modo_silencioso": True})
+        gestor.update_user_config(EMAIL, {"umbral_energia": 310.5})
+        gestor.flush()
+        config = UserManager().get_config(EMAIL)
+        self.assertTrue(config["modo_silencioso"])
+        self.assertEqual(config["umbral_energia"], 310.5)
+
+    def test_reemplazar_y_combinar_configuracion(self):
+        gestor = UserManager()
+        gestor.set_user_config(EMAIL, {"motor_reconocimiento": "vosk"})
+        gestor.update_user_config(EMAIL, {"modo_silencioso": True})
+        gestor.flush()
+        self.assertEqual(UserManager().get_config(EMAIL), {"motor_reconocimiento": "vosk", "modo_silencioso": True})
+
+    def test_anexar_tras_compactar_otro_proceso(self):
+        uno, otro = UserManager(), UserManager()
+        uno.update_user_config(EMAIL, {"a": 1})
+        uno.flush()
+        uno.save_users() # Compacta: nueva journal_base
+        otro.update_user_config(EMAIL, {"b": 2}) # otro aún tiene la base anterior en memoria
+        otro.flush()
+        config = UserManager().get_config(EMAIL)
+        self.assertEqual((config.get("a"), config.get("b")), (1, 2))
+
+    def test_compactar_conserva_los_usuarios(self):
+        gestor = UserManager()
+        gestor.register_user("luis@example.com", "Luis", "clave")
+        gestor.update_user_config(EMAIL, {"modo_silencioso": True})
+        gestor.save_users()
+        self.assertEqual(os.path.getsize(gestor.journal_file), 0)
+        nuevo = UserManager()
+        self.assertEqual(sorted(u["email"] for u in nuevo.get_all_users()), [EMAIL, "luis@example.com"])
+        self.assertTrue(nuevo.get_config(EMAIL)["modo_silencioso"])
+
+
+if __name__ == "__main__":
+    unittest.main()
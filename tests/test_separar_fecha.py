@@ -0,0 +1,80 @@
+# Corpus de regresión de main.separar_fecha / interpretar_comando: comandos cuya fecha (o ausencia
+# de fecha) ya se interpretó mal alguna vez.
+#
+#   python -m unittest discover tests     (o: python -m pytest tests)
+
+import unittest
+from datetime import datetime
+
+import main
+
+AHORA = datetime(2026, 10, 14, 9, 0) # Miércoles
+
+# (texto, descripción esperada, fecha esperada o None)
+CORPUS = [
+    # Números que no son fechas: parsedatetime los tomaba por una hora o por hoy
+    ("leer 1984", "leer 1984", None),
+    ("pagar 100 euros", "pagar 100 euros", None),
+    ("correr 5 km", "correr 5 km", None),
+    ("estudiar capitulo 7", "estudiar capitulo 7", None),
+    ("comprar 3 kilos de papas", "comprar 3 kilos de papas", None),
+    # Abreviaturas inglesas que en español son palabras
+    ("ir al mar", "ir al mar", None),
+    # "a las" con un sustantivo detrás no es una hora
+    ("llamar a las 3 amigas", "llamar a las 3 amigas", None),
+    ("comprar pan a las 6", "comprar pan", datetime(2026, 10, 14, 18, 0)),
+    ("ir al medico a las 5 horas", "ir al medico", datetime(2026, 10, 14, 17, 0)),
+    # Día de la semana con número
+    ("llamar el viernes 13", "llamar", datetime(2026, 11, 13, 9, 0)),
+    ("cena el viernes 13 de diciembre", "cena", datetime(2026, 12, 13, 9, 0)),
+    ("llamar el viernes", "llamar", datetime(2026, 10, 16, 9, 0)),
+    # Expresiones en inglés de las versiones anteriores
+    ("comprar leche tomorrow at 5pm", "comprar leche", datetime(2026, 10, 15, 17, 0)),
+    ("ver a juan tonight", "ver a juan", datetime(2026, 10, 14, 20, 0)),
+    ("cita next friday", "cita", datetime(2026, 10, 23, 9, 0)),
+    ("cena december 24", "cena", datetime(2026, 12, 24, 9, 0)),
+    ("llamar next week", "llamar", datetime(2026, 10, 21, 9, 0)),
+    # Español habitual
+    ("comprar leche mañana a las 5 pm", "comprar leche", datetime(2026, 10, 15, 17, 0)),
+    ("reunión el 3 de mayo", "reunión", datetime(2027, 5, 3, 9, 0)),
+    ("entregar informe 10/12", "entregar informe", datetime(2026, 12, 10, 9, 0)),
+    ("pagar luz el día 5", "pagar luz", datetime(2026, 11, 5, 9, 0)),
+    ("ir al cine 10:30", "ir al cine", datetime(2026, 10, 14, 10, 30)),
+]
+
+
+class TestSepararFecha(unittest.TestCase):
+    def test_corpus(self):
+        for texto, descripcion, fecha in CORPUS:
+            with self.subTest(texto=texto):
+                resto, encontrada = main.separar_fecha(texto, AHORA)
+                self.assertEqual(encontrada, fecha)
+                self.assertEqual(resto, descripcion)
+
+    def test_interpretar_fecha_sin_numeros_sueltos(self):
+        for texto in ("1984", "100 euros", "mar"):
+            with self.subTest(texto=texto):
+                self.assertIsNone(main.interpretar_fecha(texto, AHORA))
+
+
+class TestInterpretarComando(unittest.TestCase):
+    def test_agregar_sin_fecha(self):
+        for comando, descripcion in (("agregar leer 1984", "leer 1984"),
+                                     ("agregar pagar 100 euros", "pagar 100 euros"),
+                                     ("agregar llamar a las 3 amigas", "llamar a las 3 amigas")):
+            with self.subTest(comando=comando):
+                self.assertEqual(main.interpretar_comando(comando), ('agregar', descripcion, None, None))
+
+    def test_fechas_fuera_de_rango_no_fallan(self):
+        for comando in ("agrega cena a las 5 menos 0", "agrega x en 9000 años", "agrega viaje dentro de 99999999999 dias"):
+            with self.subTest(comando=comando):
+                self.assertEqual(main.interpretar_comando(comando)[0], 'agregar')
+
+    def test_agregar_con_fecha_en_ingles(self):
+        accion = main.interpretar_comando("agregar comprar leche tomorrow at 5pm")
+        self.assertEqual(accion[:2], ('agregar', 'comprar leche'))
+        self.assertTrue(accion[2].endswith(" 17:00:00"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+# trazas.py
+# Trazas de diagnóstico del camino de un comando (voz/texto -> interpretación -> ejecución -> disco).
+#
+# Todo pasa por el logger estándar "vocetasks" (un hijo por módulo: obtener("main") -> "vocetasks.main"),
+# con los argumentos separados del mensaje (log.debug("Parseando %r", texto)): si el nivel está
+# desactivado no se formatea nada. Por defecto solo salen advertencias; se configura con:
+#   VOCETASKS_TRAZAS        nivel: "debug", "info", "warning" (por defecto), "error"
+#   VOCETASKS_TRAZAS_JSON   ruta de un archivo donde se anexa cada traza como una línea JSON
+#                           (si se da sin VOCETASKS_TRAZAS, el nivel pasa a "info")
+#
+# tramo("fecha") mide una etapa (normalizar, intencion, fecha, ejecutar, persistir) y, con el nivel
+# "info" o inferior, emite su duración en el logger "vocetasks.tramos". Desactivado, tramo() devuelve
+# un objeto compartido que no hace nada: el coste en el camino del comando es una llamada.
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+registro = logging.getLogger("vocetasks")
+registro_tramos = logging.getLogger("vocetasks.tramos")
+
+_NIVELES = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+_pila = threading.local() # Tramos abiertos en cada hilo, para anotar el tramo padre
+_tramos_activos = False
+
+
+def obtener(modulo):
+    """Logger de un módulo, hijo de "vocetasks" (hereda nivel y destino)."""
+    return registro.getChild(modulo)
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por traza; los tramos incluyen sus campos (duración, padre, anotaciones)."""
+
+    def format(self, record):
+        datos = {"ts": round(record.created, 6), "nivel": record.levelname.lower(), "logger": record.name,
+                 "hilo": record.threadName}
+        tramo = getattr(record, "tramo", None)
+        if tramo is not None:
+            datos.update(tramo)
+        else:
+            datos["msg"] = record.getMessage()
+            if record.exc_info:
+                datos["error"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar(nivel=None, ruta_json=None):
+    """(Re)configura nivel y destino de las trazas; sin argumentos, los toma del entorno."""
+    global _tramos_activos
+    nivel = (nivel or os.environ.get("VOCETASKS_TRAZAS", "")).strip().lower()
+    ruta_json = ruta_json or os.environ.get("VOCETASKS_TRAZAS_JSON")
+    if not nivel:
+        nivel = "info" if ruta_json else "warning"
+
+    for manejador in list(registro.handlers):
+        registro.removeHandler(manejador)
+        manejador.close()
+    if ruta_json:
+        manejador = logging.FileHandler(ruta_json, encoding="utf-8")
+        manejador.setFormatter(FormatoJSON())
+    else:
+        manejador = logging.StreamHandler(sys.stderr)
+        manejador.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    registro.addHandler(manejador)
+    registro.propagate = False
+    registro.setLevel(_NIVELES.get(nivel, logging.WARNING))
+    _tramos_activos = registro_tramos.isEnabledFor(logging.INFO)
+
+
+class _TramoInactivo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        return False
+
+    def iniciar(self):
+        return self
+
+    def terminar(self, error=None):
+        pass
+
+    def anotar(self, **campos):
+        pass
+
+
+_INACTIVO = _TramoInactivo()
+
+
+class _Tramo:
+    __slots__ = ("nombre", "campos", "inicio")
+
+    def __init__(self, nombre, campos):
+        self.nombre = nombre
+        self.campos = campos
+
+    def anotar(self, **campos):
+        """Añade campos conocidos solo a mitad de la etapa (p. ej. la intención detectada)."""
+        self.campos.update(campos)
+
+    def iniciar(self):
+        """Para etapas que no caben en un with (bloques largos ya existentes): terminar() en un finally."""
+        pila = getattr(_pila, "tramos", None)
+        if pila is None:
+            pila = _pila.tramos = []
+        pila.append(self.nombre)
+        self.inicio = time.perf_counter()
+        return self
+
+    def terminar(self, error=None):
+        ms = (time.perf_counter() - self.inicio) * 1000.0
+        pila = _pila.tramos
+        pila.pop()
+        datos = {"tramo": self.nombre, "ms": round(ms, 3)}
+        if pila:
+            datos["padre"] = pila[-1]
+        if error is not None:
+            datos["error"] = error.__name__
+        datos.update(self.campos)
+        registro_tramos.info("%s %.3f ms %s", self.nombre, ms, self.campos, extra={"tramo": datos})
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, tipo, valor, traza):
+        self.terminar(tipo)
+        return False
+
+
+def tramo(nombre, **campos):
+    """Context manager que mide una etapa: with tramo("intencion") as t: ...; t.anotar(intencion=...)"""
+    if not _tramos_activos:
+        return _INACTIVO
+    return _Tramo(nombre, campos)
+
+
+configurar()
@@ -4,41 +4,260 @@ import os
 import json
 import hashlib
 import re
+import atexit
+import threading
+import uuid
+import weakref
 from datetime import datetime
 
+from persistencia import BloqueoArchivo, anexar, escribir_atomico
+from serializacion import a_json, cargar_archivo, de_json, guardar_archivo
+import trazas
+
+# Los cambios de un usuario se anotan como una línea en usuarios.journal.jsonl (coste proporcional a ese
+# usuario, no a todo usuarios.json). Los cambios de configuración se agrupan durante este intervalo.
+#
+# Varios procesos (consola y GUI) pueden usar los mismos archivos: las escrituras toman un bloqueo
+# exclusivo sobre usuarios.lock y, si otro proceso cambió usuarios.json o el journal (por ejemplo
+# compactándolo, lo que cambia journal_base), releen el disco y reaplican los cambios pendientes antes
+# de anexar, para no escribir líneas con una base que ya no se aplica. Las lecturas releen con un
+# bloqueo compartido cuando la firma de los archivos cambia.
+BACKEND_USUARIOS = os.environ.get("VOCETASKS_BACKEND_USUARIOS", "json").strip().lower()
+
+USUARIOS_DEBOUNCE_S = float(os.environ.get("VOCETASKS_USUARIOS_DEBOUNCE_MS", "300")) / 1000.0
+USUARIOS_JOURNAL_MAX_BYTES = 1024 * 1024 # Compactar siempre a partir de 1 MiB
+USUARIOS_JOURNAL_MIN_BYTES = 64 * 1024   # ...o, por encima de esto, si supera la mitad de usuarios.json
+
+# Gestores que pueden tener cambios sin escribir al salir del programa
+_gestores = weakref.WeakSet()
+
+@atexit.register
+def _flush_gestores():
+    for gestor in list(_gestores):
+        gestor.flush()
+
+def _firma_de(ruta):
+    """(mtime_ns, tamaño) del archivo, o None si no existe"""
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
 class UserManager:
     def __init__(self, users_file="usuarios.json"):
         self.users_file = users_file
+        self.journal_file = os.path.splitext(users_file)[0] + ".journal.jsonl"
         self.current_user = None
+        self._lock = threading.RLock()
+        self._bloqueo = BloqueoArchivo(os.path.splitext(users_file)[0] + ".lock", self._lock)
+        self._pendientes = [] # Registros de journal de los usuarios modificados, aún sin escribir
+        self._temporizador = None
+        self._journal_base = None
+        self._firma = None # Firma de usuarios.json y del journal tal como se leyeron o escribieron
+        self._oyentes = [] # Funciones (email, cambios) avisadas al cambiar la configuración de un usuario
         self.load_users()
+        _gestores.add(self)
 
     def load_users(self):
-        """Carga los usuarios desde el archivo JSON"""
-        if os.path.exists(self.users_file):
-            try:
-                with open(self.users_file, 'r') as file:
-                    data = json.load(file)
-                    # Asegurarse de que la clave 'usuarios' existe y es una lista
-                    self.users = {usuario["email"]: usuario for usuario in data.get("usuarios", []) if "email" in usuario}
-            except json.JSONDecodeError:
-                print(f"Error al decodificar {self.users_file}. Inicializando usuarios.")
+        """Carga los usuarios desde el archivo JSON y reaplica su journal"""
+        with self._lock:
+            with self._bloqueo.tomar(exclusivo=False):
+                existe = self._leer_disco()
+            if not existe:
                 self.users = {}
-            except Exception as e:
-                print(f"Error inesperado al cargar usuarios: {e}")
-                self.users = {}
-        else:
+                self.save_users() # Crear el archivo si no existe
+
+    def _leer_disco(self):
+        """Lee usuarios.json y su journal (con el bloqueo tomado); False si el archivo no existe"""
+        firma = self._firma_archivos()
+        if firma[0] is None:
+            return False
+        try:
+            data = cargar_archivo(self.users_file) # JSON con o sin sangría, o msgpack (ver serializacion.py)
+            # Asegurarse de que la clave 'usuarios' existe y es una lista
+            self.users = {usuario["email"]: usuario for usuario in data.get("usuarios", []) if "email" in usuario}
+            self._journal_base = data.get("journal_base")
+            self._reaplicar_journal()
+        except json.JSONDecodeError:
+            print(f"Error al decodificar {self.users_file}. Inicializando usuarios.")
+            self.users = {}
+        except Exception as e:
+            print(f"Error inesperado al cargar usuarios: {e}")
             self.users = {}
-            self.save_users() # Crear el archivo si no existe
+        self._firma = firma
+        return True
+
+    def _firma_archivos(self):
+        return (_firma_de(self.users_file), _firma_de(self.journal_file))
+
+    def _recargar_si_cambio(self):
+        """Si otro proceso escribió los archivos, parte de lo que hay en disco y reaplica los cambios pendientes"""
+        if self._firma_archivos() == self._firma:
+            return
+        if self._leer_disco():
+            for registro in self._pendientes:
+                self._aplicar_registro(registro)
+
+    def _al_dia(self):
+        """Incorpora lo que otros procesos hayan escrito desde la última lectura (dos stat si no hay nada)"""
+        with self._lock:
+            if self._firma_archivos() != self._firma:
+                with self._bloqueo.tomar(exclusivo=False):
+                    self._recargar_si_cambio()
+
+    def _reaplicar_journal(self):
+        if not self._journal_base:
+            # usuarios.json escrito por otro medio: el journal no le corresponde
+            return
+        try:
+            with open(self.journal_file, "r", encoding='utf-8') as journal:
+                for linea in journal:
+                    try:
+                        registro = de_json(linea)
+                    except json.JSONDecodeError:
+                        continue # Línea incompleta (caída a mitad de escritura)
+                    if registro.get("base") == self._journal_base:
+                        self._aplicar_registro(registro)
+        except FileNotFoundError:
+            pass
+
+    def _aplicar_registro(self, registro):
+        email = registro.get("email")
+        if registro.get("op") == "usuario":
+            self.users[email] = registro["usuario"]
+        elif registro.get("op") == "config" and email in self.users:
+            if "config" in registro:
+                # Configuración completa (set_user_config): reemplaza a la anterior
+                self.users[email]["config"] = dict(registro["config"])
+                return
+            if not isinstance(self.users[email].get("config"), dict):
+                self.users[email]["config"] = {}
+            self.users[email]["config"].update(registro.get("cambios", {}))
 
     def save_users(self):
-        """Guarda los usuarios en el archivo JSON"""
-        try:
-            with open(self.users_file, 'w') as file:
+        """Guarda todos los usuarios en el archivo JSON (reescritura completa) y vacía el journal"""
+        with self._lock, self._bloqueo.tomar(exclusivo=True):
+            try:
+                # La foto debe incluir lo que otros procesos hayan anexado al journal
+                self._recargar_si_cambio()
                 # Convertir el diccionario de usuarios de nuevo a una lista para guardar
-                data = {"usuarios": list(self.users.values())}
-                json.dump(data, file, indent=4)
-        except Exception as e:
-            print(f"Error al guardar usuarios: {e}")
+                self._journal_base = uuid.uuid4().hex
+                data = {"usuarios": list(self.users.values()), "journal_base": self._journal_base}
+                # Temporal + renombrado: una caída a mitad de escritura no deja usuarios.json corrupto
+                guardar_archivo(self.users_file, data)
+                escribir_atomico(self.journal_file, "")
+                self._pendientes = [] # La foto ya incluye todo lo pendiente
+                self._firma = self._firma_archivos()
+            except Exception as e:
+                print(f"Error al guardar usuarios: {e}")
+
+    def _registrar_cambio(self, registro, inmediato=False):
+        """Anota el cambio de un solo usuario; se escribe tras el intervalo de agrupación (o ya, si inmediato)"""
+        with self._lock:
+            self._pendientes.append(registro)
+            if inmediato:
+                self.flush()
+            elif self._temporizador is None:
+                self._temporizador = threading.Timer(USUARIOS_DEBOUNCE_S, self.flush)
+                self._temporizador.daemon = True
+                self._temporizador.start()
+
+    def flush(self):
+        """Escribe en el journal los cambios pendientes (una línea por cambio, en una sola escritura)"""
+        with self._lock:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            if not self._pendientes:
+                return
+            with self._bloqueo.tomar(exclusivo=True):
+                # Otro proceso puede haber compactado (nueva journal_base): anexar con la base vigente
+                self._recargar_si_cambio()
+                if not self._journal_base:
+                    # Archivo de una versión anterior, sin journal: reescribirlo una vez
+                    self.save_users()
+                    return
+                try:
+                    lineas = "".join(a_json(dict(registro, base=self._journal_base)) + "\n" for registro in self._pendientes)
+                    with trazas.tramo("persistir", destino="usuarios", cambios=len(self._pendientes)):
+                        anexar(self.journal_file, lineas)
+                    self._pendientes = []
+                    self._firma = self._firma_archivos()
+                except Exception as e:
+                    print(f"Error al guardar usuarios: {e}")
+                    return
+                if self._journal_demasiado_grande():
+                    self.save_users()
+
+    def _journal_demasiado_grande(self):
+        try:
+            tam_journal = os.path.getsize(self.journal_file)
+            tam_foto = os.path.getsize(self.users_file)
+        except OSError:
+            return False
+        return tam_journal >= USUARIOS_JOURNAL_MAX_BYTES or (tam_journal >= USUARIOS_JOURNAL_MIN_BYTES and tam_journal > tam_foto / 2)
+
+    # Acceso a registros individuales. Todo lo demás pasa por estos métodos, que son los que
+    # redefine el backend SQLite (sqlite_user_store.py) para no cargar todos los usuarios.
+    def _obtener(self, email):
+        self._al_dia()
+        return self.users.get(email)
+
+    def _insertar(self, usuario):
+        with self._lock:
+            self.users[usuario["email"]] = usuario
+            # Solo se anota el usuario nuevo; se escribe ya para no perder el registro si el programa se cierra
+            self._registrar_cambio({"op": "usuario", "email": usuario["email"], "usuario": usuario}, inmediato=True)
+
+    def _actualizar_config(self, email, cambios, reemplazar=False):
+        with self._lock:
+            self._al_dia()
+            if email not in self.users:
+                return False
+            registro = {"op": "config", "email": email, ("config" if reemplazar else "cambios"): cambios}
+            self._aplicar_registro(registro)
+            self._registrar_cambio(registro)
+            return True
+
+    def _iterar(self):
+        self._al_dia()
+        return list(self.users.values())
+
+    def update_user_config(self, email, cambios):
+        """Actualiza claves de la configuración de un usuario (las demás se conservan); solo se escribe ese cambio"""
+        cambios = dict(cambios)
+        if not self._actualizar_config(email, cambios):
+            return False
+        self._notificar(email, cambios)
+        return True
+
+    def set_user_config(self, email, config):
+        """Reemplaza la configuración completa de un usuario: las claves que no estén en config se quitan"""
+        config = dict(config)
+        if not self._actualizar_config(email, config, reemplazar=True):
+            return False
+        self._notificar(email, config)
+        return True
+
+    def suscribir(self, oyente):
+        """Registra oyente(email, cambios), llamado tras cada cambio de configuración (y al registrar un usuario)"""
+        if oyente not in self._oyentes:
+            self._oyentes.append(oyente)
+
+    def _notificar(self, email, cambios):
+        for oyente in list(self._oyentes):
+            try:
+                oyente(email, cambios)
+            except Exception as e:
+                print(f"Error al notificar cambio de configuración: {e}")
+
+    def get_config(self, email):
+        """Copia de la configuración de un usuario, desde memoria (None si no existe)"""
+        usuario = self._obtener(email)
+        if usuario is None:
+            return None
+        return dict(usuario.get("config") or {})
 
 
     def hash_password(self, password):
@@ -55,7 +274,7 @@ class UserManager:
         if not self.is_valid_email(email):
             return False, "Email inválido. Introduce un email con formato correcto."
 
-        if email in self.users:
+        if self._obtener(email) is not None:
             return False, "Este email ya está registrado."
 
         hashed_password = self.hash_password(password)
@@ -69,8 +288,8 @@ class UserManager:
                 "modo_silencioso": False
             }
         }
-        self.users[email] = new_user
-        self.save_users()
+        self._insertar(new_user)
+        self._notificar(email, dict(new_user["config"]))
 
         # Crear el directorio de tareas para el nuevo usuario
         user_tasks_dir = f"usuarios/{email}"
@@ -78,21 +297,21 @@ class UserManager:
         # Crear el archivo de tareas inicial si no existe (aunque commands.py también lo hace)
         user_tasks_file = os.path.join(user_tasks_dir, "tareas.json")
         if not os.path.exists(user_tasks_file):
-             with open(user_tasks_file, "w") as f:
-                 json.dump({"tareas": []}, f, indent=4)
+             guardar_archivo(user_tasks_file, {"tareas": []})
 
 
         return True, "Usuario registrado exitosamente."
 
     def login(self, email, password):
         """Inicia sesión con un usuario existente"""
-        if email not in self.users:
+        usuario = self._obtener(email)
+        if usuario is None:
             return False, "Email no registrado."
 
-        stored_password_hash = self.users[email]["password"]
+        stored_password_hash = usuario["password"]
         if self.hash_password(password) == stored_password_hash:
             self.current_user = email
-            return True, f"Bienvenido, {self.users[email].get('name', email)}!"
+            return True, f"Bienvenido, {usuario.get('name', email)}!"
         else:
             return False, "Contraseña incorrecta."
 
@@ -109,70 +328,88 @@ class UserManager:
         """Obtiene el email del usuario actual"""
         return self.current_user
 
+    def _usuario_actual(self):
+        return self._obtener(self.current_user) if self.current_user else None
+
     def get_user_name(self):
         """Obtiene el nombre del usuario actual"""
-        if self.current_user and self.current_user in self.users:
-            return self.users[self.current_user].get("name", self.current_user)
+        usuario = self._usuario_actual()
+        if usuario is not None:
+            return usuario.get("name", self.current_user)
         return None
 
     # Añadido: Método para obtener la configuración del usuario actual
     def get_user_config(self):
         """Obtiene el diccionario de configuración del usuario actual."""
-        if self.current_user and self.current_user in self.users:
+        usuario = self._usuario_actual()
+        if usuario is not None:
             # Devolver el diccionario de configuración o un diccionario vacío si no existe
-            return self.users[self.current_user].get("config", {})
+            return usuario.get("config", {})
         return {} # Devolver diccionario vacío si no hay usuario logueado
 
 
     # Métodos relacionados con la configuración que ya existían
     def is_silent_mode(self):
         """Verifica si el modo silencioso está activo para el usuario actual"""
-        if self.current_user and self.current_user in self.users:
+        usuario = self._usuario_actual()
+        if usuario is not None:
             # Usar get con valor por defecto False para manejar el caso si 'config' o 'modo_silencioso' no existen
-            return self.users[self.current_user].get("config", {}).get("modo_silencioso", False)
+            return usuario.get("config", {}).get("modo_silencioso", False)
         return False
 
     def toggle_silent_mode(self):
         """Cambia el estado del modo silencioso para el usuario actual"""
-        if not self.current_user or self.current_user not in self.users:
+        if self._usuario_actual() is None:
             return False, "No hay ninguna sesión activa."
 
-        # Asegurarse de que la clave 'config' existe y es un diccionario
-        if "config" not in self.users[self.current_user] or not isinstance(self.users[self.current_user]["config"], dict):
-            self.users[self.current_user]["config"] = {} # Inicializar si no existe
-
-        current_mode = self.users[self.current_user]["config"].get("modo_silencioso", False)
+        current_mode = self.is_silent_mode()
         new_mode = not current_mode
-        self.users[self.current_user]["config"]["modo_silencioso"] = new_mode
-        self.save_users()
+        self.update_user_config(self.current_user, {"modo_silencioso": new_mode})
 
         mode_text = "activado" if new_mode else "desactivado"
         return True, f"Modo silencioso {mode_text} correctamente."
 
     def get_notification_email(self):
         """Obtiene el email para notificaciones del usuario actual"""
-        if self.current_user and self.current_user in self.users:
+        usuario = self._usuario_actual()
+        if usuario is not None:
             # Usar get con valor por defecto el email del usuario
-            return self.users[self.current_user].get("config", {}).get("notificacion_email", self.current_user)
+            return usuario.get("config", {}).get("notificacion_email", self.current_user)
         return None
 
     def update_notification_email(self, email):
         """Actualiza el email para notificaciones"""
-        if not self.current_user or self.current_user not in self.users:
+        if self._usuario_actual() is None:
             return False, "No hay ninguna sesión activa."
 
         if not self.is_valid_email(email):
             return False, "Email inválido. Introduce un email con formato correcto."
 
-        # Asegurarse de que la clave 'config' existe y es un diccionario
-        if "config" not in self.users[self.current_user] or not isinstance(self.users[self.current_user]["config"], dict):
-            self.users[self.current_user]["config"] = {} # Inicializar si no existe
-
-
-        self.users[self.current_user]["config"]["notificacion_email"] = email
-        self.save_users()
+        self.update_user_config(self.current_user, {"notificacion_email": email})
         return True, f"Email de notificación actualizado a: {email}"
 
     def get_all_users(self):
-        """Obtiene una lista de todos los usuarios registrados (útil para administración)"""
-        return list(self.users.values())
+        """Recorre todos los usuarios registrados (útil para administración); es un iterador, no una lista"""
+        yield from self._iterar()
+
+
+# Un único UserManager por archivo y proceso: main.py, gui.py y utils.py comparten el mismo diccionario
+# en memoria, así que leer la configuración no toca el disco y no hay copias que puedan divergir.
+# Con VOCETASKS_BACKEND_USUARIOS=sqlite los usuarios se guardan en usuarios.db (ver sqlite_user_store.py)
+# y solo se leen los registros que se consultan: arrancar no depende del número de usuarios.
+_instancias = {}
+_instancias_lock = threading.Lock()
+
+def obtener_user_manager(users_file="usuarios.json"):
+    """Devuelve el UserManager compartido del proceso para users_file (lo crea la primera vez)"""
+    clave = os.path.abspath(users_file)
+    with _instancias_lock:
+        gestor = _instancias.get(clave)
+        if gestor is None:
+            if BACKEND_USUARIOS == "sqlite":
+                from sqlite_user_store import SqliteUserManager
+                gestor = SqliteUserManager(users_file)
+            else:
+                gestor = UserManager(users_file)
+            _instancias[clave] = gestor
+        return gestor
@@ -1,47 +1,417 @@
 import speech_recognition as sr
-import pyttsx3
+import atexit
 import getpass
-import json
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import pyttsx3
+except ImportError: # Sin síntesis de voz: las respuestas se imprimen
+    pyttsx3 = None
+
+from serializacion import guardar_archivo
+from user_management import obtener_user_manager
+import cache_voz
+import reconocimiento
+import trazas
+
+log = trazas.obtener("utils")
 
 # Variable global para el modo de entrada (voz o texto)
 MODO_ENTRADA = 'voz'  # Valores posibles: 'voz', 'texto'
 
-def escuchar_comando():
-    """Función para escuchar y reconocer comandos de voz"""
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
+# Calibración del ruido ambiente: al abrir el micrófono (o al cambiar de usuario sin umbral guardado)
+# y después en segundo plano cada VOCETASKS_RECALIBRAR_MIN minutos, mientras no se esté escuchando
+DURACION_CALIBRACION_S = 1.0
+RECALIBRAR_CADA_S = float(os.environ.get("VOCETASKS_RECALIBRAR_MIN", "10")) * 60
+
+class MicrofonoPersistente:
+    """Recognizer y Microphone abiertos una vez y reutilizados en cada comando.
+
+    El umbral de energía calibrado se guarda en la configuración del usuario ("umbral_energia"), así
+    que al volver a iniciar sesión no hay que calibrar. Entre comandos el flujo sigue abierto: antes
+    de escuchar se descarta el audio acumulado (incluida la voz del propio asistente).
+    """
+
+    def __init__(self):
+        self.reconocedor = None
+        self._microfono = None
+        self._fuente = None
+        self._email = None
+        self._umbral_listo = False # Umbral ya aplicado (guardado o calibrado) para self._email
+        self._lock = threading.Lock() # Un solo uso del flujo a la vez: escuchar o calibrar
+        self._temporizador = None
+
+    def _abrir(self):
+        if self._fuente is None:
+            self.reconocedor = sr.Recognizer()
+            self._microfono = sr.Microphone()
+            self._fuente = self._microfono.__enter__()
+            self._programar_recalibracion()
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrar()
+
+    def _cerrar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if self._fuente is not None:
+            try:
+                self._microfono.__exit__(None, None, None)
+            except Exception as e:
+                log.debug("Error al cerrar el micrófono: %s", e)
+            self._fuente = self._microfono = None
+        self._umbral_listo = False
+
+    def preparar(self, email):
+        """Abre el micrófono si hace falta y aplica el umbral del usuario (calibrando si no tiene)."""
+        with self._lock:
+            self._abrir()
+            if self._umbral_listo and email == self._email:
+                return
+            self._email = email
+            config = obtener_configuracion_usuario(email) if email else None
+            umbral = (config or {}).get("umbral_energia")
+            if umbral:
+                self.reconocedor.energy_threshold = umbral
+            else:
+                self._calibrar()
+            self._umbral_listo = True
+
+    def calibrar(self, duracion=DURACION_CALIBRACION_S):
+        """Recalibra el umbral de energía con el ruido ambiente actual (a petición)."""
+        with self._lock:
+            self._abrir()
+            self._calibrar(duracion)
+            self._umbral_listo = True
+
+    def _calibrar(self, duracion=DURACION_CALIBRACION_S):
+        self.reconocedor.adjust_for_ambient_noise(self._fuente, duration=duracion)
+        umbral = round(self.reconocedor.energy_threshold, 1)
+        log.debug("Umbral de energía calibrado: %s", umbral)
+        if self._email:
+            actualizar_configuracion_usuario(self._email, {"umbral_energia": umbral})
+
+    def _descartar_acumulado(self):
+        # El flujo de PyAudio sigue capturando entre comandos; lo que haya en su búfer ya es pasado
+        flujo = getattr(getattr(self._fuente, "stream", None), "pyaudio_stream", None)
+        try:
+            disponibles = flujo.get_read_available() if flujo is not None else 0
+            if disponibles:
+                flujo.read(disponibles, exception_on_overflow=False)
+        except Exception as e:
+            log.debug("No se pudo vaciar el búfer del micrófono: %s", e)
+
+    def escuchar(self):
+        with self._lock:
+            self._descartar_acumulado()
+            try:
+                return self.reconocedor.listen(self._fuente)
+            except OSError:
+                # Dispositivo desconectado o flujo roto: se vuelve a abrir en el próximo comando
+                self._cerrar()
+                raise
+
+    @contextmanager
+    def en_exclusiva(self, email):
+        """Fuente abierta y con el umbral del usuario, para leer el flujo directamente (escucha continua).
+
+        Mientras dura el with nadie más usa el micrófono: escuchar() espera y no se recalibra.
+        """
+        self.preparar(email)
+        with self._lock:
+            self._abrir() # Por si se cerró entre preparar() y tomar el lock
+            self._descartar_acumulado()
+            try:
+                yield self._fuente
+            except OSError:
+                self._cerrar()
+                raise
+
+    def _programar_recalibracion(self):
+        self._temporizador = threading.Timer(RECALIBRAR_CADA_S, self._recalibrar_en_segundo_plano)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+
+    def _recalibrar_en_segundo_plano(self):
+        # Solo si el micrófono está libre: si se está escuchando, listen() ya ajusta el umbral sobre la marcha
+        if not self._lock.acquire(blocking=False):
+            self._programar_recalibracion()
+            return
+        try:
+            if self._fuente is None:
+                return
+            self._calibrar(DURACION_CALIBRACION_S / 2)
+            self._programar_recalibracion()
+        except Exception as e:
+            log.warning("Error al recalibrar el micrófono: %s", e)
+        finally:
+            self._lock.release()
+
+
+microfono = MicrofonoPersistente()
+atexit.register(microfono.cerrar)
+
+def recalibrar_microfono():
+    """Vuelve a medir el ruido ambiente (p. ej. tras cambiar de habitación)."""
+    microfono.calibrar()
+
+def escuchar_comando(email=None):
+    """Función para escuchar y reconocer comandos de voz (del usuario en sesión si no se indica email)"""
+    servicio_voz.esperar() # No escuchar mientras el asistente habla: se oiría a sí mismo
+    email = email or obtener_user_manager().current_user
+    motor = motor_reconocimiento_usuario(email)
+    audio = None
+    if motor.necesita_microfono:
+        microfono.preparar(email)
         print("Escuchando...")
-        r.adjust_for_ambient_noise(source)  # Ajusta para reducir ruido ambiente
-        audio = r.listen(source)
+        audio = microfono.escuchar()
+    try:
+        print("Reconociendo...")
+        with trazas.tramo("reconocer", motor=motor.nombre):
+            texto = motor.reconocer(audio)
+        print(f"Has dicho: {texto}")
+        return texto.lower()
+    except reconocimiento.NoEntendido:
+        print("No se pudo entender el audio")
+        return "No entendí"
+    except reconocimiento.ErrorServicio as e:
+        print(f"Error de conexión con el servicio de reconocimiento ({motor.nombre}): {e}")
+        return "Error de conexión"
+
+def motor_reconocimiento_usuario(email):
+    """Motor de reconocimiento elegido por el usuario (el por defecto si no hay sesión o no eligió)"""
+    return reconocimiento.motor_para(obtener_configuracion_usuario(email) if email else None)
+
+def cambiar_motor_reconocimiento(nombre, email=None):
+    """Cambia el motor de reconocimiento de voz y lo guarda en la configuración del usuario si está logueado"""
+    nombre = nombre.strip().lower()
+    if nombre not in reconocimiento.MOTORES:
+        return f"Motor no válido. Use {', '.join(repr(m) for m in reconocimiento.MOTORES)}."
+    reconocimiento.obtener_motor(nombre) # Empieza a cargarlo ya (el modelo local tarda en cargarse)
+    if email:
+        actualizar_configuracion_usuario(email, {'motor_reconocimiento': nombre})
+    return f"Motor de reconocimiento cambiado a: {nombre}"
+
+class ServicioVoz:
+    """Síntesis de voz en un hilo propio con un único motor pyttsx3.
+
+    El motor se crea una sola vez (con la voz en español ya elegida) dentro del hilo, que es el único
+    que lo usa: algunos controladores (SAPI5 en Windows) no admiten llamadas desde otros hilos. decir()
+    solo encola el texto y vuelve enseguida; las frases se pronuncian en orden. Si pyttsx3 no está
+    instalado o el motor no arranca (p. ej. sin espeak en Linux), los textos se imprimen.
+
+    Las respuestas repetidas se reproducen desde la caché de audio (ver cache_voz): cuando la cola se
+    vacía, el hilo renderiza a archivo las frecuentes que aún no tienen clip.
+    """
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._motor = None
+        self._disponible = pyttsx3 is not None
+        self._pendientes = 0 # Textos encolados o en curso
+        self._condicion = threading.Condition()
+        self._generacion = 0 # callar() la incrementa: lo encolado antes ya no se dice
+        self._generacion_en_curso = None # Generación de la frase que está diciendo (o renderizando) el motor
+        self._cache = None
+        self._reproductor = None
+        self._voz = None # (id de la voz, velocidad): parte de la clave de la caché
+        self._por_renderizar = {} # clave -> texto frecuente sin clip todavía
+
+    @property
+    def disponible(self):
+        return self._disponible
+
+    @property
+    def hablando(self):
+        """True mientras quede algo por decir (o se esté diciendo)."""
+        return self._pendientes > 0
+
+    def decir(self, texto):
+        """Encola texto para pronunciarlo; no espera a que termine."""
+        if pyttsx3 is None:
+            print(f"Asistente: {texto}")
+            return
+        with self._condicion:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="ServicioVoz", daemon=True)
+                self._hilo.start()
+            self._pendientes += 1
+            self._cola.put((self._generacion, texto))
+
+    def callar(self):
+        """Descarta lo que queda por decir y corta la frase en curso.
+
+        No toca el motor: el hilo del servicio ve la nueva generación al empezar la siguiente palabra
+        (callback started-word) y es él quien llama a stop().
+        """
+        with self._condicion:
+            self._generacion += 1
+        reproductor = self._reproductor
+        if reproductor is not None:
+            try:
+                reproductor.detener()
+            except Exception as e:
+                log.debug("No se pudo interrumpir el clip: %s", e)
+
+    def esperar(self, timeout=None):
+        """Espera a que se haya dicho todo lo encolado; False si se agota timeout antes."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicion:
+            while self._pendientes:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._condicion.wait(restante)
+        return True
+
+    @staticmethod
+    def _es_voz_espanola(voz):
+        if "spanish" in (voz.name or "").lower():
+            return True
+        for idioma in getattr(voz, "languages", None) or []:
+            if isinstance(idioma, bytes): # espeak: b"\x05es-419" (prioridad + código)
+                idioma = idioma[1:].decode("ascii", "ignore")
+            if str(idioma).lower().startswith("es"):
+                return True
+        return False
+
+    def _iniciar_motor(self):
+        motor = pyttsx3.init()
+        # Configurar una voz en español si está disponible
+        for voz in motor.getProperty('voices'):
+            if self._es_voz_espanola(voz):
+                motor.setProperty('voice', voz.id)
+                log.debug("Voz elegida: %s", voz.name)
+                break
+        motor.connect('started-word', self._al_empezar_palabra)
+        return motor
+
+    def _al_empezar_palabra(self, name, location, length):
+        # pyttsx3 llama a los callbacks desde runAndWait, en el hilo del servicio: aquí sí se puede usar el motor
+        if self._generacion_en_curso is not None and self._generacion_en_curso != self._generacion:
+            try:
+                self._motor.stop()
+            except Exception as e:
+                log.debug("No se pudo interrumpir la voz: %s", e)
+
+    def _iniciar_cache(self):
+        if not cache_voz.DIRECTORIO:
+            return
+        reproductor = cache_voz.Reproductor()
+        if not reproductor.disponible:
+            log.info("Sin reproductor de audio (simpleaudio, winsound o aplay): caché de voz desactivada")
+            return
+        try:
+            self._voz = (self._motor.getProperty('voice'), self._motor.getProperty('rate'))
+        except Exception as e:
+            log.info("Caché de voz desactivada: no se pudo leer la voz del motor (%s)", e)
+            return
+        self._reproductor = reproductor
+        self._cache = cache_voz.CacheAudio()
+
+    def _pronunciar(self, texto, generacion):
+        if self._cache is not None:
+            clave = self._cache.clave(texto, *self._voz)
+            ruta = self._cache.buscar(clave)
+            if ruta is not None:
+                try:
+                    with trazas.tramo("hablar", origen="cache"):
+                        self._reproductor.reproducir(ruta)
+                    return
+                except Exception as e:
+                    log.warning("No se pudo reproducir el clip de '%s' (%s); se sintetiza", texto, e)
+                    self._cache.descartar(clave)
+            elif self._cache.anotar_uso(clave, texto):
+                self._por_renderizar[clave] = texto
+        with trazas.tramo("hablar", origen="sintesis"):
+            self._generacion_en_curso = generacion
+            try:
+                self._motor.say(texto)
+                self._motor.runAndWait()
+            finally:
+                self._generacion_en_curso = None
+
+    def _renderizar_pendiente(self):
+        """Guarda en la caché el clip de una respuesta frecuente (solo con la cola vacía)."""
+        clave, texto = self._por_renderizar.popitem()
+        generacion = self._generacion
         try:
-            print("Reconociendo...")
-            texto = r.recognize_google(audio, language='es-ES')
-            print(f"Has dicho: {texto}")
-            return texto.lower()
-        except sr.UnknownValueError:
-            print("No se pudo entender el audio")
-            return "No entendí"
-        except sr.RequestError as e:
-            print(f"Error de conexión con el servicio de reconocimiento: {e}")
-            return "Error de conexión"
-
-def hablar(texto):
-    """Función para convertir texto a voz"""
+            with trazas.tramo("renderizar_voz"):
+                self._generacion_en_curso = generacion
+                try:
+                    self._motor.save_to_file(texto, self._cache.ruta_temporal(clave))
+                    self._motor.runAndWait()
+                finally:
+                    self._generacion_en_curso = None
+            if generacion != self._generacion: # callar() durante el renderizado: puede estar cortado
+                self._cache.descartar(clave)
+            elif self._cache.agregar(clave):
+                log.debug("Respuesta guardada en la caché de voz: %s", texto)
+        except Exception as e:
+            log.warning("No se pudo guardar en caché el audio de '%s': %s", texto, e)
+            self._cache.descartar(clave)
+
+    def _terminado(self):
+        with self._condicion:
+            self._pendientes -= 1
+            self._condicion.notify_all()
+
+    def _bucle(self):
+        try:
+            self._motor = self._iniciar_motor()
+        except Exception as e:
+            log.warning("Síntesis de voz no disponible (%s); las respuestas se imprimirán", e)
+            self._disponible = False
+        else:
+            self._iniciar_cache()
+        while True:
+            try:
+                # Con clips pendientes de renderizar, no bloquearse: se hace en cuanto la cola se vacía
+                generacion, texto = self._cola.get(timeout=0.2 if self._por_renderizar else None)
+            except queue.Empty:
+                self._renderizar_pendiente()
+                continue
+            try:
+                if generacion != self._generacion:
+                    continue # Interrumpido con callar()
+                if not self._disponible:
+                    print(f"Asistente: {texto}")
+                    continue
+                self._pronunciar(texto, generacion)
+            except Exception as e:
+                log.warning("Error de síntesis de voz (%s): %s", e, texto)
+                print(f"Asistente: {texto}")
+            finally:
+                self._terminado()
+
+
+servicio_voz = ServicioVoz()
+
+@atexit.register
+def _terminar_de_hablar():
+    # La despedida ("Hasta luego...") se encola justo antes de salir: darle tiempo a decirse
+    servicio_voz.esperar(timeout=10)
+
+def hablar(texto, esperar=False):
+    """Dice texto (o lo imprime en modo texto) sin bloquear; con esperar=True, vuelve cuando se ha dicho."""
     if MODO_ENTRADA == 'texto':
         # En modo texto, solo imprimir en pantalla
         print(f"Asistente: {texto}")
         return
-        
-    motor = pyttsx3.init()
-    voces = motor.getProperty('voices')
-    # Configurar una voz en español si está disponible
-    for voz in voces:
-        if "spanish" in voz.name.lower():
-            motor.setProperty('voice', voz.id)
-            break
-    motor.say(texto)
-    motor.runAndWait()
+    servicio_voz.decir(texto)
+    if esperar:
+        servicio_voz.esperar()
+
+def callar():
+    """Interrumpe lo que esté diciendo el asistente y descarta lo pendiente."""
+    servicio_voz.callar()
 
 def entrada_texto(prompt, ocultar=False):
     """Función para recibir entrada de texto del usuario"""
@@ -58,42 +428,52 @@ def cambiar_modo_entrada(modo, email=None):
         
         # Si el usuario está logueado, guardar preferencia en su configuración
         if email:
-            config = obtener_configuracion_usuario(email)
-            if config:
-                config['modo_silencioso'] = (modo == 'texto')
-                guardar_configuracion_usuario(email, config)
+            actualizar_configuracion_usuario(email, {'modo_silencioso': modo == 'texto'})
                 
         return f"Modo de entrada cambiado a: {modo}"
     else:
         return "Modo no válido. Use 'voz' o 'texto'."
 
+def _gestor_usuarios():
+    """UserManager compartido; la primera vez se suscribe a sus cambios de configuración"""
+    gestor = obtener_user_manager()
+    gestor.suscribir(_al_cambiar_configuracion)
+    return gestor
+
+def _al_cambiar_configuracion(email, cambios):
+    # Si el modo silencioso del usuario en sesión cambia por otra vía (p. ej. UserManager.toggle_silent_mode),
+    # el modo de entrada activo lo sigue
+    global MODO_ENTRADA
+    if 'modo_silencioso' in cambios and email == obtener_user_manager().current_user:
+        MODO_ENTRADA = 'texto' if cambios['modo_silencioso'] else 'voz'
+
 def obtener_modo_entrada():
     """Devuelve el modo de entrada actual"""
     return MODO_ENTRADA
 
 def cargar_modo_entrada_usuario(email):
-    """Carga y establece el modo de entrada preferido por el usuario"""
+    """Carga y establece el modo de entrada preferido por el usuario (desde memoria, sin leer el disco)"""
     global MODO_ENTRADA
     config = obtener_configuracion_usuario(email)
     if config and 'modo_silencioso' in config:
         MODO_ENTRADA = 'texto' if config['modo_silencioso'] else 'voz'
+    if MODO_ENTRADA == 'voz':
+        reconocimiento.motor_para(config) # Al iniciar sesión, para que el primer comando no espere al modelo
     return MODO_ENTRADA
 
 def guardar_configuracion_usuario(email, config):
-    """Guarda la configuración del usuario"""
+    """Guarda la configuración del usuario (reemplaza la anterior completa)"""
+    try:
+        # Solo se anota el cambio de este usuario en el journal de usuarios (ver UserManager)
+        return _gestor_usuarios().set_user_config(email, config)
+    except Exception as e:
+        print(f"Error al guardar configuración: {e}")
+        return False
+
+def actualizar_configuracion_usuario(email, cambios):
+    """Cambia solo las claves de cambios en la configuración del usuario; las demás se conservan"""
     try:
-        with open("usuarios.json", "r+") as file:
-            data = json.load(file)
-            
-            for i, usuario in enumerate(data["usuarios"]):
-                if usuario["email"] == email:
-                    data["usuarios"][i]["config"] = config
-                    file.seek(0)
-                    json.dump(data, file, indent=4)
-                    file.truncate()
-                    return True
-            
-            return False
+        return _gestor_usuarios().update_user_config(email, cambios)
     except Exception as e:
         print(f"Error al guardar configuración: {e}")
         return False
@@ -101,14 +481,7 @@ def guardar_configuracion_usuario(email, config):
 def obtener_configuracion_usuario(email):
     """Obtiene la configuración del usuario"""
     try:
-        with open("usuarios.json", "r") as file:
-            data = json.load(file)
-            
-            for usuario in data["usuarios"]:
-                if usuario["email"] == email:
-                    return usuario["config"]
-            
-            return None
+        return _gestor_usuarios().get_config(email)
     except Exception as e:
         print(f"Error al obtener configuración: {e}")
         return None
@@ -120,5 +493,4 @@ def inicializar_entorno():
     
     # Crear archivo de usuarios si no existe
     if not os.path.exists("usuarios.json"):
-        with open("usuarios.json", "w") as file:
-            json.dump({"usuarios": []}, file, indent=4)
+        guardar_archivo("usuarios.json", {"usuarios": []})